@@ -0,0 +1,29 @@
+"""Add rolling conversation summary to chats
+
+Revision ID: c4e8f1a2b3d5
+Revises: 7ac6d5508b24
+Create Date: 2026-10-16 10:12:31.504218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e8f1a2b3d5'
+down_revision = '7ac6d5508b24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('chats', sa.Column('summary', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+    op.add_column('chats', sa.Column('summary_message_id', sa.Integer(), nullable=True))
+    op.add_column('chats', sa.Column('summary_updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('chats', 'summary_updated_at')
+    op.drop_column('chats', 'summary_message_id')
+    op.drop_column('chats', 'summary')
@@ -0,0 +1,32 @@
+"""Add composite indexes for the keyset-paginated product listing
+
+Revision ID: e5b2d8f4a1c7
+Revises: c4e8f1a2b3d5
+Create Date: 2026-10-17 09:41:12.275630
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b2d8f4a1c7'
+down_revision = 'c4e8f1a2b3d5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # El cursor (created_at, id) no admite nulos
+    op.execute("UPDATE products SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL")
+    op.create_index('ix_products_active_id', 'products', ['active', 'id'], unique=False)
+    op.create_index('ix_products_active_created_at_id', 'products', ['active', 'created_at', 'id'], unique=False)
+    op.create_index('ix_products_active_category_id', 'products', ['active', 'category', 'id'], unique=False)
+    op.create_index('ix_products_active_price_id', 'products', ['active', 'price', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_products_active_price_id', table_name='products')
+    op.drop_index('ix_products_active_category_id', table_name='products')
+    op.drop_index('ix_products_active_created_at_id', table_name='products')
+    op.drop_index('ix_products_active_id', table_name='products')
@@ -32,6 +32,7 @@ class Settings(BaseSettings):
     
     # OpenAI
     openai_api_key: Optional[str] = Field(default=None, env="OPENAI_API_KEY")
+    openai_base_url: Optional[str] = Field(default=None, env="OPENAI_BASE_URL")
     
     # Hugging Face
     huggingface_api_key: Optional[str] = Field(default=None, env="HUGGINGFACE_API_KEY")
@@ -51,9 +52,107 @@ class Settings(BaseSettings):
     
     # RAG
     rag_index_path: str = Field(default="rag_index", env="RAG_INDEX_PATH")
+    rag_index_refresh_seconds: int = Field(default=60, env="RAG_INDEX_REFRESH_SECONDS")
+    rag_index_sync_overlap_seconds: int = Field(default=30, env="RAG_INDEX_SYNC_OVERLAP_SECONDS")
+    rag_retrieval_mode: str = Field(default="hybrid", env="RAG_RETRIEVAL_MODE")  # lexical, vector o hybrid
+    rag_embedding_model: str = Field(default="text-embedding-ada-002", env="RAG_EMBEDDING_MODEL")
+    rag_vector_top_k: int = Field(default=4, env="RAG_VECTOR_TOP_K")
+    rag_rrf_k: int = Field(default=60, env="RAG_RRF_K")
+    rag_semantic_cache_enabled: bool = Field(default=True, env="RAG_SEMANTIC_CACHE_ENABLED")
+    rag_semantic_cache_threshold: float = Field(default=0.95, env="RAG_SEMANTIC_CACHE_THRESHOLD")
+    rag_semantic_cache_ttl_seconds: int = Field(default=3600, env="RAG_SEMANTIC_CACHE_TTL_SECONDS")
+    rag_semantic_cache_max_entries: int = Field(default=1000, env="RAG_SEMANTIC_CACHE_MAX_ENTRIES")
+    
+    # Coalescencia de llamadas idénticas al LLM (entre workers vía Redis)
+    llm_singleflight_enabled: bool = Field(default=True, env="LLM_SINGLEFLIGHT_ENABLED")
+    llm_singleflight_redis: bool = Field(default=True, env="LLM_SINGLEFLIGHT_REDIS")
+    
+    # LLM Gateway: pool HTTP, concurrencia por modelo, reintentos y circuit breaker
+    llm_timeout_seconds: float = Field(default=20.0, env="LLM_TIMEOUT_SECONDS")
+    llm_transcription_timeout_seconds: float = Field(default=60.0, env="LLM_TRANSCRIPTION_TIMEOUT_SECONDS")
+    llm_max_retries: int = Field(default=2, env="LLM_MAX_RETRIES")
+    llm_retry_base_delay: float = Field(default=0.5, env="LLM_RETRY_BASE_DELAY")
+    llm_retry_max_delay: float = Field(default=8.0, env="LLM_RETRY_MAX_DELAY")
+    llm_max_connections: int = Field(default=100, env="LLM_MAX_CONNECTIONS")
+    llm_model_concurrency: int = Field(default=16, env="LLM_MODEL_CONCURRENCY")
+    llm_circuit_failure_threshold: int = Field(default=5, env="LLM_CIRCUIT_FAILURE_THRESHOLD")
+    llm_circuit_recovery_seconds: float = Field(default=30.0, env="LLM_CIRCUIT_RECOVERY_SECONDS")
+    
+    # Selección de modelo: rápido para consultas simples, pesado para asesoría de estilo
+    llm_router_enabled: bool = Field(default=True, env="LLM_ROUTER_ENABLED")
+    llm_fast_model: str = Field(default="gpt-4o-mini", env="LLM_FAST_MODEL")
+    llm_heavy_model: str = Field(default="gpt-4o", env="LLM_HEAVY_MODEL")
+    llm_latency_slo_ms: float = Field(default=4000.0, env="LLM_LATENCY_SLO_MS")
+    llm_router_complex_tokens: int = Field(default=60, env="LLM_ROUTER_COMPLEX_TOKENS")
+    
+    # Hedging: si el primer token no llega antes del percentil de latencia, segunda petición alternativa
+    llm_hedge_enabled: bool = Field(default=True, env="LLM_HEDGE_ENABLED")
+    llm_hedge_percentile: float = Field(default=95.0, env="LLM_HEDGE_PERCENTILE")
+    llm_hedge_default_delay_ms: float = Field(default=2500.0, env="LLM_HEDGE_DEFAULT_DELAY_MS")
+    llm_hedge_min_delay_ms: float = Field(default=300.0, env="LLM_HEDGE_MIN_DELAY_MS")
+    llm_hedge_model: Optional[str] = Field(default=None, env="LLM_HEDGE_MODEL")
+    llm_hedge_base_url: Optional[str] = Field(default=None, env="LLM_HEDGE_BASE_URL")
+    llm_hedge_api_key: Optional[str] = Field(default=None, env="LLM_HEDGE_API_KEY")
+    llm_hedge_budget_ratio: float = Field(default=0.1, env="LLM_HEDGE_BUDGET_RATIO")
+    llm_hedge_budget_burst: float = Field(default=3.0, env="LLM_HEDGE_BUDGET_BURST")
+    
+    # Router de respuestas por niveles (plantillas -> recuperación -> LLM)
+    response_router_enabled: bool = Field(default=True, env="RESPONSE_ROUTER_ENABLED")
+    response_router_max_words: int = Field(default=15, env="RESPONSE_ROUTER_MAX_WORDS")
+    response_router_min_coverage: float = Field(default=0.75, env="RESPONSE_ROUTER_MIN_COVERAGE")
+    
+    # Resúmenes de conversación
+    chat_summary_every_turns: int = Field(default=4, env="CHAT_SUMMARY_EVERY_TURNS")
+    chat_summary_recent_messages: int = Field(default=6, env="CHAT_SUMMARY_RECENT_MESSAGES")
+    chat_summary_model: str = Field(default="gpt-4o-mini", env="CHAT_SUMMARY_MODEL")
+    chat_summary_max_tokens: int = Field(default=300, env="CHAT_SUMMARY_MAX_TOKENS")
+    
+    # Presupuesto de tokens del prompt (vacío = valor por modelo en prompt_builder)
+    prompt_token_budget: Optional[int] = Field(default=None, env="PROMPT_TOKEN_BUDGET")
+    
+    @field_validator('rag_retrieval_mode', mode='after')
+    @classmethod
+    def validate_retrieval_mode(cls, v):
+        v = v.strip().lower()
+        if v not in ("lexical", "vector", "hybrid"):
+            raise ValueError("RAG_RETRIEVAL_MODE debe ser lexical, vector o hybrid")
+        return v
     
     # Redis
     redis_url: str = Field(default="redis://localhost:6379", env="REDIS_URL")
+    redis_max_connections: int = Field(default=50, env="REDIS_MAX_CONNECTIONS")
+    redis_socket_timeout: float = Field(default=2.0, env="REDIS_SOCKET_TIMEOUT")
+    redis_connect_timeout: float = Field(default=2.0, env="REDIS_CONNECT_TIMEOUT")
+    
+    # Caché por niveles: L1 en memoria por worker (acotado) + L2 Redis compartido
+    cache_l1_max_entries: int = Field(default=2000, env="CACHE_L1_MAX_ENTRIES")
+    cache_l1_ttl_seconds: float = Field(default=30.0, env="CACHE_L1_TTL_SECONDS")
+    cache_tag_ttl_seconds: int = Field(default=172800, env="CACHE_TAG_TTL_SECONDS")
+    cache_tag_versions_max: int = Field(default=10000, env="CACHE_TAG_VERSIONS_MAX")
+    cache_l2_enabled: bool = Field(default=True, env="CACHE_L2_ENABLED")
+    # Protección contra estampidas: ventana en la que se sirve el valor vencido mientras
+    # se recarga, factor de expiración anticipada (0 = desactivada) y duración del lock de carga
+    cache_stale_ttl_seconds: int = Field(default=300, env="CACHE_STALE_TTL_SECONDS")
+    cache_early_expiration_beta: float = Field(default=1.0, env="CACHE_EARLY_EXPIRATION_BETA")
+    cache_load_lock_seconds: float = Field(default=10.0, env="CACHE_LOAD_LOCK_SECONDS")
+    # Respuestas pre-serializadas (bytes JSON y gzip) de los endpoints de catálogo
+    response_cache_max_entries: int = Field(default=256, env="RESPONSE_CACHE_MAX_ENTRIES")
+    response_cache_ttl_seconds: float = Field(default=300.0, env="RESPONSE_CACHE_TTL_SECONDS")
+    response_cache_gzip_min_bytes: int = Field(default=1024, env="RESPONSE_CACHE_GZIP_MIN_BYTES")
+    # GET condicional: max-age de las respuestas del catálogo con ETag (0 = revalidar siempre)
+    # y de los archivos de /media cuyo nombre no es un uuid (los uuid son inmutables)
+    http_cache_max_age_seconds: int = Field(default=0, env="HTTP_CACHE_MAX_AGE_SECONDS")
+    media_cache_max_age_seconds: int = Field(default=3600, env="MEDIA_CACHE_MAX_AGE_SECONDS")
+    # Precalentamiento del caché en segundo plano y cada cuánto se revisa si cambió el catálogo
+    cache_warm_enabled: bool = Field(default=True, env="CACHE_WARM_ENABLED")
+    cache_warm_check_seconds: float = Field(default=15.0, env="CACHE_WARM_CHECK_SECONDS")
+    # Filtro de Bloom de IDs de producto (descarta IDs inexistentes sin consultar la base de datos)
+    product_guard_enabled: bool = Field(default=True, env="PRODUCT_GUARD_ENABLED")
+    product_guard_false_positive_rate: float = Field(default=0.01, env="PRODUCT_GUARD_FALSE_POSITIVE_RATE")
+    product_guard_rebuild_seconds: float = Field(default=300.0, env="PRODUCT_GUARD_REBUILD_SECONDS")
+    # Listado de productos paginado por cursor: tamaño de página por defecto y máximo
+    product_page_default_limit: int = Field(default=50, env="PRODUCT_PAGE_DEFAULT_LIMIT")
+    product_page_max_limit: int = Field(default=200, env="PRODUCT_PAGE_MAX_LIMIT")
     
     # PayPal Configuration
     paypal_client_id: Optional[str] = Field(default=None, env="PAYPAL_CLIENT_ID")
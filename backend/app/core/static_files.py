@@ -0,0 +1,30 @@
+"""
+StaticFiles con cabeceras de caché para /media
+Las imágenes subidas se guardan con un nombre uuid que nunca se reutiliza: su contenido
+no cambia y se marcan ``immutable`` por un año. El resto se revalida pasado un max-age
+corto con el ETag/Last-Modified que ya genera StaticFiles (304 con If-None-Match).
+"""
+import os
+import re
+
+from fastapi.staticfiles import StaticFiles
+from starlette.types import Scope
+
+from app.core.config import settings
+
+# Nombre generado por upload_image: uuid4().hex + extensión
+UUID_FILENAME_RE = re.compile(r"^[0-9a-f]{32}\.[A-Za-z0-9]+$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class MediaStaticFiles(StaticFiles):
+    """Archivos de /media con Cache-Control según su nombre"""
+
+    async def get_response(self, path: str, scope: Scope):
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            if UUID_FILENAME_RE.match(os.path.basename(path)):
+                response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+            else:
+                response.headers["Cache-Control"] = f"public, max-age={settings.media_cache_max_age_seconds}"
+        return response
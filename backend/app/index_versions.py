@@ -0,0 +1,48 @@
+"""
+Versiones del índice FAISS: directorios ``versions/<versión>`` y puntero ``CURRENT``
+Lo comparten el backend (app/services/vector_store.py) y scripts/ingest_docs.py; no importa
+nada de la aplicación para que el script de ingesta funcione sin la configuración del backend
+"""
+import os
+from pathlib import Path
+from typing import List, Optional
+
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+POINTER_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+
+
+def resolve_index_path(index_path: str) -> Path:
+    """Resuelve la ruta del índice igual que scripts/ingest_docs.py (relativa a backend/)"""
+    path = Path(index_path)
+    return path if path.is_absolute() else BACKEND_DIR / path
+
+
+def read_current_version(index_root: Path) -> Optional[str]:
+    """Devuelve la versión apuntada por CURRENT o None si el índice no está versionado"""
+    pointer = index_root / POINTER_FILE
+    if not pointer.exists():
+        return None
+    version = pointer.read_text(encoding="utf-8").strip()
+    return version or None
+
+
+def write_current_version(index_root: Path, version: str) -> None:
+    """Actualiza el puntero de forma atómica (los lectores nunca ven un archivo a medias)"""
+    tmp = index_root / f".{POINTER_FILE}.tmp"
+    tmp.write_text(version, encoding="utf-8")
+    os.replace(tmp, index_root / POINTER_FILE)
+
+
+def list_versions(index_root: Path) -> List[str]:
+    """Versiones disponibles, de la más antigua a la más reciente"""
+    versions_dir = index_root / VERSIONS_DIR
+    if not versions_dir.exists():
+        return []
+    return sorted(p.name for p in versions_dir.iterdir() if (p / "index.faiss").exists())
+
+
+def version_path(index_root: Path, version: Optional[str]) -> Path:
+    """Directorio de una versión; sin versión se usa el formato antiguo (archivos en la raíz)"""
+    return index_root / VERSIONS_DIR / version if version else index_root
@@ -5,7 +5,6 @@ Siguiendo los principios SOLID y manteniendo compatibilidad
 from fastapi import FastAPI, Request, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from fastapi.staticfiles import StaticFiles
 from datetime import datetime
 import os
 import traceback
@@ -13,6 +12,7 @@ from contextlib import asynccontextmanager
 
 # Importar configuración centralizada
 from app.core.config import settings
+from app.core.static_files import MediaStaticFiles
 
 # Importar base de datos
 from app.database import create_db_and_tables, get_db
@@ -21,6 +21,14 @@ from app.database import create_db_and_tables, get_db
 from app.services.simple_cache_service import cache_service
 from app.services.ai_service import ai_service
 from app.services.huggingface_image_service import huggingface_image_service
+from app.services.rag_service import rag_service
+from app.services.singleflight import llm_singleflight
+from app.services.response_cache import response_cache
+from app.services.cache_warmer import cache_warmer
+from app.services.product_guard import product_guard
+from app.services.llm_gateway import llm_gateway
+from app.services.response_router import response_router
+from app.services.model_router import model_router
 
 # Importar routers existentes (mantener compatibilidad)
 from app.routers import auth, auth_enhanced, auth_complete
@@ -60,7 +68,13 @@ async def lifespan(app: FastAPI):
     
     # Conectar a Redis
     await cache_service.connect()
-    print("✅ Cache Redis inicializado")
+    print("✅ Caché por niveles inicializado")
+    
+    # Índices de búsqueda en memoria para el RAG
+    await rag_service.start_index_refresh()
+    
+    # Precalentar el caché en segundo plano (no retrasa el arranque)
+    await cache_warmer.start()
     
     # Verificar servicios de IA
     if hasattr(ai_service, 'client') and ai_service.client:
@@ -73,7 +87,10 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     print("🔄 Cerrando aplicación...")
+    await cache_warmer.stop()
+    await rag_service.stop_index_refresh()
     await cache_service.disconnect()
+    await llm_gateway.close()
     print("✅ Aplicación cerrada correctamente")
 
 
@@ -100,6 +117,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Cursor de la página siguiente del listado de productos
+    expose_headers=["X-Next-Cursor", "Link"],
 )
 
 
@@ -140,7 +159,6 @@ from sqlmodel import Session
 from app.models_sqlmodel.chat import Chat, ChatMessage
 from app.use_cases.chat_use_cases import ChatUseCases
 from app.repositories.chat_repository import ChatRepository
-from app.services.rag_service import rag_service
 
 @app.websocket("/ws/test")
 async def websocket_test(websocket: WebSocket):
@@ -190,6 +208,46 @@ async def websocket_simple(websocket: WebSocket):
         print(f"❌ Error en WebSocket SIMPLE: {e}")
         return
 
+async def stream_rag_reply(websocket: WebSocket, data: str):
+    """
+    Responde un mensaje del soporte sin bloquear el event loop:
+    envía las recomendaciones en cuanto termina la recuperación, luego los tokens
+    como frames "delta" y al final el frame "bot" completo (compatible con el frontend).
+    Saludos y preguntas frecuentes se responden sin LLM con un único frame "bot"
+    """
+    routed = response_router.route(data)
+    if routed.answer:
+        await websocket.send_json({
+            "type": "bot",
+            "message": routed.answer,
+            "recommendations": [],
+            "tier": routed.tier,
+            "timestamp": datetime.utcnow().isoformat()
+        })
+        return routed.answer, []
+    
+    retrieval = await rag_service.retrieve_context(data)
+    recommendations = rag_service.build_recommendations(retrieval.products)
+    await websocket.send_json({
+        "type": "recommendations",
+        "recommendations": recommendations,
+        "timestamp": datetime.utcnow().isoformat()
+    })
+    
+    parts = []
+    async for delta in rag_service.stream_response(data, retrieval):
+        parts.append(delta)
+        await websocket.send_json({"type": "delta", "delta": delta})
+    
+    rag_response = "".join(parts)
+    await websocket.send_json({
+        "type": "bot",
+        "message": rag_response,
+        "recommendations": recommendations,
+        "timestamp": datetime.utcnow().isoformat()
+    })
+    return rag_response, recommendations
+
 async def websocket_support_new(websocket: WebSocket):
     """WebSocket completamente nuevo para soporte en tiempo real con RAG"""
     print("🔌 WebSocket NUEVO conectado")
@@ -220,25 +278,9 @@ async def websocket_support_new(websocket: WebSocket):
                 # Procesar mensaje usando RAG
                 print("🤖 Iniciando procesamiento RAG...")
                 
-                # Generar respuesta usando RAG
+                # Generar respuesta usando RAG en streaming
                 print("🧠 Generando respuesta RAG...")
-                rag_response = await rag_service.generate_response(data)
-                print(f"✅ Respuesta RAG: {rag_response[:100]}...")
-                
-                # Obtener recomendaciones de productos
-                print("🛍️ Obteniendo recomendaciones...")
-                recommendations = await rag_service.get_recommendations(data)
-                print(f"✅ Recomendaciones: {len(recommendations)} productos")
-                
-                # Crear respuesta estructurada
-                response_data = {
-                    "type": "bot",
-                    "message": rag_response,
-                    "recommendations": recommendations,
-                    "timestamp": datetime.utcnow().isoformat()
-                }
-                
-                await websocket.send_json(response_data)
+                rag_response, recommendations = await stream_rag_reply(websocket, data)
                 print(f"📤 Respuesta enviada con {len(recommendations)} recomendaciones")
                 
             except Exception as e:
@@ -258,6 +300,7 @@ async def websocket_support_new(websocket: WebSocket):
         await websocket.close(code=1011, reason="Error interno del servidor")
         return
 
+@app.websocket("/ws/support")
 async def websocket_support(websocket: WebSocket):
     """WebSocket simplificado para soporte en tiempo real con RAG"""
     print("🔌 WebSocket conectado")
@@ -288,25 +331,9 @@ async def websocket_support(websocket: WebSocket):
                 # Procesar mensaje usando RAG
                 print("🤖 Iniciando procesamiento RAG...")
                 
-                # Generar respuesta usando RAG
+                # Generar respuesta usando RAG en streaming
                 print("🧠 Generando respuesta RAG...")
-                rag_response = await rag_service.generate_response(data)
-                print(f"✅ Respuesta RAG: {rag_response[:100]}...")
-                
-                # Obtener recomendaciones de productos
-                print("🛍️ Obteniendo recomendaciones...")
-                recommendations = await rag_service.get_recommendations(data)
-                print(f"✅ Recomendaciones: {len(recommendations)} productos")
-                
-                # Crear respuesta estructurada
-                response_data = {
-                    "type": "bot",
-                    "message": rag_response,
-                    "recommendations": recommendations,
-                    "timestamp": datetime.utcnow().isoformat()
-                }
-                
-                await websocket.send_json(response_data)
+                rag_response, recommendations = await stream_rag_reply(websocket, data)
                 print(f"📤 Respuesta enviada con {len(recommendations)} recomendaciones")
                 
             except Exception as e:
@@ -333,12 +360,15 @@ async def test_rag_endpoint(query: str = "camiseta"):
     try:
         print(f"Probando RAG con query: {query}")
         
-        # Generar respuesta usando RAG
-        rag_response = await rag_service.generate_response(query)
+        # Plantilla o recuperación si alcanza; si no, respuesta y recomendaciones con una sola recuperación
+        routed = response_router.route(query)
+        if routed.answer:
+            result = {"response": routed.answer, "recommendations": []}
+        else:
+            result = await rag_service.answer_with_recommendations(query)
+        rag_response = result["response"]
+        recommendations = result["recommendations"]
         print(f"Respuesta RAG: {rag_response}")
-        
-        # Obtener recomendaciones de productos
-        recommendations = await rag_service.get_recommendations(query)
         print(f"Recomendaciones: {len(recommendations)}")
         
         return {
@@ -351,8 +381,61 @@ async def test_rag_endpoint(query: str = "camiseta"):
         print(f"Error en test-rag: {e}")
         return {"error": str(e)}
 
+@app.get("/rag/cache/stats")
+async def rag_cache_stats():
+    """Métricas del caché semántico del RAG (para ajustar el umbral de similitud)"""
+    return {
+        "enabled": settings.rag_semantic_cache_enabled,
+        "content_version": rag_service.content_version,
+        "index_version": rag_service.vector_store.version,
+        **rag_service.semantic_cache.get_stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Métricas del caché por niveles y de las respuestas pre-serializadas del catálogo"""
+    return {
+        **(await cache_service.get_cache_stats()),
+        "responses": response_cache.get_stats(),
+        "product_guard": product_guard.get_stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/llm/singleflight/stats")
+async def llm_singleflight_stats():
+    """Cuántas llamadas idénticas al LLM se agruparon en una sola petición"""
+    return {
+        **llm_singleflight.get_stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/chat/router/stats")
+async def chat_router_stats():
+    """Mensajes respondidos por plantilla, solo recuperación o LLM"""
+    return {
+        **response_router.get_stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/llm/routing/stats")
+async def llm_routing_stats():
+    """Modelo elegido por ruta y su latencia, tokens y costo"""
+    return {
+        **model_router.get_stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/llm/gateway/stats")
+async def llm_gateway_stats():
+    """Estado del circuit breaker, reintentos y llamadas en curso por modelo"""
+    return {
+        **llm_gateway.get_stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
 os.makedirs(settings.media_dir, exist_ok=True)
-app.mount("/media", StaticFiles(directory=settings.media_dir), name="media")
+app.mount("/media", MediaStaticFiles(directory=settings.media_dir), name="media")
 
 
 # -- Analytics del chat (solo para administradores) --
@@ -379,7 +462,7 @@ async def get_chat_analytics(current_user: dict = Depends(get_current_user), db:
 @app.get("/health")
 async def health():
     """Healthcheck con información de servicios"""
-    cache_status = "connected" if cache_service.connected else "disconnected"
+    cache_status = "connected" if cache_service.l2_available else "l1_only"
     ai_status = "connected" if hasattr(ai_service, 'client') and ai_service.client else "simulated"
     
     return {
@@ -387,9 +470,11 @@ async def health():
         "version": "2.0.0",
         "services": {
             "cache": cache_status,
+            "cache_warmup": cache_warmer.state,
             "ai": ai_status,
             "database": "connected"
         },
+        "cache_warmup": cache_warmer.get_status(),
         "timestamp": datetime.now().isoformat()
     }
 
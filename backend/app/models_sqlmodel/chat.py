@@ -21,6 +21,11 @@ class Chat(ChatBase, BaseModel, TimestampMixin, table=True):
     user_id: Optional[int] = Field(default=None, foreign_key="users.id")
     created_at: Optional[datetime] = Field(default_factory=datetime.utcnow)
     
+    # Resumen acumulativo de los mensajes hasta summary_message_id (inclusive)
+    summary: Optional[str] = Field(default=None)
+    summary_message_id: Optional[int] = Field(default=None)
+    summary_updated_at: Optional[datetime] = Field(default=None)
+    
     # Relationships
     user: Optional["User"] = Relationship(back_populates="chats")
     messages: List["ChatMessage"] = Relationship(back_populates="chat")
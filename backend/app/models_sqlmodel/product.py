@@ -2,6 +2,7 @@
 Modelos de Producto usando SQLModel
 Siguiendo el principio de Single Responsibility (SOLID)
 """
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship
 from typing import Optional, List
 from datetime import datetime
@@ -21,6 +22,14 @@ class ProductBase(SQLModel):
 class Product(ProductBase, BaseModel, TimestampMixin, table=True):
     """Modelo de producto en la base de datos"""
     __tablename__ = "products"
+    # Índices del listado paginado por cursor: filtro por active (y categoría o precio)
+    # seguido de la columna del orden
+    __table_args__ = (
+        Index("ix_products_active_id", "active", "id"),
+        Index("ix_products_active_created_at_id", "active", "created_at", "id"),
+        Index("ix_products_active_category_id", "active", "category", "id"),
+        Index("ix_products_active_price_id", "active", "price", "id"),
+    )
     
     id: Optional[int] = Field(default=None, primary_key=True)
     image_url: Optional[str] = Field(default="", max_length=500)
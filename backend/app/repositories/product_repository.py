@@ -2,11 +2,64 @@
 Repositorio de productos siguiendo el patrón Repository
 Siguiendo el principio de Single Responsibility (SOLID)
 """
-from typing import Optional, List
-from sqlmodel import Session, select, and_
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional, List, Tuple
+from sqlalchemy import tuple_
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, select, and_, or_
 from .base_repository import BaseRepository
 from app.models_sqlmodel.product import Product, ProductImage
 
+# Orden de la paginación por cursor: id ascendente o más nuevos primero por (created_at, id)
+PAGE_SORTS = ("id", "newest")
+
+
+class InvalidCursor(ValueError):
+    """El cursor no es válido para el orden pedido"""
+
+
+@dataclass(frozen=True)
+class ProductPageFilters:
+    """Filtros del listado paginado; ``active=None`` incluye activos e inactivos"""
+    category: Optional[str] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    in_stock: Optional[bool] = None
+    active: Optional[bool] = True
+    sort: str = "id"
+
+    def cache_key(self) -> str:
+        return (
+            f"sort={self.sort}:active={self.active}:category={self.category}:"
+            f"price={self.min_price}-{self.max_price}:in_stock={self.in_stock}"
+        )
+
+
+def encode_cursor(product: Product, sort: str) -> str:
+    """Cursor opaco con la posición del último producto de la página"""
+    payload = {"s": sort, "id": product.id}
+    if sort == "newest":
+        payload["c"] = product.created_at.isoformat()
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[int, Optional[datetime]]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if payload["s"] != sort:
+            raise InvalidCursor("El cursor pertenece a otro orden")
+        created_at = datetime.fromisoformat(payload["c"]) if sort == "newest" else None
+        return int(payload["id"]), created_at
+    except InvalidCursor:
+        raise
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor("Cursor inválido") from e
+
 
 class ProductRepository(BaseRepository[Product]):
     """Repositorio para productos"""
@@ -19,6 +72,57 @@ class ProductRepository(BaseRepository[Product]):
         statement = select(Product).where(Product.active == True).offset(skip).limit(limit)
         return self.session.exec(statement).all()
     
+    async def get_page(
+        self,
+        filters: ProductPageFilters,
+        limit: int,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Product], Optional[str]]:
+        """Página de productos por keyset (ver ``fetch_page``)"""
+        return self.fetch_page(filters, limit, cursor)
+    
+    def fetch_page(
+        self,
+        filters: ProductPageFilters,
+        limit: int,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Product], Optional[str]]:
+        """
+        Página de productos por keyset (sin OFFSET): cada página cuesta lo mismo sin
+        importar la profundidad. Los filtros y el orden coinciden con los índices
+        compuestos de ``products``. Devuelve los productos y el cursor de la siguiente página.
+        Versión síncrona para endpoints síncronos o ``asyncio.to_thread``
+        """
+        statement = select(Product).options(selectinload(Product.images))
+        if filters.active is not None:
+            statement = statement.where(Product.active == filters.active)
+        if filters.category:
+            statement = statement.where(Product.category == filters.category)
+        if filters.min_price is not None:
+            statement = statement.where(Product.price >= filters.min_price)
+        if filters.max_price is not None:
+            statement = statement.where(Product.price <= filters.max_price)
+        if filters.in_stock is True:
+            statement = statement.where(Product.stock > 0)
+        elif filters.in_stock is False:
+            statement = statement.where(Product.stock == 0)
+
+        if filters.sort == "newest":
+            # created_at no tiene nulos (la migración de los índices los rellena)
+            if cursor:
+                last_id, last_created_at = decode_cursor(cursor, filters.sort)
+                statement = statement.where(tuple_(Product.created_at, Product.id) < (last_created_at, last_id))
+            statement = statement.order_by(Product.created_at.desc(), Product.id.desc())
+        else:
+            if cursor:
+                last_id, _ = decode_cursor(cursor, filters.sort)
+                statement = statement.where(Product.id > last_id)
+            statement = statement.order_by(Product.id)
+
+        products = self.session.exec(statement.limit(limit + 1)).all()
+        next_cursor = encode_cursor(products[limit - 1], filters.sort) if len(products) > limit else None
+        return products[:limit], next_cursor
+    
     async def get_by_price_range(self, min_price: float, max_price: float) -> List[Product]:
         """Obtiene productos por rango de precio"""
         statement = select(Product).where(
@@ -5,11 +5,14 @@ from ..db import get_db
 from .. import models, schemas
 from ..security import get_current_admin
 from ..services.openai_service import ask_openai, generate_contextual_response, extract_product_recommendations
+from ..services.rag_service import advanced_rag_answer
+from ..services.conversation_summary import conversation_summary
+from ..services.response_router import response_router
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
 @router.post("/message")
-def post_message(data: schemas.ChatMessageIn, db: Session = Depends(get_db)):
+async def post_message(data: schemas.ChatMessageIn, db: Session = Depends(get_db)):
     """
     Endpoint básico de chat con RAG avanzado por defecto
     """
@@ -20,28 +23,25 @@ def post_message(data: schemas.ChatMessageIn, db: Session = Depends(get_db)):
         db.commit()
         db.refresh(msg)
 
-        # Obtener historial de conversación reciente para contexto
-        conversation_history = db.query(models.ChatMessage).filter(
-            models.ChatMessage.chat_id == data.chat_id
-        ).order_by(models.ChatMessage.created_at.desc()).limit(10).all()
-        
-        # Convertir a formato para el RAG
-        history_for_rag = []
-        for hist_msg in reversed(conversation_history[:-1]):  # Excluir el mensaje actual
-            history_for_rag.append({
-                "sender": hist_msg.sender,
-                "content": hist_msg.content
-            })
+        # Resumen de la conversación + últimos mensajes aún no resumidos
+        summary, history_for_rag = conversation_summary.get_history(db, data.chat_id, exclude_message_id=msg.id)
 
-        # Usar RAG avanzado por defecto (mejor que el básico)
-        rag_result = advanced_rag_answer(data.content, db, history_for_rag)
-        
-        # Generar respuesta contextualizada
-        answer = generate_contextual_response(
-            query=data.content,
-            context=rag_result,
-            conversation_history=history_for_rag
-        )
+        # Saludos y preguntas frecuentes se responden sin llamar al LLM
+        routed = response_router.route(data.content)
+        if routed.answer:
+            answer = routed.answer
+            rag_result = {"suggested_actions": routed.suggested_actions}
+        else:
+            # Usar RAG avanzado por defecto (mejor que el básico)
+            rag_result = await advanced_rag_answer(data.content, db, history_for_rag)
+            
+            # Generar respuesta contextualizada
+            answer = await generate_contextual_response(
+                query=data.content,
+                context=rag_result,
+                conversation_history=history_for_rag,
+                summary=summary
+            )
         
         # Extraer recomendaciones de productos
         recommendations = extract_product_recommendations(answer)
@@ -51,6 +51,7 @@ def post_message(data: schemas.ChatMessageIn, db: Session = Depends(get_db)):
         db.add(bot_msg)
         db.commit()
         db.refresh(bot_msg)
+        conversation_summary.schedule_update(data.chat_id)
         
         return {
             "user_message_id": msg.id,
@@ -66,7 +67,7 @@ def post_message(data: schemas.ChatMessageIn, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Error procesando mensaje: {str(e)}")
 
 @router.post("/advanced-message")
-def post_advanced_message(data: schemas.ChatAdvancedMessageIn, db: Session = Depends(get_db)):
+async def post_advanced_message(data: schemas.ChatAdvancedMessageIn, db: Session = Depends(get_db)):
     """
     Endpoint avanzado que usa RAG mejorado con contexto de productos y conversación
     """
@@ -91,10 +92,10 @@ def post_advanced_message(data: schemas.ChatAdvancedMessageIn, db: Session = Dep
             })
 
         # Usar RAG avanzado
-        rag_result = advanced_rag_answer(data.message, db, history_for_rag)
+        rag_result = await advanced_rag_answer(data.message, db, history_for_rag)
         
         # Generar respuesta contextualizada
-        answer = generate_contextual_response(
+        answer = await generate_contextual_response(
             query=data.message,
             context=rag_result,
             conversation_history=history_for_rag
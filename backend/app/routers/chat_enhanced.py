@@ -3,19 +3,26 @@ Router mejorado para el chat con integración completa de OpenAI, audio e imáge
 Sistema moderno con todas las funcionalidades integradas
 """
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from pydantic import BaseModel
 from datetime import datetime
 import base64
+import json
 import logging
 
-from app.db import get_db
+from app.db import get_db, SessionLocal
 from app import models
-from app.services.openai_service import advanced_chat_completion, generate_contextual_response
+from app.services.openai_service import advanced_chat_completion, generate_contextual_response, generate_fallback_response
+from app.services.llm_gateway import LLMUnavailableError
 from app.services.audio_service import audio_service
 from app.services.huggingface_image_service import huggingface_image_service
 from app.services.ai_service import ai_service
+from app.services.prompt_builder import PromptBuilder
+from app.services.conversation_summary import conversation_summary
+from app.services.response_router import response_router
+from app.services.model_router import model_router
 
 logger = logging.getLogger(__name__)
 
@@ -50,6 +57,74 @@ class ImageMessageRequest(BaseModel):
     user_id: Optional[int] = None
     filename: str = "image.jpg"
 
+def save_user_message(request: ChatMessageRequest, db: Session) -> models.ChatMessage:
+    """Guarda el mensaje del usuario"""
+    user_msg = models.ChatMessage(
+        chat_id=request.chat_id,
+        sender="user",
+        content=request.message
+    )
+    db.add(user_msg)
+    db.commit()
+    db.refresh(user_msg)
+    return user_msg
+
+def build_chat_messages(request: ChatMessageRequest, db: Session, user_message_id: int) -> Tuple[List[Dict[str, str]], str]:
+    """
+    Elige el modelo y arma el prompt con resumen + últimos mensajes; solo se llama cuando
+    response_router no resolvió la consulta con una plantilla o recuperación
+    """
+    # Resumen de la conversación + últimos mensajes aún no resumidos
+    summary, conversation_history = conversation_summary.get_context(db, request.chat_id, exclude_message_id=user_message_id)
+    
+    # Convertir historial para OpenAI
+    history_for_ai = []
+    for msg in conversation_history:
+        history_for_ai.append({
+            "role": "user" if msg.sender == "user" else "assistant",
+            "content": msg.content
+        })
+    
+    # Generar respuesta usando OpenAI
+    model = model_router.choose("chat_enhanced", request.message, "gpt-4o-mini").model
+    builder = PromptBuilder(model, max_completion_tokens=500)
+    builder.set_system("""Eres una consultora de moda experta y elegante para Asistente Tienda, una tienda online de alta calidad. 
+            Tu objetivo es ayudar a los clientes de manera sofisticada, profesional y encantadora.
+            
+            ESTILO DE COMUNICACIÓN:
+            - Tono elegante, sofisticado y amigable
+            - Usa emojis de manera sutil y profesional
+            - Lenguaje refinado pero accesible
+            - Respuestas estructuradas y visualmente atractivas
+            - Máximo 200 palabras por respuesta
+            
+            CUANDO MUESTRES PRODUCTOS:
+            - Presenta cada producto como una joya única
+            - Destaca características especiales y beneficios
+            - Usa descripciones evocativas y atractivas
+            - NO incluyas enlaces técnicos ni URLs
+            - Enfócate en la experiencia del cliente
+            - Sugiere combinaciones y estilos
+            
+            PERSONALIDAD:
+            - Eres una consultora de moda experta y elegante
+            - Te emocionas por ayudar a crear looks perfectos
+            - Eres detallista pero no abrumadora
+            - Mantienes un aire de sofisticación y profesionalismo
+            - Siempre terminas con una invitación amigable para más ayuda""")
+    
+    # Agregar resumen, historial y mensaje actual
+    if summary:
+        builder.add_context("Resumen de la conversación hasta ahora:", [summary], priority=3)
+    builder.add_history(history_for_ai)
+    builder.set_user(request.message)
+    messages = builder.build()
+    return messages, model
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Formatea un evento Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
 @router.post("/message", response_model=ChatMessageResponse)
 async def send_message(
     request: ChatMessageRequest,
@@ -61,82 +136,27 @@ async def send_message(
     try:
         logger.info(f"💬 Procesando mensaje: '{request.message[:50]}...'")
         
-        # Guardar mensaje del usuario
-        user_msg = models.ChatMessage(
-            chat_id=request.chat_id,
-            sender="user",
-            content=request.message,
-            message_type=request.message_type
-        )
-        db.add(user_msg)
-        db.commit()
-        db.refresh(user_msg)
-        
-        # Obtener historial de conversación
-        conversation_history = db.query(models.ChatMessage).filter(
-            models.ChatMessage.chat_id == request.chat_id
-        ).order_by(models.ChatMessage.created_at.desc()).limit(10).all()
-        
-        # Convertir historial para OpenAI
-        history_for_ai = []
-        for msg in reversed(conversation_history[:-1]):  # Excluir mensaje actual
-            history_for_ai.append({
-                "role": "user" if msg.sender == "user" else "assistant",
-                "content": msg.content
-            })
-        
-        # Generar respuesta usando OpenAI
-        messages = [
-            {
-                "role": "system",
-                "content": """Eres una consultora de moda experta y elegante para Asistente Tienda, una tienda online de alta calidad. 
-                Tu objetivo es ayudar a los clientes de manera sofisticada, profesional y encantadora.
-                
-                ESTILO DE COMUNICACIÓN:
-                - Tono elegante, sofisticado y amigable
-                - Usa emojis de manera sutil y profesional
-                - Lenguaje refinado pero accesible
-                - Respuestas estructuradas y visualmente atractivas
-                - Máximo 200 palabras por respuesta
-                
-                CUANDO MUESTRES PRODUCTOS:
-                - Presenta cada producto como una joya única
-                - Destaca características especiales y beneficios
-                - Usa descripciones evocativas y atractivas
-                - NO incluyas enlaces técnicos ni URLs
-                - Enfócate en la experiencia del cliente
-                - Sugiere combinaciones y estilos
-                
-                PERSONALIDAD:
-                - Eres una consultora de moda experta y elegante
-                - Te emocionas por ayudar a crear looks perfectos
-                - Eres detallista pero no abrumadora
-                - Mantienes un aire de sofisticación y profesionalismo
-                - Siempre terminas con una invitación amigable para más ayuda"""
-            }
-        ]
-        
-        # Agregar historial
-        messages.extend(history_for_ai)
-        
-        # Agregar mensaje actual
-        messages.append({
-            "role": "user",
-            "content": request.message
-        })
-        
-        # Generar respuesta
-        ai_result = advanced_chat_completion(
-            messages=messages,
-            model="gpt-4o-mini",
-            temperature=0.8,
-            max_tokens=500
-        )
+        user_msg = save_user_message(request, db)
         
-        if ai_result["success"]:
-            response_text = ai_result["response"]
+        # Saludos y preguntas frecuentes se responden sin llamar al LLM
+        routed = response_router.route(request.message)
+        if routed.answer:
+            response_text = routed.answer
         else:
-            response_text = "Lo siento, hubo un error procesando tu mensaje. ¿Podrías intentar de nuevo?"
+            # Generar respuesta
+            messages, model = build_chat_messages(request, db, user_msg.id)
+            ai_result = await advanced_chat_completion(
+                messages=messages,
+                model=model,
+                temperature=0.8,
+                max_tokens=500,
+                route="chat_enhanced"
+            )
+            
+            if ai_result["success"] or ai_result.get("fallback"):
+                response_text = ai_result["response"]
+            else:
+                response_text = "Lo siento, hubo un error procesando tu mensaje. ¿Podrías intentar de nuevo?"
         
         # Buscar productos mencionados para recomendaciones
         recommendations = await get_product_recommendations(request.message, db)
@@ -145,12 +165,12 @@ async def send_message(
         bot_msg = models.ChatMessage(
             chat_id=request.chat_id,
             sender="bot",
-            content=response_text,
-            message_type="text"
+            content=response_text
         )
         db.add(bot_msg)
         db.commit()
         db.refresh(bot_msg)
+        conversation_summary.schedule_update(request.chat_id)
         
         logger.info(f"✅ Respuesta generada exitosamente")
         
@@ -167,6 +187,94 @@ async def send_message(
         logger.error(f"❌ Error procesando mensaje: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
 
+@router.post("/message/stream")
+async def send_message_stream(
+    request: ChatMessageRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Variante de /message que envía la respuesta token a token como Server-Sent Events
+
+    Eventos: ``start`` (id del mensaje del usuario), ``token`` (fragmento de texto),
+    ``recommendations`` (productos sugeridos) y ``done`` (id del mensaje del bot)
+    """
+    logger.info(f"💬 Procesando mensaje (stream): '{request.message[:50]}...'")
+    user_message_id = save_user_message(request, db).id
+    routed = response_router.route(request.message)
+    if not routed.answer:
+        # El prompt se arma con la sesión de la petición, antes de empezar el stream
+        messages, model = build_chat_messages(request, db, user_message_id)
+    
+    async def event_stream():
+        yield sse_event("start", {"user_message_id": user_message_id})
+        
+        parts: List[str] = []
+        try:
+            if routed.answer:
+                # Plantilla o recuperación: la respuesta completa en un solo evento
+                parts.append(routed.answer)
+                yield sse_event("token", {"content": routed.answer})
+            else:
+                ai_result = await advanced_chat_completion(
+                    messages=messages,
+                    model=model,
+                    temperature=0.8,
+                    max_tokens=500,
+                    stream=True,
+                    route="chat_enhanced_stream"
+                )
+                if ai_result["success"]:
+                    async for chunk in ai_result["stream"]:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            delta = chunk.choices[0].delta.content
+                            parts.append(delta)
+                            yield sse_event("token", {"content": delta})
+                else:
+                    parts.append(ai_result["response"])
+                    yield sse_event("token", {"content": ai_result["response"]})
+        except LLMUnavailableError as e:
+            logger.warning(f"⚠️ LLM no disponible durante el stream: {e}")
+            if not parts:
+                fallback = generate_fallback_response(request.message)
+                parts.append(fallback)
+                yield sse_event("token", {"content": fallback})
+        except Exception as e:
+            logger.error(f"❌ Error en stream de respuesta: {str(e)}")
+            if not parts:
+                error_text = "Lo siento, hubo un error procesando tu mensaje. ¿Podrías intentar de nuevo?"
+                parts.append(error_text)
+                yield sse_event("token", {"content": error_text})
+        
+        # La sesión de la petición ya se cerró: el mensaje final se guarda con una propia
+        stream_db = SessionLocal()
+        try:
+            bot_msg = models.ChatMessage(
+                chat_id=request.chat_id,
+                sender="bot",
+                content="".join(parts)
+            )
+            stream_db.add(bot_msg)
+            stream_db.commit()
+            stream_db.refresh(bot_msg)
+            bot_message_id = bot_msg.id
+            recommendations = await get_product_recommendations(request.message, stream_db)
+        finally:
+            stream_db.close()
+        conversation_summary.schedule_update(request.chat_id)
+        
+        yield sse_event("recommendations", {"recommendations": recommendations})
+        yield sse_event("done", {
+            "message_id": bot_message_id,
+            "timestamp": datetime.utcnow().isoformat()
+        })
+        logger.info(f"✅ Respuesta en stream completada")
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/audio", response_model=ChatMessageResponse)
 async def send_audio_message(
     request: AudioMessageRequest,
@@ -257,8 +365,7 @@ async def send_image_message(
         user_msg = models.ChatMessage(
             chat_id=request.chat_id,
             sender="user",
-            content=f"[IMAGEN] {image_description}",
-            message_type="image"
+            content=f"[IMAGEN] {image_description}"
         )
         db.add(user_msg)
         db.commit()
@@ -268,8 +375,7 @@ async def send_image_message(
         bot_msg = models.ChatMessage(
             chat_id=request.chat_id,
             sender="bot",
-            content=combined_message,
-            message_type="image"
+            content=combined_message
         )
         db.add(bot_msg)
         db.commit()
@@ -15,6 +15,7 @@ from app.models import User, Product
 from app.models_sqlmodel.payment import PaymentTransaction
 from app.security import get_current_user
 from app.services.paypal_service import paypal_service
+from app.services.intelligent_cache_service import intelligent_cache
 
 router = APIRouter(prefix="/checkout", tags=["Checkout"])
 
@@ -82,6 +83,7 @@ async def create_order(
             db.add(order_item)
         
         db.commit()
+        await intelligent_cache.invalidate_user_orders(current_user.id)
         
         # Preparar datos para PayPal
         paypal_data = {
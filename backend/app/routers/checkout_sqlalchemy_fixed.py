@@ -12,6 +12,7 @@ from app.db import get_db
 from app.models import User, Product, Order, OrderItem
 from app.security import get_current_user
 from app.services.paypal_service import paypal_service
+from app.services.intelligent_cache_service import intelligent_cache
 from app.routers.invoices import generate_invoice_html, send_invoice_email
 from app.routers.admin_accounts import process_paypal_payment
 from app.routers.realtime import manager
@@ -82,6 +83,7 @@ async def create_order_sqlalchemy(
             db.add(order_item)
         
         db.commit()
+        await intelligent_cache.invalidate_user_orders(current_user.id)
         
         return {
             "order_id": order.id,
@@ -240,6 +242,7 @@ async def execute_paypal_payment_sqlalchemy(
             try:
                 # Procesar pago real (agregar a cuenta receptora, actualizar stock)
                 receiver = process_paypal_payment(db, order, order.total_amount)
+                await intelligent_cache.invalidate_stock([item.product_id for item in order.items])
                 
                 # Enviar factura por correo
                 invoice_html = generate_invoice_html(order, current_user)
@@ -323,6 +326,7 @@ async def execute_paypal_payment_sqlalchemy(
             if paypal_service.is_payment_completed(execution_response):
                 # Procesar pago real (agregar a cuenta receptora, actualizar stock)
                 receiver = process_paypal_payment(db, order, order.total_amount)
+                await intelligent_cache.invalidate_stock([item.product_id for item in order.items])
                 
                 # Enviar factura por correo
                 try:
@@ -10,10 +10,58 @@ from app.db import get_db
 from app import models
 from app.services.huggingface_image_service import huggingface_image_service
 from app.services.ai_service import ai_service
+from app.services.rag_service import rag_service
+from app.services.prompt_builder import count_tokens, fit_lines, prompt_budget, truncate_text
 
 router = APIRouter(prefix="/products/search", tags=["Product Search"])
 image_search_router = APIRouter(prefix="/image-search", tags=["Image Search"])
 
+# Modelo usado por ai_service.generate_response y reserva para su mensaje de sistema
+CATALOG_MODEL = "gpt-4-turbo-preview"
+CATALOG_MAX_COMPLETION_TOKENS = 500
+SYSTEM_PROMPT_RESERVE = 250
+DESCRIPTION_MAX_TOKENS = 60
+
+CATALOG_PROMPT = """TAREA: Analizar imagen y recomendar productos similares.
+
+DESCRIPCIÓN DE LA IMAGEN: "{description}"
+
+PRODUCTOS DISPONIBLES:
+{catalog}
+
+INSTRUCCIONES:
+1. Identifica qué tipo de producto se ve en la imagen (camisa, pantalón, zapatos, etc.)
+2. Busca en la lista SOLO productos del mismo tipo o muy similares
+3. Si NO HAY productos similares, responde "NO_MATCH"
+4. Si SÍ HAY productos similares, responde SOLO los IDs separados por comas
+5. Máximo 3 productos más relevantes
+
+FORMATO DE RESPUESTA: 
+- Si hay match: "1,3,5" (solo IDs)
+- Si no hay match: "NO_MATCH"
+
+RESPUESTA:"""
+
+
+def build_catalog_prompt(image_description: str, products: list) -> str:
+    """
+    Prompt de recomendación con el catálogo acotado al presupuesto de tokens:
+    los productos más parecidos a la descripción (BM25) van primero y el resto
+    entra mientras quede presupuesto
+    """
+    ranked_ids = [pid for pid, _ in rag_service.product_index.search(image_description, limit=len(products))]
+    position = {pid: i for i, pid in enumerate(ranked_ids)}
+    ranked = sorted(products, key=lambda p: position.get(p.id, len(position)))
+
+    lines = [
+        f"- ID:{p.id} | {p.title} | {truncate_text(p.description or '', DESCRIPTION_MAX_TOKENS, CATALOG_MODEL)}"
+        for p in ranked
+    ]
+    fixed_tokens = count_tokens(CATALOG_PROMPT.format(description=image_description, catalog=""), CATALOG_MODEL)
+    available = prompt_budget(CATALOG_MODEL, CATALOG_MAX_COMPLETION_TOKENS) - fixed_tokens - SYSTEM_PROMPT_RESERVE
+    catalog = "\n".join(fit_lines(lines, available, CATALOG_MODEL))
+    return CATALOG_PROMPT.format(description=image_description, catalog=catalog)
+
 
 @router.post("/by-image")
 async def search_products_by_image(
@@ -52,28 +100,8 @@ async def search_products_by_image(
         search_query = f"Buscar productos similares a: {image_description}"
         
         # Usar IA para recomendar productos basados en la descripción
-        products_list = "\n".join([f"- ID:{p.id} | {p.title} | {p.description}" for p in products])
-        
         ai_response = await ai_service.generate_response(
-            prompt=f"""TAREA: Analizar imagen y recomendar productos similares.
-
-DESCRIPCIÓN DE LA IMAGEN: "{image_description}"
-
-PRODUCTOS DISPONIBLES:
-{products_list}
-
-INSTRUCCIONES:
-1. Identifica qué tipo de producto se ve en la imagen (camisa, pantalón, zapatos, etc.)
-2. Busca en la lista SOLO productos del mismo tipo o muy similares
-3. Si NO HAY productos similares, responde "NO_MATCH"
-4. Si SÍ HAY productos similares, responde SOLO los IDs separados por comas
-5. Máximo 3 productos más relevantes
-
-FORMATO DE RESPUESTA: 
-- Si hay match: "1,3,5" (solo IDs)
-- Si no hay match: "NO_MATCH"
-
-RESPUESTA:"""
+            prompt=build_catalog_prompt(image_description, products)
         )
         
         # Filtrar productos mencionados por la IA
@@ -102,10 +130,12 @@ RESPUESTA:"""
                 # Convertir a enteros
                 product_ids = [int(id_str) for id_str in ids_found[:3]]  # Máximo 3
                 
-                # Obtener productos por ID
+                # Obtener productos por ID del catálogo ya cargado: los IDs que inventa
+                # el LLM no llegan a la base de datos
+                products_by_id = {p.id: p for p in products}
                 for pid in product_ids:
-                    product = db.get(models.Product, pid)
-                    if product and product.active:
+                    product = products_by_id.get(pid)
+                    if product:
                         recommended_products.append({
                             "id": product.id,
                             "title": product.title,
@@ -265,28 +295,8 @@ async def search_by_image_frontend(
         search_query = f"Buscar productos similares a: {image_description}"
         
         # Usar IA para recomendar productos basados en la descripción
-        products_list = "\n".join([f"- ID:{p.id} | {p.title} | {p.description}" for p in products])
-        
         ai_response = await ai_service.generate_response(
-            prompt=f"""TAREA: Analizar imagen y recomendar productos similares.
-
-DESCRIPCIÓN DE LA IMAGEN: "{image_description}"
-
-PRODUCTOS DISPONIBLES:
-{products_list}
-
-INSTRUCCIONES:
-1. Identifica qué tipo de producto se ve en la imagen (camisa, pantalón, zapatos, etc.)
-2. Busca en la lista SOLO productos del mismo tipo o muy similares
-3. Si NO HAY productos similares, responde "NO_MATCH"
-4. Si SÍ HAY productos similares, responde SOLO los IDs separados por comas
-5. Máximo 3 productos más relevantes
-
-FORMATO DE RESPUESTA: 
-- Si hay match: "1,3,5" (solo IDs)
-- Si no hay match: "NO_MATCH"
-
-RESPUESTA:"""
+            prompt=build_catalog_prompt(image_description, products)
         )
         
         # Filtrar productos mencionados por la IA
@@ -315,10 +325,12 @@ RESPUESTA:"""
                 # Convertir a enteros
                 product_ids = [int(id_str) for id_str in ids_found[:3]]  # Máximo 3
                 
-                # Obtener productos por ID
+                # Obtener productos por ID del catálogo ya cargado: los IDs que inventa
+                # el LLM no llegan a la base de datos
+                products_by_id = {p.id: p for p in products}
                 for pid in product_ids:
-                    product = db.get(models.Product, pid)
-                    if product and product.active:
+                    product = products_by_id.get(pid)
+                    if product:
                         recommended_products.append({
                             "id": product.id,
                             "title": product.title,
@@ -1,10 +1,12 @@
 from typing import List
+from anyio import from_thread
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session, joinedload
 
 from ..db import get_db
 from .. import models, schemas
 from ..security import get_current_user
+from ..services.intelligent_cache_service import intelligent_cache
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
@@ -94,4 +96,6 @@ def create_order(
 
     db.commit()
     db.refresh(order)
+    # Las recomendaciones personalizadas dependen del historial de compras
+    from_thread.run(intelligent_cache.invalidate_user_orders, user.id)
     return order
@@ -1,38 +1,154 @@
 # backend/app/routers/products.py
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
+import asyncio
+from anyio import from_thread
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query, Request, Response
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Dict, List, Literal, Optional
 from uuid import uuid4
+from datetime import datetime
 import os
 from ..database.connection import get_db
 from .. import schemas
 from ..models_sqlmodel.product import Product, ProductImage
 from ..models_sqlmodel.user import User
 from ..security import get_current_admin  # 👈 protege con JWT + rol admin
-from app.services.intelligent_cache_service import intelligent_cache
+from ..repositories.product_repository import InvalidCursor, ProductPageFilters, ProductRepository
+from app.core.config import settings
+from app.services.intelligent_cache_service import CATALOG_TAG, intelligent_cache, product_tag
+from app.services.response_cache import cache_headers, response_cache
+from app.services.product_guard import product_guard
+from app.services.rag_service import rag_service
 
 router = APIRouter(prefix="/products", tags=["products"])
 
+def _invalidate_product(product_id: int):
+    """Invalida el caché del producto desde un endpoint síncrono (corre en el threadpool)"""
+    from_thread.run(intelligent_cache.invalidate_product_cache, product_id)
+
+def _reject_missing(product_id: int):
+    """
+    IDs inexistentes (bots, enlaces viejos) se rechazan sin consultar la base de datos; va
+    antes del ETag para que un ID inventado no cree la versión de su tag en el caché
+    """
+    if from_thread.run(product_guard.is_missing, product_id):
+        raise HTTPException(status_code=404, detail="Producto no encontrado")
+
+def _check_not_modified(request: Request, key: str, product_id: int):
+    """ETag del producto y 304 si el cliente ya lo tiene, antes de tocar la base de datos"""
+    return from_thread.run(response_cache.check_not_modified, request, key, [product_tag(product_id)])
+
+_product_list_adapter = TypeAdapter(List[schemas.ProductOut])
+
+def _page_limit(limit: Optional[int]) -> int:
+    return min(limit or settings.product_page_default_limit, settings.product_page_max_limit)
+
+def _get_page(db: Session, filters: ProductPageFilters, limit: int, cursor: Optional[str]):
+    """Consulta síncrona: corre en el threadpool, nunca en el event loop"""
+    try:
+        return ProductRepository(db).fetch_page(filters, limit, cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _next_page_headers(request: Request, next_cursor: Optional[str]) -> Dict[str, str]:
+    """Cursor de la página siguiente en ``X-Next-Cursor`` y ``Link`` (el cuerpo sigue siendo una lista)"""
+    if not next_cursor:
+        return {}
+    next_url = request.url.include_query_params(cursor=next_cursor)
+    return {"X-Next-Cursor": next_cursor, "Link": f'<{next_url}>; rel="next"'}
+
 @router.get("", response_model=List[schemas.ProductOut])
-async def list_products(db: Session = Depends(get_db)):
-    """Listar productos (CON CACHÉ INTELIGENTE)"""
-    # Usar caché inteligente en lugar de consulta directa
-    products_data = await intelligent_cache.get_all_products(db, active_only=True)
-    return products_data
+async def list_products(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    category: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    in_stock: Optional[bool] = None,
+    sort: Optional[Literal["id", "newest"]] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Listar productos (CON CACHÉ INTELIGENTE)
+    Se valida y serializa una vez por versión del catálogo; los hits devuelven los bytes.
+    Con ``limit``, ``cursor``, filtros u orden se pagina por cursor: cada combinación de
+    página y filtros tiene su propia entrada en el caché de respuestas
+    """
+    if all(param is None for param in (cursor, limit, category, min_price, max_price, in_stock, sort)):
+        async def render() -> bytes:
+            # Usar caché inteligente en lugar de consulta directa
+            products_data = await intelligent_cache.get_all_products(db, active_only=True)
+            return _product_list_adapter.dump_json(_product_list_adapter.validate_python(products_data))
+
+        return await response_cache.get_or_render(request, "products:list", [CATALOG_TAG], render)
+
+    filters = ProductPageFilters(
+        category=category,
+        min_price=min_price,
+        max_price=max_price,
+        in_stock=in_stock,
+        sort=sort or "id"
+    )
+    limit = _page_limit(limit)
+
+    def render_page_sync():
+        products, next_cursor = _get_page(db, filters, limit, cursor)
+        body = _product_list_adapter.dump_json(_product_list_adapter.validate_python(products))
+        return body, _next_page_headers(request, next_cursor)
+
+    async def render_page():
+        return await asyncio.to_thread(render_page_sync)
+
+    key = f"products:page:{filters.cache_key()}:cursor={cursor}:limit={limit}"
+    return await response_cache.get_or_render(request, key, [CATALOG_TAG], render_page)
 
 @router.get("/all", response_model=List[schemas.ProductOut])
-def list_all_products(db: Session = Depends(get_db), admin: User = Depends(get_current_admin)):
+def list_all_products(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    active: Optional[bool] = None,
+    category: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    in_stock: Optional[bool] = None,
+    sort: Optional[Literal["id", "newest"]] = None,
+    db: Session = Depends(get_db),
+    admin: User = Depends(get_current_admin)
+):
     """
     Lista todos los productos (activos e inactivos) - Solo para administradores.
     Útil para el historial de compras donde pueden aparecer productos desactivados.
+    Acepta la misma paginación por cursor y filtros que ``GET /products`` (más ``active``)
     """
-    return db.query(Product).all()
+    if all(param is None for param in (cursor, limit, active, category, min_price, max_price, in_stock, sort)):
+        return db.query(Product).all()
+
+    filters = ProductPageFilters(
+        category=category,
+        min_price=min_price,
+        max_price=max_price,
+        in_stock=in_stock,
+        active=active,
+        sort=sort or "id"
+    )
+    products, next_cursor = _get_page(db, filters, _page_limit(limit), cursor)
+    response.headers.update(_next_page_headers(request, next_cursor))
+    return products
 
 @router.get("/{product_id}", response_model=schemas.ProductOut)
-def get_product(product_id: int, db: Session = Depends(get_db)):
+def get_product(product_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    _reject_missing(product_id)
+    etag, not_modified = _check_not_modified(request, f"product:{product_id}", product_id)
+    if not_modified:
+        return not_modified
     p = db.query(Product).get(product_id)
     if not p:
+        from_thread.run(product_guard.remember_missing, product_id)
         raise HTTPException(status_code=404, detail="Producto no encontrado")
+    response.headers.update(cache_headers(etag))
     return p
 
 @router.post("", response_model=schemas.ProductOut, status_code=201, dependencies=[Depends(get_current_admin)])
@@ -42,11 +158,15 @@ def create_product(data: schemas.ProductCreate, db: Session = Depends(get_db)):
         description=data.description,
         price=data.price,
         image_url=data.image_url,
-        active=True
+        active=True,
+        created_at=datetime.utcnow(),
+        updated_at=datetime.utcnow()
     )
     db.add(p)
     db.commit()
     db.refresh(p)
+    rag_service.index_product(p)
+    _invalidate_product(p.id)
     return p
 
 @router.put("/{product_id}", response_model=schemas.ProductOut, dependencies=[Depends(get_current_admin)])
@@ -59,8 +179,11 @@ def update_product(product_id: int, data: schemas.ProductUpdate, db: Session = D
     if data.price is not None: p.price = data.price
     if data.image_url is not None: p.image_url = data.image_url
     if data.active is not None: p.active = data.active
+    p.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(p)
+    rag_service.index_product(p)
+    _invalidate_product(p.id)
     return p
 
 @router.delete("/{product_id}", status_code=204, dependencies=[Depends(get_current_admin)])
@@ -70,6 +193,8 @@ def delete_product(product_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Producto no encontrado")
     db.delete(p)
     db.commit()
+    rag_service.remove_product(product_id)
+    _invalidate_product(product_id)
     return
 
 # ---------- Imágenes ----------
@@ -77,10 +202,16 @@ def _media_base_url():
     return "/media"
 
 @router.get("/{product_id}/images", response_model=List[schemas.ProductImageOut])
-def list_images(product_id: int, db: Session = Depends(get_db)):
+def list_images(product_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    _reject_missing(product_id)
+    etag, not_modified = _check_not_modified(request, f"product:{product_id}:images", product_id)
+    if not_modified:
+        return not_modified
     p = db.query(Product).get(product_id)
     if not p:
+        from_thread.run(product_guard.remember_missing, product_id)
         raise HTTPException(status_code=404, detail="Producto no encontrado")
+    response.headers.update(cache_headers(etag))
     return p.images
 
 @router.post("/{product_id}/images", response_model=schemas.ProductImageOut, status_code=201, dependencies=[Depends(get_current_admin)])
@@ -107,6 +238,7 @@ async def upload_image(product_id: int, file: UploadFile = File(...), db: Sessio
     db.add(img)
     db.commit()
     db.refresh(img)
+    await intelligent_cache.invalidate_product_cache(p.id)
     return img
 
 @router.delete("/{product_id}/images/{image_id}", status_code=204, dependencies=[Depends(get_current_admin)])
@@ -123,4 +255,5 @@ def delete_image(product_id: int, image_id: int, db: Session = Depends(get_db)):
             pass
     db.delete(img)
     db.commit()
+    _invalidate_product(product_id)
     return
@@ -2,12 +2,13 @@
 Router para sistema de recomendaciones inteligentes
 Muestra productos recomendados sin consultar DB (usa caché)
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlmodel import Session
 from typing import List, Dict, Any, Optional
 
 from app.database import get_db
-from app.services.intelligent_cache_service import intelligent_cache
+from app.services.intelligent_cache_service import CATALOG_TAG, intelligent_cache
+from app.services.response_cache import encode_json, response_cache
 from app.routers.auth import get_current_user
 
 router = APIRouter(prefix="/recommendations", tags=["Recommendations"])
@@ -64,24 +65,27 @@ async def get_recommendations_for_user(
 
 
 @router.get("/quick-products")
-async def get_quick_products(db: Session = Depends(get_db)):
+async def get_quick_products(request: Request, db: Session = Depends(get_db)):
     """
     Productos para mostrar inmediatamente al entrar
-    OPTIMIZADO - Siempre desde caché
+    OPTIMIZADO - Respuesta ya serializada en memoria
     """
-    try:
+    async def render() -> bytes:
         # Obtener productos desde caché
         products = await intelligent_cache.get_all_products(db, active_only=True)
         
         # Tomar solo los primeros 6 para carga rápida
         quick_products = products[:6]
         
-        return {
+        return encode_json({
             "products": quick_products,
             "from_cache": True,
             "load_time_ms": 0,  # Casi instantáneo desde Redis
             "total": len(quick_products)
-        }
+        })
+    
+    try:
+        return await response_cache.get_or_render(request, "recommendations:quick", [CATALOG_TAG], render)
         
     except Exception as e:
         print(f"Error obteniendo productos rápidos: {e}")
@@ -105,13 +109,7 @@ async def track_product_view(
         track_key = f"tracking:user:{user_id}:products"
         
         # Obtener tracking actual
-        current_tracking = await intelligent_cache.cache.get(track_key)
-        
-        if current_tracking:
-            import json
-            viewed_products = json.loads(current_tracking)
-        else:
-            viewed_products = []
+        viewed_products = await intelligent_cache.cache.get(track_key) or []
         
         # Agregar producto visto
         if product_id not in viewed_products:
@@ -120,12 +118,8 @@ async def track_product_view(
             # Mantener solo últimos 20 productos vistos
             viewed_products = viewed_products[-20:]
             
-            # Guardar en Redis
-            await intelligent_cache.cache.set(
-                track_key,
-                json.dumps(viewed_products),
-                expire=86400  # 24 horas
-            )
+            # Guardar en caché (TTL del namespace tracking: 24 horas)
+            await intelligent_cache.cache.set(track_key, viewed_products)
         
         return {"message": "Tracking registrado", "total_viewed": len(viewed_products)}
         
@@ -135,20 +129,23 @@ async def track_product_view(
 
 
 @router.get("/trending")
-async def get_trending_products(db: Session = Depends(get_db)):
+async def get_trending_products(request: Request, db: Session = Depends(get_db)):
     """
     Productos trending (más vistos)
     Basado en tracking de Redis
     """
-    try:
+    async def render() -> bytes:
         # Por ahora retornar productos populares
         products = await intelligent_cache._get_popular_products(db)
         
-        return {
+        return encode_json({
             "trending": products[:5],
             "period": "24h",
             "from_cache": True
-        }
+        })
+    
+    try:
+        return await response_cache.get_or_render(request, "recommendations:trending", [CATALOG_TAG], render)
         
     except Exception as e:
         print(f"Error obteniendo trending: {e}")
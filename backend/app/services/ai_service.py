@@ -5,15 +5,24 @@ Siguiendo el principio de Single Responsibility (SOLID)
 import os
 from typing import Optional, List, Dict, Any
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict
+
+from app.services.llm_gateway import llm_gateway, LLMUnavailableError
+from app.services.model_router import model_router
+from app.services.openai_service import generate_fallback_response
+from app.services.singleflight import llm_singleflight, make_key
 
 try:
-    from openai import OpenAI
+    import openai
     OPENAI_AVAILABLE = True
 except ImportError:
     OPENAI_AVAILABLE = False
 
 
+# Modelo de las rutas del asistente con LLM_ROUTER_ENABLED=false
+ASSISTANT_MODEL = "gpt-4-turbo-preview"
+
+
 @dataclass
 class AIResponse:
     """Response model para respuestas de IA"""
@@ -47,15 +56,10 @@ class OpenAIService(AIServiceInterface):
         from app.core.config import settings
         
         self.api_key = api_key or settings.openai_api_key
-        self.client = None
-        
-        if OPENAI_AVAILABLE and self.api_key:
-            try:
-                self.client = OpenAI(api_key=self.api_key)
-                print("OpenAI client inicializado correctamente")
-            except Exception as e:
-                print(f"Error inicializando OpenAI client: {e}")
-                self.client = None
+        # Cliente compartido del LLM Gateway (pool HTTP, reintentos y circuit breaker)
+        self.client = llm_gateway.client
+        if self.client:
+            print("OpenAI client inicializado correctamente")
     
     async def generate_response(self, prompt: str, context: Dict[str, Any] = None) -> AIResponse:
         """Genera respuesta usando GPT-4 Turbo"""
@@ -68,25 +72,23 @@ class OpenAIService(AIServiceInterface):
         
         try:
             messages = self._build_messages(prompt, context)
+            model = model_router.choose("assistant", prompt, ASSISTANT_MODEL).model
             
-            response = self.client.chat.completions.create(
-                model="gpt-4-turbo-preview",
-                messages=messages,
-                temperature=0.7,
-                max_tokens=500,
-                stream=False
+            # Prompts idénticos en curso comparten una sola llamada a OpenAI
+            return await llm_singleflight.do(
+                make_key(messages=messages, model=model, temperature=0.7, max_tokens=500),
+                lambda: self._complete(messages, model),
+                encode=asdict,
+                decode=lambda data: AIResponse(**data),
+                shareable=lambda response: response.success
             )
             
+        except LLMUnavailableError as e:
             return AIResponse(
-                success=True,
-                content=response.choices[0].message.content,
-                usage={
-                    "prompt_tokens": response.usage.prompt_tokens,
-                    "completion_tokens": response.usage.completion_tokens,
-                    "total_tokens": response.usage.total_tokens
-                }
+                success=False,
+                content=generate_fallback_response(prompt),
+                error=str(e)
             )
-            
         except Exception as e:
             return AIResponse(
                 success=False,
@@ -94,6 +96,25 @@ class OpenAIService(AIServiceInterface):
                 error=str(e)
             )
     
+    async def _complete(self, messages: List[Dict[str, str]], model: str) -> AIResponse:
+        response = await llm_gateway.chat_completion(
+            model=model,
+            messages=messages,
+            temperature=0.7,
+            max_tokens=500,
+            route="assistant"
+        )
+        
+        return AIResponse(
+            success=True,
+            content=response.choices[0].message.content,
+            usage={
+                "prompt_tokens": response.usage.prompt_tokens,
+                "completion_tokens": response.usage.completion_tokens,
+                "total_tokens": response.usage.total_tokens
+            }
+        )
+    
     def _build_messages(self, prompt: str, context: Dict[str, Any] = None) -> List[Dict[str, str]]:
         """Construye mensajes para el chat"""
         messages = []
@@ -136,8 +157,9 @@ class OpenAIService(AIServiceInterface):
             return {"intent": "general", "confidence": 0.5, "entities": []}
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4-turbo-preview",
+            response = await llm_gateway.chat_completion(
+                model=model_router.fast_model(ASSISTANT_MODEL),
+                route="intent",
                 messages=[
                     {
                         "role": "system",
@@ -3,12 +3,8 @@ Servicio de procesamiento de audio usando OpenAI Whisper
 Para reconocimiento de voz de alta calidad
 """
 import base64
-import io
-import tempfile
-import os
 from typing import Optional
-from openai import OpenAI
-from app.core.config import settings
+from app.services.llm_gateway import llm_gateway
 import logging
 
 logger = logging.getLogger(__name__)
@@ -17,16 +13,12 @@ class AudioService:
     """Servicio para procesamiento de audio con IA"""
     
     def __init__(self):
-        self.openai_client = None
+        # Cliente compartido del LLM Gateway (pool HTTP, reintentos y circuit breaker)
+        self.openai_client = llm_gateway.client
         self.supported_formats = ['wav', 'mp3', 'm4a', 'webm', 'ogg']
         
-        if settings.openai_api_key:
-            try:
-                self.openai_client = OpenAI(api_key=settings.openai_api_key)
-                logger.info("✅ OpenAI client inicializado correctamente para AudioService")
-            except Exception as e:
-                logger.error(f"❌ Error inicializando OpenAI client: {e}")
-                self.openai_client = None
+        if self.openai_client:
+            logger.info("✅ OpenAI client inicializado correctamente para AudioService")
         else:
             logger.warning("⚠️ OpenAI API Key no configurada para AudioService")
     
@@ -48,28 +40,17 @@ class AudioService:
         try:
             logger.info(f"🎤 Iniciando transcripción de audio: {filename}")
             
-            # Crear archivo temporal
-            with tempfile.NamedTemporaryFile(delete=False, suffix=f".{filename.split('.')[-1]}") as temp_file:
-                temp_file.write(audio_data)
-                temp_file_path = temp_file.name
+            # El audio se envía desde memoria, sin archivo temporal
+            transcript = await llm_gateway.transcribe(
+                audio_data,
+                filename,
+                model="whisper-1",
+                language="es",  # Español
+                response_format="text"
+            )
             
-            try:
-                # Transcribir con OpenAI Whisper
-                with open(temp_file_path, "rb") as audio_file:
-                    transcript = self.openai_client.audio.transcriptions.create(
-                        model="whisper-1",
-                        file=audio_file,
-                        language="es",  # Español
-                        response_format="text"
-                    )
-                
-                logger.info(f"✅ Transcripción exitosa: {transcript[:50]}...")
-                return transcript.strip()
-                
-            finally:
-                # Limpiar archivo temporal
-                if os.path.exists(temp_file_path):
-                    os.unlink(temp_file_path)
+            logger.info(f"✅ Transcripción exitosa: {transcript[:50]}...")
+            return transcript.strip()
                     
         except Exception as e:
             logger.error(f"❌ Error en transcripción de audio: {str(e)}")
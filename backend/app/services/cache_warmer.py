@@ -0,0 +1,157 @@
+"""
+Precalentamiento del caché en segundo plano
+Arranca desde el lifespan sin retrasar el arranque: recorre los objetivos por prioridad
+(catálogo, filtro de IDs, recomendaciones y plantillas de FAQ) y los vuelve a
+calentar cuando cambia la versión del tag ``catalog``. El estado warm/cold se expone en /health.
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.services.intelligent_cache_service import CATALOG_TAG, intelligent_cache
+from app.services.product_guard import product_guard
+from app.services.response_router import response_router
+from app.services.tiered_cache import tiered_cache
+
+
+@dataclass
+class WarmTarget:
+    """Un grupo de claves a precargar; menor ``priority`` se calienta antes"""
+    name: str
+    priority: int
+    warm: Callable[[], Awaitable[Any]]
+    depends_on_catalog: bool = True
+    # Para namespaces de TTL corto: se recalienta antes de que expiren
+    max_age_seconds: Optional[float] = None
+    warmed_at: Optional[float] = None
+    duration_ms: Optional[float] = None
+    error: Optional[str] = None
+
+    def is_due(self, now: float) -> bool:
+        if self.warmed_at is None:
+            return True
+        return self.max_age_seconds is not None and now - self.warmed_at >= self.max_age_seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "warm": self.warmed_at is not None,
+            "priority": self.priority,
+            "warmed_at": datetime.fromtimestamp(self.warmed_at).isoformat() if self.warmed_at else None,
+            "duration_ms": self.duration_ms,
+            "error": self.error
+        }
+
+
+# ==================== OBJETIVOS ====================
+
+async def _warm_products() -> None:
+    await intelligent_cache.get_all_products(None, active_only=True)
+
+
+async def _warm_product_guard() -> None:
+    if settings.product_guard_enabled and not await product_guard.ensure_current():
+        raise RuntimeError("filtro de productos no disponible")
+
+
+async def _warm_recommendations() -> None:
+    # Sin usuario la carga abre su propia sesión en un hilo
+    await intelligent_cache.get_personalized_recommendations(None, None)
+
+
+async def _warm_faq_templates() -> None:
+    await asyncio.to_thread(response_router.compile_templates)
+
+
+class CacheWarmer:
+    """Planificador del precalentamiento (una tarea de fondo por worker)"""
+
+    def __init__(self, targets: Optional[List[WarmTarget]] = None):
+        self.targets = sorted(targets or [
+            WarmTarget("products", 0, _warm_products),
+            WarmTarget("product_guard", 1, _warm_product_guard),
+            WarmTarget("recommendations", 2, _warm_recommendations),
+            WarmTarget("faq_templates", 3, _warm_faq_templates, depends_on_catalog=False),
+        ], key=lambda target: target.priority)
+        self.catalog_version: Optional[int] = None
+        self.running = False
+        self.rounds = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Lanza el calentamiento en segundo plano y vuelve de inmediato"""
+        if not settings.cache_warm_enabled:
+            print("💡 Precalentamiento del caché desactivado")
+            return
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _current_catalog_version(self) -> int:
+        return (await tiered_cache.get_tag_versions([CATALOG_TAG]))[CATALOG_TAG]
+
+    async def _warm(self, targets: List[WarmTarget]) -> None:
+        self.running = True
+        try:
+            for target in targets:
+                started = time.monotonic()
+                try:
+                    await target.warm()
+                    target.warmed_at = time.time()
+                    target.error = None
+                except Exception as e:
+                    target.error = str(e)
+                    print(f"⚠️ No se pudo precalentar {target.name}: {e}")
+                target.duration_ms = round((time.monotonic() - started) * 1000, 1)
+        finally:
+            self.running = False
+        self.rounds += 1
+
+    async def _loop(self) -> None:
+        self.catalog_version = await self._current_catalog_version()
+        await self._warm(self.targets)
+        print(f"🔥 Caché precalentado: {', '.join(t.name for t in self.targets if t.warmed_at)}")
+
+        while True:
+            await asyncio.sleep(settings.cache_warm_check_seconds)
+            try:
+                version = await self._current_catalog_version()
+                catalog_changed = version != self.catalog_version
+                # Si cambió el catálogo las claves viejas quedaron huérfanas por el tag
+                self.catalog_version = version
+                now = time.time()
+                due = [
+                    target for target in self.targets
+                    if target.is_due(now) or (catalog_changed and target.depends_on_catalog)
+                ]
+                if due:
+                    await self._warm(due)
+            except Exception as e:
+                print(f"Error en el precalentamiento del caché: {e}")
+
+    @property
+    def state(self) -> str:
+        if not settings.cache_warm_enabled:
+            return "disabled"
+        if self.running:
+            return "warming"
+        if all(target.warmed_at is not None for target in self.targets):
+            return "warm"
+        return "cold"
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "rounds": self.rounds,
+            "catalog_version": self.catalog_version,
+            "targets": {target.name: target.to_dict() for target in self.targets}
+        }
+
+
+# Instancia global
+cache_warmer = CacheWarmer()
@@ -39,14 +39,15 @@ class ChatOptimizer:
         user_id = user_context.get("user_id") or "guest"
         user_type = user_context.get("user_type", "guest")
         
-        # 1. Verificar cache de respuesta completa
+        # 1. Verificar cache de respuesta completa (intención y spam vienen en el mismo viaje a Redis)
+        state = {}
         if self.cache_enabled:
-            cached_response = await redis_cache.get_cached_response(message)
-            if cached_response:
+            state = await redis_cache.get_message_state(message)
+            if state["response"]:
                 print(f"🚀 Respuesta obtenida desde cache para: {message[:30]}...")
-                return cached_response
+                return state["response"]
         
-        # 2. Verificar rate limiting con cache
+        # 2. Verificar rate limiting (ventana atómica compartida entre workers)
         if not await self._check_rate_limit_cached(user_id):
             return {
                 "type": "error",
@@ -54,26 +55,21 @@ class ChatOptimizer:
                 "context": {"rate_limited": True}
             }
         
-        # 3. Verificar cache de análisis de intención
-        intent = None
-        if self.cache_enabled:
-            intent = await redis_cache.get_cached_intent_analysis(message)
-        
+        # 3. Análisis de intención (cacheado)
+        intent = state.get("intent")
+        new_intent = None
         if not intent:
-            intent = self._analyze_user_intent(message)
-            if self.cache_enabled:
-                await redis_cache.cache_intent_analysis(message, intent)
-        
-        # 4. Verificar cache de detección de spam
-        spam_result = None
-        if self.cache_enabled:
-            spam_result = await redis_cache.get_cached_spam_detection(message)
+            intent = new_intent = self._analyze_user_intent(message)
         
+        # 4. Detección de spam (cacheada)
+        spam_result = state.get("spam")
+        new_spam = None
         if not spam_result:
             is_spam = self._detect_spam(message, user_id)
-            spam_result = {"is_spam": is_spam, "timestamp": datetime.now().isoformat()}
-            if self.cache_enabled:
-                await redis_cache.cache_spam_detection(message, is_spam)
+            spam_result = new_spam = {"is_spam": is_spam, "timestamp": datetime.now().isoformat()}
+        
+        if self.cache_enabled:
+            await redis_cache.save_message_state(message, new_intent, new_spam)
         
         if spam_result["is_spam"]:
             return {
@@ -439,37 +435,13 @@ class ChatOptimizer:
     # ==================== MÉTODOS OPTIMIZADOS CON REDIS ====================
     
     async def _check_rate_limit_cached(self, user_id: str) -> bool:
-        """Verifica rate limiting usando cache"""
+        """
+        Verifica rate limiting (10 mensajes por minuto) con una ventana deslizante en Redis:
+        el conteo es atómico y lo comparten todos los workers, sin pasar por el L1
+        """
         if not self.cache_enabled:
             return self._check_rate_limit(user_id)
-        
-        cached_data = await redis_cache.get_cached_rate_limit(user_id)
-        now = time.time()
-        
-        if cached_data:
-            # Usar datos del cache
-            messages = cached_data.get("messages", [])
-            last_reset = cached_data.get("last_reset", now)
-            
-            # Limpiar mensajes antiguos (últimos 60 segundos)
-            messages = [msg_time for msg_time in messages if now - msg_time < 60]
-            
-            if len(messages) >= 10:
-                return False
-            
-            messages.append(now)
-            await redis_cache.cache_rate_limit(user_id, {
-                "messages": messages,
-                "last_reset": last_reset
-            })
-            return True
-        else:
-            # Primera vez, crear entrada
-            await redis_cache.cache_rate_limit(user_id, {
-                "messages": [now],
-                "last_reset": now
-            })
-            return True
+        return await redis_cache.hit_rate_limit(user_id, limit=10, window_seconds=60)
     
     async def _optimize_context_cached(
         self, 
@@ -479,37 +451,30 @@ class ChatOptimizer:
     ) -> Dict[str, Any]:
         """Optimiza el contexto usando cache"""
         user_id = user_context.get("user_id")
+        chat_id = user_context.get("chat_id")
         
-        # Cache de productos
-        products_data = None
+        # Productos, sesión e historial cacheados en un solo viaje a Redis
+        cached = {}
         if self.cache_enabled:
-            products_data = await redis_cache.get_cached_product_context()
+            cached = await redis_cache.get_context_state(user_id, chat_id)
         
+        products_data = cached.get("products")
+        new_products = None
         if not products_data:
-            products_data = self._get_relevant_products(message, db)
-            if self.cache_enabled and products_data:
-                await redis_cache.cache_product_context(products_data)
-        
-        # Cache de sesión de usuario
-        session_data = None
-        if self.cache_enabled and user_id:
-            session_data = await redis_cache.get_cached_user_session(str(user_id))
+            products_data = new_products = self._get_relevant_products(message, db)
         
+        session_data = cached.get("session")
+        new_session = None
         if not session_data:
-            session_data = self._get_user_preferences(user_id, db)
-            if self.cache_enabled and user_id:
-                await redis_cache.cache_user_session(str(user_id), session_data)
-        
-        # Cache de historial de conversación
-        history = []
-        chat_id = user_context.get("chat_id")
-        if self.cache_enabled and chat_id:
-            history = await redis_cache.get_cached_conversation_history(chat_id) or []
+            session_data = new_session = self._get_user_preferences(user_id, db)
         
+        history = cached.get("history") or []
+        new_history = None
         if not history and user_id:
-            history = self._get_optimized_history(user_id, db)
-            if self.cache_enabled and chat_id:
-                await redis_cache.cache_conversation_history(chat_id, history)
+            history = new_history = self._get_optimized_history(user_id, db)
+        
+        if self.cache_enabled:
+            await redis_cache.save_context_state(user_id, chat_id, new_products, new_session, new_history)
         
         return {
             "history": history,
@@ -557,6 +522,10 @@ class ChatOptimizer:
             "session_start": datetime.now().isoformat()
         }
         
+        # La misma clave guarda las preferencias del contexto: completar los campos de métricas
+        session_data.setdefault("message_count", 0)
+        session_data.setdefault("intents", {})
+        
         # Actualizar métricas
         session_data["message_count"] += 1
         session_data["last_activity"] = datetime.now().isoformat()
@@ -0,0 +1,132 @@
+"""
+Resúmenes acumulativos de conversación
+Cada chat guarda un resumen de los mensajes antiguos; los prompts usan ese resumen
+más los últimos mensajes, así el tamaño del prompt no crece con la conversación
+"""
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.db import SessionLocal
+from app import models
+from app.services.llm_gateway import llm_gateway
+
+
+SUMMARY_PROMPT = """Eres el asistente de una tienda online. Actualiza el resumen de la conversación con el cliente.
+Conserva: productos consultados o recomendados, preferencias (talla, color, presupuesto), pedidos o problemas mencionados y preguntas pendientes.
+Omite saludos y detalles irrelevantes. Escribe en español, en tercera persona, máximo 150 palabras."""
+
+
+class ConversationSummaryService:
+    """Mantiene ``Chat.summary`` al día en segundo plano"""
+
+    def __init__(self):
+        self._in_progress: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    # ==================== LECTURA ====================
+
+    def get_context(
+        self,
+        db,
+        chat_id: int,
+        exclude_message_id: Optional[int] = None
+    ) -> Tuple[Optional[str], List[models.ChatMessage]]:
+        """
+        Devuelve (resumen, mensajes aún no resumidos) en orden cronológico; como el resumen
+        se actualiza cada pocos turnos, la cantidad de mensajes queda acotada
+        """
+        chat = db.get(models.Chat, chat_id)
+        summary = chat.summary if chat else None
+        covered_until = chat.summary_message_id if chat and chat.summary_message_id else 0
+
+        query = db.query(models.ChatMessage).filter(
+            models.ChatMessage.chat_id == chat_id,
+            models.ChatMessage.id > covered_until
+        )
+        if exclude_message_id is not None:
+            query = query.filter(models.ChatMessage.id != exclude_message_id)
+        limit = settings.chat_summary_recent_messages + settings.chat_summary_every_turns * 2
+        recent = query.order_by(models.ChatMessage.id.desc()).limit(limit).all()
+        return summary, list(reversed(recent))
+
+    def get_history(self, db, chat_id: int, exclude_message_id: Optional[int] = None) -> Tuple[Optional[str], List[Dict[str, str]]]:
+        """Igual que ``get_context`` pero con los mensajes como diccionarios ``sender``/``content``"""
+        summary, recent = self.get_context(db, chat_id, exclude_message_id)
+        return summary, [{"sender": msg.sender, "content": msg.content} for msg in recent]
+
+    # ==================== ACTUALIZACIÓN ====================
+
+    def schedule_update(self, chat_id: int) -> None:
+        """Lanza la actualización del resumen sin bloquear la respuesta al cliente"""
+        if chat_id in self._in_progress:
+            return
+        self._in_progress.add(chat_id)
+        task = asyncio.create_task(self._update_summary(chat_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _pending_messages(self, chat_id: int):
+        """Mensajes que quedaron fuera de la ventana reciente y aún no están en el resumen"""
+        db = SessionLocal()
+        try:
+            chat = db.get(models.Chat, chat_id)
+            if chat is None:
+                return None, []
+            covered_until = chat.summary_message_id or 0
+            messages = db.query(models.ChatMessage).filter(
+                models.ChatMessage.chat_id == chat_id,
+                models.ChatMessage.id > covered_until
+            ).order_by(models.ChatMessage.id.asc()).all()
+
+            pending = messages[:-settings.chat_summary_recent_messages] if settings.chat_summary_recent_messages else messages
+            if len(pending) < settings.chat_summary_every_turns * 2:
+                return chat.summary, []
+            return chat.summary, [(msg.id, msg.sender, msg.content) for msg in pending]
+        finally:
+            db.close()
+
+    def _save_summary(self, chat_id: int, summary: str, last_message_id: int) -> None:
+        db = SessionLocal()
+        try:
+            chat = db.get(models.Chat, chat_id)
+            if chat is None:
+                return
+            chat.summary = summary
+            chat.summary_message_id = last_message_id
+            chat.summary_updated_at = datetime.utcnow()
+            db.commit()
+        finally:
+            db.close()
+
+    async def _update_summary(self, chat_id: int) -> None:
+        try:
+            previous, pending = await asyncio.to_thread(self._pending_messages, chat_id)
+            if not pending:
+                return
+
+            transcript = "\n".join(
+                f"{'Cliente' if sender == 'user' else 'Asistente'}: {content}"
+                for _, sender, content in pending
+            )
+            response = await llm_gateway.chat_completion(
+                model=settings.chat_summary_model,
+                messages=[
+                    {"role": "system", "content": SUMMARY_PROMPT},
+                    {"role": "user", "content": f"Resumen actual:\n{previous or '(sin resumen)'}\n\nMensajes nuevos:\n{transcript}"}
+                ],
+                max_tokens=settings.chat_summary_max_tokens,
+                temperature=0.2,
+                route="summary"
+            )
+            summary = response.choices[0].message.content.strip()
+            await asyncio.to_thread(self._save_summary, chat_id, summary, pending[-1][0])
+            print(f"📝 Resumen del chat {chat_id} actualizado ({len(pending)} mensajes)")
+        except Exception as e:
+            print(f"⚠️ Error actualizando resumen del chat {chat_id}: {e}")
+        finally:
+            self._in_progress.discard(chat_id)
+
+
+conversation_summary = ConversationSummaryService()
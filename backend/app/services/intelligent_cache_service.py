@@ -3,49 +3,55 @@ Servicio de Caché Inteligente con Redis
 Optimiza consultas a la base de datos costosas
 Sistema de recomendaciones con ML
 """
-import json
+import asyncio
 import hashlib
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 from sqlmodel import Session, select
 
-from app.services.simple_cache_service import cache_service
+from app.database.connection import engine
+from app.services.tiered_cache import (
+    CATALOG_TAG, SEARCH_TAG, SEARCH_TAGS, product_tag, tiered_cache, user_orders_tag
+)
+from app.services.product_guard import product_guard
 from app.models_sqlmodel.product import Product
 from app.models_sqlmodel.user import User
 from app.models_sqlmodel.order import Order, OrderItem
 
 
 class IntelligentCacheService:
-    """Servicio de caché inteligente con Redis"""
+    """Servicio de caché inteligente (L1 en memoria + L2 Redis)"""
     
     def __init__(self):
-        self.cache = cache_service
-        self.default_ttl = 3600  # 1 hora
-        self.products_ttl = 7200  # 2 horas para productos
-        self.search_ttl = 1800  # 30 minutos para búsquedas
+        # Los TTL salen del registro de namespaces del caché (products, search, product...)
+        # y las entradas del catálogo se etiquetan para invalidarlas al escribir
+        self.cache = tiered_cache
     
     # ==================== PRODUCTOS ====================
     
     async def get_all_products(self, db: Session, active_only: bool = True) -> List[Dict[str, Any]]:
-        """Obtener todos los productos (con caché)"""
+        """
+        Obtener todos los productos (con caché protegido contra estampidas)
+        La carga usa su propia sesión porque puede ejecutarse en segundo plano
+        """
         cache_key = f"products:all:active={active_only}"
         
-        # Intentar obtener de caché
-        cached = await self.cache.get(cache_key)
-        if cached:
-            print(f"✅ CACHE HIT: Productos obtenidos de Redis")
-            return json.loads(cached)
+        async def load():
+            print(f"❌ CACHE MISS: Consultando base de datos")
+            return await asyncio.to_thread(self._load_all_products, active_only)
         
-        # Si no está en caché, consultar DB
-        print(f"❌ CACHE MISS: Consultando base de datos")
+        return await self.cache.get_or_load(cache_key, load, tags=[CATALOG_TAG])
+    
+    def _load_all_products(self, active_only: bool) -> List[Dict[str, Any]]:
         query = select(Product)
         if active_only:
             query = query.where(Product.active == True)
         
-        products = db.exec(query).all()
+        with Session(engine) as session:
+            products = session.exec(query).all()
         
         # Convertir a diccionarios
-        products_data = [
+        return [
             {
                 "id": p.id,
                 "title": p.title,
@@ -56,11 +62,6 @@ class IntelligentCacheService:
             }
             for p in products
         ]
-        
-        # Guardar en caché
-        await self.cache.set(cache_key, json.dumps(products_data), ttl=self.products_ttl)
-        
-        return products_data
     
     async def search_products(self, db: Session, query: str) -> List[Dict[str, Any]]:
         """Buscar productos (con caché inteligente)"""
@@ -69,10 +70,10 @@ class IntelligentCacheService:
         cache_key = f"search:products:{query_hash}"
         
         # Intentar obtener de caché
-        cached = await self.cache.get(cache_key)
-        if cached:
-            print(f"✅ CACHE HIT: Búsqueda '{query}' obtenida de Redis")
-            return json.loads(cached)
+        cached = await self.cache.get_tagged(cache_key, SEARCH_TAGS)
+        if cached is not None:
+            print(f"✅ CACHE HIT: Búsqueda '{query}' obtenida del caché")
+            return cached
         
         # Si no está en caché, buscar en DB
         print(f"❌ CACHE MISS: Buscando '{query}' en base de datos")
@@ -101,8 +102,9 @@ class IntelligentCacheService:
         # Ordenar por relevancia
         results.sort(key=lambda x: x["relevance"], reverse=True)
         
-        # Guardar en caché
-        await self.cache.set(cache_key, json.dumps(results), ttl=self.search_ttl)
+        # Guardar en caché (las búsquedas sin resultados con el TTL corto de las entradas negativas)
+        ttl = None if results else self.cache.registry.ttl_for("missing")
+        await self.cache.set_tagged(cache_key, results, SEARCH_TAGS, ttl=ttl)
         
         return results
     
@@ -110,17 +112,22 @@ class IntelligentCacheService:
         """Obtener producto por ID (con caché)"""
         cache_key = f"product:{product_id}"
         
+        # IDs inexistentes: ni caché (tampoco la versión de su tag) ni base de datos
+        if await product_guard.is_missing(product_id):
+            return None
+        
         # Intentar obtener de caché
-        cached = await self.cache.get(cache_key)
-        if cached:
-            print(f"✅ CACHE HIT: Producto {product_id} de Redis")
-            return json.loads(cached)
+        cached = await self.cache.get_tagged(cache_key, [product_tag(product_id)])
+        if cached is not None:
+            print(f"✅ CACHE HIT: Producto {product_id} del caché")
+            return cached
         
         # Consultar DB
         print(f"❌ CACHE MISS: Consultando producto {product_id} en DB")
         product = db.get(Product, product_id)
         
         if not product:
+            await product_guard.remember_missing(product_id)
             return None
         
         product_data = {
@@ -133,7 +140,7 @@ class IntelligentCacheService:
         }
         
         # Guardar en caché
-        await self.cache.set(cache_key, json.dumps(product_data), ttl=self.products_ttl)
+        await self.cache.set_tagged(cache_key, product_data, [product_tag(product_id)])
         
         return product_data
     
@@ -142,12 +149,13 @@ class IntelligentCacheService:
     async def get_personalized_recommendations(self, db: Session, user_id: Optional[int] = None) -> List[Dict[str, Any]]:
         """Obtener recomendaciones personalizadas (con ML básico)"""
         cache_key = f"recommendations:user:{user_id or 'guest'}"
+        tags = [CATALOG_TAG, user_orders_tag(user_id)] if user_id else [CATALOG_TAG]
         
         # Intentar obtener de caché
-        cached = await self.cache.get(cache_key)
-        if cached:
+        cached = await self.cache.get_tagged(cache_key, tags)
+        if cached is not None:
             print(f"✅ CACHE HIT: Recomendaciones para usuario {user_id}")
-            return json.loads(cached)
+            return cached
         
         # Generar recomendaciones
         print(f"❌ CACHE MISS: Generando recomendaciones para usuario {user_id}")
@@ -158,11 +166,12 @@ class IntelligentCacheService:
             # Recomendaciones basadas en historial
             recommendations = await self._get_user_based_recommendations(db, user_id)
         else:
-            # Recomendaciones generales (productos populares)
-            recommendations = await self._get_popular_products(db)
+            # Recomendaciones generales (productos populares), con su propia sesión en un hilo
+            # para no bloquear el event loop (también las precalienta cache_warmer)
+            recommendations = await asyncio.to_thread(self._load_popular_products)
         
-        # Guardar en caché (15 minutos)
-        await self.cache.set(cache_key, json.dumps(recommendations), ttl=900)
+        # Guardar en caché (TTL del namespace recommendations)
+        await self.cache.set_tagged(cache_key, recommendations, tags)
         
         return recommendations
     
@@ -326,6 +335,13 @@ class IntelligentCacheService:
     
     async def _get_popular_products(self, db: Session) -> List[Dict[str, Any]]:
         """Productos más populares/nuevos"""
+        return self._popular_products(db)
+    
+    def _load_popular_products(self) -> List[Dict[str, Any]]:
+        with Session(engine) as session:
+            return self._popular_products(session)
+    
+    def _popular_products(self, db: Session) -> List[Dict[str, Any]]:
         products = db.exec(
             select(Product)
             .where(Product.active == True)
@@ -347,7 +363,7 @@ class IntelligentCacheService:
     
     # ==================== ANÁLISIS IA CACHE ====================
     
-    async def cache_ai_analysis(self, query: str, response: str, ttl: int = 1800):
+    async def cache_ai_analysis(self, query: str, response: str, ttl: Optional[int] = None):
         """Cachear análisis de IA para consultas repetidas"""
         query_hash = hashlib.md5(query.lower().encode()).hexdigest()
         cache_key = f"ai:analysis:{query_hash}"
@@ -369,19 +385,29 @@ class IntelligentCacheService:
     # ==================== INVALIDACIÓN ====================
     
     async def invalidate_product_cache(self, product_id: Optional[int] = None):
-        """Invalidar caché de productos"""
+        """
+        Invalidar caché de productos: listados, búsquedas y recomendaciones dependen del
+        tag ``catalog``; el detalle de cada producto de su propio tag
+        """
         if product_id:
-            # Invalidar producto específico
-            await self.cache.delete(f"product:{product_id}")
+            await self.cache.invalidate_tags(CATALOG_TAG, product_tag(product_id))
         else:
-            # Invalidar todos los productos
-            await self.cache.delete("products:all:active=True")
-            await self.cache.delete("products:all:active=False")
+            await self.cache.invalidate_tags(CATALOG_TAG)
+    
+    async def invalidate_stock(self, product_ids: List[int]):
+        """
+        El stock cambió tras una venta: los listados filtrados por ``in_stock`` (y sus
+        ETag) dependen del tag ``catalog``
+        """
+        await self.cache.invalidate_tags(CATALOG_TAG, *(product_tag(product_id) for product_id in set(product_ids)))
     
     async def invalidate_search_cache(self):
         """Invalidar todas las búsquedas cacheadas"""
-        # En producción, usar scan para encontrar todas las keys
-        pass
+        await self.cache.invalidate_tags(SEARCH_TAG)
+    
+    async def invalidate_user_orders(self, user_id: int):
+        """Invalidar las recomendaciones basadas en las compras del usuario"""
+        await self.cache.invalidate_tags(user_orders_tag(user_id))
     
     # ==================== UTILIDADES ====================
     
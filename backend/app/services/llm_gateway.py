@@ -0,0 +1,523 @@
+"""
+Gateway asíncrono único para OpenAI
+Todos los servicios comparten un pool HTTP y pasan por los mismos controles:
+límite de llamadas concurrentes por modelo, reintentos con jitter ante 429/5xx,
+plazo máximo por llamada y circuit breaker. Cuando el proveedor falla o se satura,
+las llamadas fallan rápido con LLMUnavailableError y cada servicio responde con su
+fallback en lugar de acumular workers bloqueados. Las rutas de chat pueden además
+usar hedging para recortar la cola de latencia del primer token.
+"""
+import asyncio
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+import openai
+
+from app.core.config import settings
+from app.services.model_router import model_router
+
+
+class LLMUnavailableError(Exception):
+    """El LLM no está disponible: sin API key, circuito abierto, plazo vencido o reintentos agotados"""
+
+
+class LLMTimeoutError(LLMUnavailableError):
+    """El LLM no respondió (o no hubo cupo) dentro del plazo"""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker clásico: tras ``failure_threshold`` fallas seguidas se abre y
+    rechaza llamadas durante ``recovery_seconds``; luego deja pasar una de prueba
+    (half-open) y se cierra si tiene éxito
+    """
+
+    def __init__(self, failure_threshold: int = 5, recovery_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.recovery_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def release_probe(self) -> None:
+        """La llamada de prueba terminó sin veredicto: ni éxito ni falla, la siguiente vuelve a probar"""
+        self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                print(f"⚠️ Circuit breaker del LLM abierto tras {self.failures} fallas")
+            self.opened_at = time.monotonic()
+
+
+class HedgeBudget:
+    """
+    Token bucket por ruta: cada petición aporta ``ratio`` fichas (hasta ``burst``) y cada
+    hedge consume una, así los hedges nunca superan esa fracción del tráfico de la ruta
+    """
+
+    def __init__(self, ratio: float = 0.1, burst: float = 3.0):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens: Dict[str, float] = {}
+
+    def deposit(self, route: str) -> None:
+        self.tokens[route] = min(self.burst, self.tokens.get(route, 1.0) + self.ratio)
+
+    def spend(self, route: str) -> bool:
+        if self.tokens.get(route, 0.0) >= 1.0:
+            self.tokens[route] -= 1.0
+            return True
+        return False
+
+
+@dataclass
+class HedgedCompletion:
+    """Resultado de ``hedged_chat_completion``: texto, modelo que respondió y uso de tokens"""
+    content: str
+    model: str
+    usage: Any = None
+
+
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError)
+
+
+class LLMGateway:
+    """Punto único de acceso a OpenAI (chat, streaming, embeddings y transcripción)"""
+
+    def __init__(self):
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.llm_max_connections,
+                max_keepalive_connections=settings.llm_max_connections
+            ),
+            timeout=httpx.Timeout(settings.llm_timeout_seconds, connect=5.0)
+        )
+        self.client: Optional[openai.AsyncOpenAI] = None
+        if settings.openai_api_key:
+            # Los reintentos los maneja el gateway, no el SDK
+            self.client = openai.AsyncOpenAI(
+                api_key=settings.openai_api_key,
+                base_url=settings.openai_base_url,
+                http_client=self.http_client,
+                max_retries=0
+            )
+        else:
+            print("⚠️ OPENAI_API_KEY no configurada, el LLM Gateway usará respuestas de fallback")
+
+        self.breaker = CircuitBreaker(
+            failure_threshold=settings.llm_circuit_failure_threshold,
+            recovery_seconds=settings.llm_circuit_recovery_seconds
+        )
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+        # Hedging: endpoint alternativo opcional y presupuesto por ruta
+        self.hedge_client: Optional[openai.AsyncOpenAI] = None
+        if settings.llm_hedge_base_url:
+            self.hedge_client = openai.AsyncOpenAI(
+                api_key=settings.llm_hedge_api_key or settings.openai_api_key,
+                base_url=settings.llm_hedge_base_url,
+                http_client=self.http_client,
+                max_retries=0
+            )
+        self.hedge_budget = HedgeBudget(settings.llm_hedge_budget_ratio, settings.llm_hedge_budget_burst)
+        self.hedge_stats: Dict[str, Counter] = {}
+
+        # Métricas
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.rejected = 0
+
+    @property
+    def available(self) -> bool:
+        return self.client is not None
+
+    def _semaphore(self, model: str) -> asyncio.Semaphore:
+        if model not in self._semaphores:
+            self._semaphores[model] = asyncio.Semaphore(settings.llm_model_concurrency)
+        return self._semaphores[model]
+
+    @staticmethod
+    def _backoff(attempt: int, error: Exception) -> float:
+        """Espera con full jitter; respeta Retry-After si el proveedor lo envía"""
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), settings.llm_retry_max_delay)
+            except ValueError:
+                pass
+        return random.uniform(0, min(settings.llm_retry_max_delay, settings.llm_retry_base_delay * 2 ** attempt))
+
+    async def _call(
+        self,
+        model: str,
+        request,
+        deadline: Optional[float] = None,
+        route: Optional[str] = "default",
+        keep_slot: bool = False
+    ):
+        """
+        Ejecuta ``request()`` con semáforo del modelo, reintentos y plazo total.
+        Los errores no reintentables (400, 401...) se propagan tal cual.
+        La latencia, los tokens y el costo se registran por ``route`` en model_router
+        (``route=None`` deja el registro a cargo del llamador, como en streaming).
+        Con ``keep_slot`` el cupo del semáforo no se libera al volver con éxito: el
+        llamador lo libera al terminar (el stream ocupa el cupo mientras está abierto).
+        """
+        started = time.monotonic()
+        try:
+            result = await self._call_with_retries(model, request, deadline, keep_slot)
+        except Exception as e:
+            if route:
+                model_router.record(
+                    route, model, (time.monotonic() - started) * 1000,
+                    error=True, timeout=isinstance(e, LLMTimeoutError)
+                )
+            raise
+        if route:
+            model_router.record(route, model, (time.monotonic() - started) * 1000, getattr(result, "usage", None))
+        return result
+
+    async def _call_with_retries(self, model: str, request, deadline: Optional[float], keep_slot: bool = False):
+        if self.client is None:
+            raise LLMUnavailableError("OpenAI no está configurado")
+        probe = self.breaker.state == "half_open"
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise LLMUnavailableError("Circuit breaker abierto")
+
+        try:
+            return await self._attempt(model, request, deadline, keep_slot)
+        finally:
+            # Si la llamada de prueba del half-open terminó sin veredicto (hedge perdedor,
+            # cliente desconectado, sin cupo local o error de la petición) hay que liberarla
+            # o el circuito quedaría bloqueado para siempre
+            if probe:
+                self.breaker.release_probe()
+
+    async def _attempt(self, model: str, request, deadline: Optional[float], keep_slot: bool):
+        self.calls += 1
+        end = time.monotonic() + (deadline or settings.llm_timeout_seconds)
+        semaphore = self._semaphore(model)
+        attempt = 0
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=max(end - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            # Saturación propia, no del proveedor: no cuenta para el circuito
+            self.timeouts += 1
+            raise LLMTimeoutError(f"Sin capacidad para {model} dentro del plazo")
+
+        release = True
+        try:
+            while True:
+                remaining = end - time.monotonic()
+                try:
+                    result = await asyncio.wait_for(request(), timeout=max(remaining, 0))
+                    self.breaker.record_success()
+                    release = not keep_slot
+                    return result
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                    self.failures += 1
+                    self.breaker.record_failure()
+                    raise LLMTimeoutError(f"{model} no respondió en el plazo")
+                except RETRYABLE_ERRORS as e:
+                    delay = self._backoff(attempt, e)
+                    if attempt >= settings.llm_max_retries or time.monotonic() + delay >= end:
+                        self.failures += 1
+                        self.breaker.record_failure()
+                        error_class = LLMTimeoutError if isinstance(e, openai.APITimeoutError) else LLMUnavailableError
+                        raise error_class(f"{model} falló tras {attempt + 1} intentos: {e}") from e
+                    attempt += 1
+                    self.retries += 1
+                    await asyncio.sleep(delay)
+                except Exception:
+                    # Error de la petición (400, 401...), no del proveedor: ni éxito ni falla
+                    raise
+        finally:
+            if release:
+                semaphore.release()
+
+    # ==================== API ====================
+
+    async def chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "gpt-4o-mini",
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        deadline: Optional[float] = None,
+        route: str = "default",
+        **kwargs: Any
+    ):
+        return await self._call(
+            model,
+            lambda: self.client.chat.completions.create(
+                model=model, messages=messages, temperature=temperature, max_tokens=max_tokens, **kwargs
+            ),
+            deadline,
+            route
+        )
+
+    async def stream_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "gpt-4o-mini",
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        deadline: Optional[float] = None,
+        route: str = "default",
+        client: Optional[openai.AsyncOpenAI] = None,
+        **kwargs: Any
+    ) -> AsyncIterator[Any]:
+        """
+        Igual que ``chat_completion`` con ``stream=True``: el plazo y los reintentos aplican
+        hasta abrir el stream; luego cada chunk queda limitado por el timeout de lectura HTTP
+        """
+        client = client or self.client
+        started = time.monotonic()
+        try:
+            # El cupo del modelo se toma una sola vez y se conserva mientras el stream esté abierto
+            stream = await self._call(
+                model,
+                lambda: client.chat.completions.create(
+                    model=model, messages=messages, temperature=temperature, max_tokens=max_tokens, stream=True, **kwargs
+                ),
+                deadline,
+                route=None,
+                keep_slot=True
+            )
+        except Exception as e:
+            model_router.record(
+                route, model, (time.monotonic() - started) * 1000,
+                error=True, timeout=isinstance(e, LLMTimeoutError)
+            )
+            raise
+        semaphore = self._semaphore(model)
+        usage = None
+        first = True
+        try:
+            async for chunk in stream:
+                if first:
+                    first = False
+                    model_router.record_first_token(model, (time.monotonic() - started) * 1000)
+                if getattr(chunk, "usage", None):
+                    usage = chunk.usage
+                yield chunk
+            model_router.record(route, model, (time.monotonic() - started) * 1000, usage)
+        except (httpx.HTTPError, openai.APIError) as e:
+            self.failures += 1
+            self.breaker.record_failure()
+            timed_out = isinstance(e, (httpx.TimeoutException, openai.APITimeoutError))
+            model_router.record(route, model, (time.monotonic() - started) * 1000, error=True, timeout=timed_out)
+            raise LLMUnavailableError(f"Stream de {model} interrumpido: {e}") from e
+        finally:
+            semaphore.release()
+            # Si el consumidor abandona el stream (p. ej. un hedge perdedor) se libera la conexión
+            await stream.close()
+
+    def hedge_model(self, model: str) -> str:
+        """Modelo alternativo para el hedge: el configurado o, si no, el modelo rápido"""
+        if settings.llm_hedge_model:
+            return settings.llm_hedge_model
+        return settings.llm_fast_model if model != settings.llm_fast_model else model
+
+    async def hedged_stream_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "gpt-4o-mini",
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        deadline: Optional[float] = None,
+        route: str = "default",
+        **kwargs: Any
+    ) -> AsyncIterator[Any]:
+        """
+        Stream con hedging: si el primer chunk no llega dentro del percentil configurado del
+        tiempo al primer token del modelo (y el presupuesto de la ruta lo permite), lanza una
+        segunda petición al modelo/endpoint alternativo. Continúa el stream que responda
+        primero y cancela el otro.
+        """
+        def open_stream(candidate_model: str, candidate_route: str, client=None):
+            return self.stream_chat_completion(
+                messages, candidate_model, temperature, max_tokens, deadline, candidate_route, client=client, **kwargs
+            )
+
+        if not settings.llm_hedge_enabled:
+            async for chunk in open_stream(model, route):
+                yield chunk
+            return
+
+        stats = self.hedge_stats.setdefault(route, Counter())
+        stats["requests"] += 1
+        self.hedge_budget.deposit(route)
+
+        started = time.monotonic()
+        candidates: Dict[asyncio.Task, Tuple[AsyncIterator[Any], str]] = {}
+        primary = open_stream(model, route)
+        candidates[asyncio.ensure_future(primary.__anext__())] = (primary, model)
+        winner: Optional[AsyncIterator[Any]] = None
+        first_chunk = None
+        error: Optional[BaseException] = None
+        pending = set(candidates)
+        try:
+            done, pending = await asyncio.wait(pending, timeout=model_router.first_token_deadline(model) / 1000)
+            if not done:
+                if self.hedge_budget.spend(route):
+                    alternate = self.hedge_model(model)
+                    hedge = open_stream(alternate, f"{route}:hedge", self.hedge_client)
+                    task = asyncio.ensure_future(hedge.__anext__())
+                    candidates[task] = (hedge, alternate)
+                    pending.add(task)
+                    stats["hedged"] += 1
+                else:
+                    stats["budget_denied"] += 1
+
+            while winner is None:
+                # El primario tiene prioridad si ambos terminan a la vez
+                for task in sorted(done, key=lambda t: list(candidates).index(t)):
+                    if winner is not None:
+                        break
+                    if task.exception() is None:
+                        winner, first_chunk = candidates[task][0], task.result()
+                        if candidates[task][0] is not primary:
+                            stats["hedge_won"] += 1
+                    elif not isinstance(task.exception(), StopAsyncIteration):
+                        error = error or task.exception()
+                if winner is None:
+                    if not pending:
+                        break
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            for task, (stream, candidate_model) in candidates.items():
+                if stream is winner:
+                    continue
+                if task in pending:
+                    # Cota inferior de su tiempo al primer token: mantiene honesto el percentil
+                    model_router.record_first_token(candidate_model, (time.monotonic() - started) * 1000)
+                    stats["cancelled"] += 1
+                await stream.aclose()
+
+        if winner is None:
+            if error is not None:
+                raise error
+            return
+
+        try:
+            yield first_chunk
+            async for chunk in winner:
+                yield chunk
+        finally:
+            await winner.aclose()
+
+    async def hedged_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "gpt-4o-mini",
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        deadline: Optional[float] = None,
+        route: str = "default",
+        **kwargs: Any
+    ) -> HedgedCompletion:
+        """
+        Completion sin streaming con hedging; internamente usa streaming para detectar el
+        primer token y devuelve el texto completo del candidato ganador
+        """
+        parts: List[str] = []
+        usage = None
+        answered_by = model
+        async for chunk in self.hedged_stream_chat_completion(
+            messages, model, temperature, max_tokens, deadline, route,
+            stream_options={"include_usage": True}, **kwargs
+        ):
+            answered_by = getattr(chunk, "model", None) or answered_by
+            if getattr(chunk, "usage", None):
+                usage = chunk.usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+        return HedgedCompletion(content="".join(parts), model=answered_by, usage=usage)
+
+    async def embeddings(self, input: Any, model: str, deadline: Optional[float] = None, route: str = "embeddings"):
+        return await self._call(
+            model,
+            lambda: self.client.embeddings.create(model=model, input=input),
+            deadline,
+            route
+        )
+
+    async def transcribe(
+        self,
+        audio_data: bytes,
+        filename: str,
+        model: str = "whisper-1",
+        deadline: Optional[float] = None,
+        **kwargs: Any
+    ):
+        return await self._call(
+            model,
+            lambda: self.client.audio.transcriptions.create(model=model, file=(filename, audio_data), **kwargs),
+            deadline or settings.llm_transcription_timeout_seconds,
+            "transcription"
+        )
+
+    async def close(self) -> None:
+        await self.http_client.aclose()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "available": self.available,
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "calls": self.calls,
+            "failures": self.failures,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "hedging": {
+                "enabled": settings.llm_hedge_enabled,
+                "alternate_endpoint": settings.llm_hedge_base_url,
+                "routes": {route: dict(counter) for route, counter in self.hedge_stats.items()}
+            },
+            "in_flight": {
+                model: settings.llm_model_concurrency - semaphore._value
+                for model, semaphore in self._semaphores.items()
+            }
+        }
+
+
+llm_gateway = LLMGateway()
@@ -0,0 +1,208 @@
+"""
+Selección de modelo según intención, tamaño del prompt y SLO de latencia
+Las consultas simples (búsquedas de productos, precios, saludos) van al modelo rápido y
+solo la asesoría de estilo o las preguntas largas van al modelo pesado, mientras este
+cumpla el SLO. Registra latencia, tokens y costo por ruta y modelo para medir el efecto.
+"""
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.services.chat_optimizer import chat_optimizer
+from app.services.prompt_builder import count_tokens
+from app.services.search_index import fold_accents
+
+# Precio en USD por 1K tokens (entrada, salida)
+MODEL_PRICING: Dict[str, Tuple[float, float]] = {
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+    "gpt-4-turbo-preview": (0.01, 0.03),
+    "text-embedding-ada-002": (0.0001, 0.0),
+    "text-embedding-3-small": (0.00002, 0.0),
+}
+
+# Señales de asesoría de estilo: la única consulta que justifica el modelo pesado
+STYLING_KEYWORDS = (
+    "combinar", "combina", "outfit", "look", "estilo", "asesor", "aconsej", "que me pongo",
+    "ocasion", "boda", "fiesta", "entrevista", "regalo", "tendencia", "me queda", "me veo",
+)
+
+LATENCY_WINDOW = 200
+SLO_MIN_SAMPLES = 20
+# Solo cuentan muestras recientes: tras degradar, el modelo pesado vuelve a probarse
+SLO_WINDOW_SECONDS = 300
+
+
+def _percentile(values, percentile: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(percentile / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    input_price, output_price = MODEL_PRICING.get(model, (0.0, 0.0))
+    return prompt_tokens / 1000 * input_price + completion_tokens / 1000 * output_price
+
+
+@dataclass
+class ModelChoice:
+    model: str
+    tier: str  # fast, heavy o default
+    reason: str
+
+
+@dataclass
+class RouteMetrics:
+    """Métricas acumuladas de una ruta con un modelo"""
+    calls: int = 0
+    errors: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost_usd: float = 0.0
+    latencies_ms: Deque[float] = field(default_factory=lambda: deque(maxlen=LATENCY_WINDOW))
+
+    def to_dict(self) -> Dict[str, Any]:
+        latencies = list(self.latencies_ms)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "latency_ms": {
+                "avg": round(sum(latencies) / len(latencies), 1) if latencies else 0.0,
+                "p50": round(_percentile(latencies, 50), 1),
+                "p95": round(_percentile(latencies, 95), 1),
+            },
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cost_usd": round(self.cost_usd, 6),
+            "cost_per_call_usd": round(self.cost_usd / self.calls, 6) if self.calls else 0.0,
+        }
+
+
+class ModelRouter:
+    """Política de selección de modelo y métricas por ruta"""
+
+    def __init__(self):
+        self.metrics: Dict[Tuple[str, str], RouteMetrics] = {}
+        self.model_latencies: Dict[str, Deque[Tuple[float, float]]] = {}
+        self.first_token_latencies: Dict[str, Deque[Tuple[float, float]]] = {}
+        self.choices: Counter = Counter()
+        self._lock = threading.Lock()
+
+    # ==================== SELECCIÓN ====================
+
+    def model_p95(self, model: str) -> Optional[float]:
+        """p95 reciente del modelo, o None si todavía no hay muestras suficientes"""
+        since = time.monotonic() - SLO_WINDOW_SECONDS
+        latencies = [ms for at, ms in self.model_latencies.get(model, ()) if at >= since]
+        if len(latencies) < SLO_MIN_SAMPLES:
+            return None
+        return _percentile(latencies, 95)
+
+    def first_token_deadline(self, model: str) -> float:
+        """
+        Plazo en ms para el primer token antes de lanzar un hedge: percentil reciente del
+        tiempo al primer token del modelo, o el valor por defecto si faltan muestras
+        """
+        since = time.monotonic() - SLO_WINDOW_SECONDS
+        samples = [ms for at, ms in self.first_token_latencies.get(model, ()) if at >= since]
+        if len(samples) < SLO_MIN_SAMPLES:
+            return settings.llm_hedge_default_delay_ms
+        return max(settings.llm_hedge_min_delay_ms, _percentile(samples, settings.llm_hedge_percentile))
+
+    def _within_slo(self, model: str) -> bool:
+        p95 = self.model_p95(model)
+        return p95 is None or p95 <= settings.llm_latency_slo_ms
+
+    def choose(self, route: str, message: str, default: str) -> ModelChoice:
+        """
+        Elige el modelo para ``message``; ``default`` es el modelo histórico de la ruta
+        y se usa tal cual cuando el router está desactivado
+        """
+        if not settings.llm_router_enabled:
+            choice = ModelChoice(default, "default", "disabled")
+        else:
+            intent = chat_optimizer._analyze_user_intent(message)["primary"]
+            folded = fold_accents(message)
+            styling = any(keyword in folded for keyword in STYLING_KEYWORDS)
+            long_prompt = count_tokens(message, settings.llm_fast_model) >= settings.llm_router_complex_tokens
+
+            if (styling or long_prompt) and intent not in ("greeting", "compliment"):
+                if self._within_slo(settings.llm_heavy_model):
+                    choice = ModelChoice(settings.llm_heavy_model, "heavy", "styling" if styling else "long_prompt")
+                else:
+                    choice = ModelChoice(settings.llm_fast_model, "fast", "slo_downgrade")
+            else:
+                choice = ModelChoice(settings.llm_fast_model, "fast", intent)
+
+        self.choices[f"{route}:{choice.model}:{choice.reason}"] += 1
+        return choice
+
+    def fast_model(self, default: str) -> str:
+        """Modelo para tareas auxiliares cortas (clasificación, extracción)"""
+        return settings.llm_fast_model if settings.llm_router_enabled else default
+
+    # ==================== MÉTRICAS ====================
+
+    def record(
+        self,
+        route: str,
+        model: str,
+        latency_ms: float,
+        usage: Any = None,
+        error: bool = False,
+        timeout: bool = False
+    ) -> None:
+        """
+        Registra una llamada al LLM (la invoca el gateway). Un plazo vencido cuenta como
+        error y además como muestra de latencia (por encima del SLO) para que el p95 del
+        modelo suba y ``_within_slo`` deje de elegirlo
+        """
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        with self._lock:
+            metrics = self.metrics.setdefault((route, model), RouteMetrics())
+            metrics.calls += 1
+            if timeout:
+                latency_ms = max(latency_ms, settings.llm_latency_slo_ms + 1)
+                metrics.latencies_ms.append(latency_ms)
+                self.model_latencies.setdefault(model, deque(maxlen=LATENCY_WINDOW)).append((time.monotonic(), latency_ms))
+            if error or timeout:
+                metrics.errors += 1
+                return
+            metrics.latencies_ms.append(latency_ms)
+            metrics.prompt_tokens += prompt_tokens
+            metrics.completion_tokens += completion_tokens
+            metrics.cost_usd += estimate_cost(model, prompt_tokens, completion_tokens)
+            self.model_latencies.setdefault(model, deque(maxlen=LATENCY_WINDOW)).append((time.monotonic(), latency_ms))
+
+    def record_first_token(self, model: str, latency_ms: float) -> None:
+        """Registra el tiempo hasta el primer chunk de un stream"""
+        with self._lock:
+            self.first_token_latencies.setdefault(model, deque(maxlen=LATENCY_WINDOW)).append((time.monotonic(), latency_ms))
+
+    def get_stats(self) -> Dict[str, Any]:
+        routes: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            for (route, model), metrics in sorted(self.metrics.items()):
+                routes.setdefault(route, {})[model] = metrics.to_dict()
+            total_cost = sum(metrics.cost_usd for metrics in self.metrics.values())
+        return {
+            "enabled": settings.llm_router_enabled,
+            "fast_model": settings.llm_fast_model,
+            "heavy_model": settings.llm_heavy_model,
+            "latency_slo_ms": settings.llm_latency_slo_ms,
+            "model_p95_ms": {model: self.model_p95(model) for model in self.model_latencies},
+            "hedge_deadline_ms": {model: self.first_token_deadline(model) for model in self.first_token_latencies},
+            "routes": routes,
+            "choices": dict(self.choices.most_common()),
+            "total_cost_usd": round(total_cost, 6)
+        }
+
+
+model_router = ModelRouter()
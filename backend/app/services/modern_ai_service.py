@@ -46,12 +46,15 @@ class ModernAIService(IModernAIService):
             # SIEMPRE usar nuestra función inteligente mejorada con OpenAI
             print("🔄 Usando función inteligente mejorada de Asistente Tienda con OpenAI")
             from app.services.openai_service import generate_smart_response
-            response = generate_smart_response(message, db)
+            # Resumen del chat y mensajes recientes (ver ModernChatUseCases._get_chat_context)
+            summary = context.get("summary")
+            history = context.get("history")
+            response = await generate_smart_response(message, db, summary=summary, conversation_history=history)
             
             # Si la respuesta es muy corta o genérica, usar OpenAI directamente
             if len(response) < 50 or "¿En qué puedo ayudarte hoy?" in response:
                 print("🔄 Respuesta muy genérica, usando OpenAI directamente")
-                response = await self._call_openai_directly(message, db)
+                response = await self._call_openai_directly(message, db, summary, history)
             
             # Analizar intención del usuario
             intent = await self.analyze_user_intent(message)
@@ -72,8 +75,7 @@ class ModernAIService(IModernAIService):
                 "recommendations": recommendations,
                 "confidence": 0.95,
                 "timestamp": context.get("timestamp"),
-                "context_used": True,
-                "rag_context": rag_result  # Incluir contexto RAG para debugging
+                "context_used": True
             }
             
         except Exception as e:
@@ -81,7 +83,7 @@ class ModernAIService(IModernAIService):
             import traceback
             traceback.print_exc()
             # Fallback a tu función original
-            fallback_response = ask_openai(message)
+            fallback_response = await ask_openai(message)
             return {
                 "response": fallback_response,
                 "intent": {"type": "general", "confidence": 0.7},
@@ -142,14 +144,22 @@ class ModernAIService(IModernAIService):
                 "error": str(e)
             }
     
-    async def _call_openai_directly(self, message: str, db) -> str:
+    async def _call_openai_directly(
+        self,
+        message: str,
+        db,
+        summary: Optional[str] = None,
+        history: Optional[List[Dict[str, Any]]] = None
+    ) -> str:
         """
         Llama directamente a OpenAI con contexto de productos
         """
         try:
-            from app.services.openai_service import client
+            from app.services.llm_gateway import llm_gateway, LLMUnavailableError
+            from app.services.model_router import model_router
+            from app.services.openai_service import conversation_messages
             
-            if client is None:
+            if not llm_gateway.available:
                 return "Lo siento, el servicio de IA no está disponible en este momento."
             
             # Obtener productos de la base de datos para contexto
@@ -195,15 +205,21 @@ class ModernAIService(IModernAIService):
             - Mantén las respuestas concisas pero informativas
             - Responde siempre en español"""
             
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": message}
-                ],
-                temperature=0.7,
-                max_tokens=400
-            )
+            try:
+                response = await llm_gateway.chat_completion(
+                    model=model_router.choose("modern", message, "gpt-4o-mini").model,
+                    route="modern",
+                    messages=[
+                        {"role": "system", "content": system_message},
+                        *conversation_messages(summary, history),
+                        {"role": "user", "content": message}
+                    ],
+                    temperature=0.7,
+                    max_tokens=400
+                )
+            except LLMUnavailableError:
+                from app.services.openai_service import generate_fallback_response
+                return generate_fallback_response(message)
             
             return response.choices[0].message.content
             
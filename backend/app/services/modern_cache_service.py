@@ -1,12 +1,11 @@
 """
 Servicio de cache moderno con Clean Architecture
-Usa tu Redis original sin modificarlo
+Usa el caché por niveles compartido (tiered_cache)
 """
 from abc import ABC, abstractmethod
 from typing import Dict, List, Any, Optional
-import json
-import asyncio
-from datetime import datetime, timedelta
+
+from app.services.tiered_cache import tiered_cache
 
 class IModernCacheService(ABC):
     """Interface para el servicio de cache moderno - Dependency Inversion Principle"""
@@ -44,78 +43,43 @@ class IModernCacheService(ABC):
         pass
 
 class ModernCacheService(IModernCacheService):
-    """Implementación moderna del servicio de cache usando tu Redis original"""
+    """Implementación del servicio de cache moderno sobre el caché por niveles (L1 + Redis)"""
     
     def __init__(self):
-        self.cache: Dict[str, Any] = {}
-        self.connected = True
-        self.ttl_cache: Dict[str, datetime] = {}
+        self.cache = tiered_cache
+    
+    @property
+    def connected(self) -> bool:
+        return self.cache.connected
     
     async def connect(self) -> bool:
         """Conecta al cache"""
-        self.connected = True
-        return True
+        return await self.cache.connect()
     
     async def disconnect(self):
         """Desconecta del cache"""
-        self.connected = False
+        await self.cache.disconnect()
     
     async def get(self, key: str) -> Optional[Any]:
         """Obtiene un valor del cache"""
-        if not self.connected:
-            return None
-        
-        # Verificar TTL
-        if key in self.ttl_cache:
-            if datetime.now() > self.ttl_cache[key]:
-                del self.cache[key]
-                del self.ttl_cache[key]
-                return None
-        
-        return self.cache.get(key)
+        return await self.cache.get(key)
     
     async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
-        """Establece un valor en el cache"""
-        if not self.connected:
-            return False
-        
-        self.cache[key] = value
-        
-        if ttl:
-            self.ttl_cache[key] = datetime.now() + timedelta(seconds=ttl)
-        
-        return True
+        """Establece un valor en el cache (TTL del namespace si no se indica)"""
+        return await self.cache.set(key, value, ttl)
     
     async def delete(self, key: str) -> bool:
         """Elimina una clave del cache"""
-        if not self.connected:
-            return False
-        
-        if key in self.cache:
-            del self.cache[key]
-            if key in self.ttl_cache:
-                del self.ttl_cache[key]
-            return True
-        return False
+        return await self.cache.delete(key)
     
     async def exists(self, key: str) -> bool:
         """Verifica si una clave existe en el cache"""
-        if not self.connected:
-            return False
-        
-        # Verificar TTL
-        if key in self.ttl_cache:
-            if datetime.now() > self.ttl_cache[key]:
-                del self.cache[key]
-                del self.ttl_cache[key]
-                return False
-        
-        return key in self.cache
+        return await self.cache.exists(key)
     
     async def cache_user_session(self, user_id: str, session_data: Dict[str, Any]) -> bool:
-        """Cachea la sesión del usuario"""
+        """Cachea la sesión del usuario (namespace user_session: 1 hora)"""
         key = f"user_session:{user_id}"
-        return await self.set(key, session_data, ttl=3600)  # 1 hora
+        return await self.set(key, session_data)
     
     async def get_user_session(self, user_id: str) -> Optional[Dict[str, Any]]:
         """Obtiene la sesión del usuario del cache"""
@@ -123,9 +87,9 @@ class ModernCacheService(IModernCacheService):
         return await self.get(key)
     
     async def cache_product_recommendations(self, user_id: str, recommendations: List[Dict[str, Any]]) -> bool:
-        """Cachea las recomendaciones de productos del usuario"""
+        """Cachea las recomendaciones de productos del usuario (namespace user_recommendations: 30 minutos)"""
         key = f"user_recommendations:{user_id}"
-        return await self.set(key, recommendations, ttl=1800)  # 30 minutos
+        return await self.set(key, recommendations)
     
     async def get_product_recommendations(self, user_id: str) -> Optional[List[Dict[str, Any]]]:
         """Obtiene las recomendaciones de productos del usuario del cache"""
@@ -134,34 +98,7 @@ class ModernCacheService(IModernCacheService):
     
     async def get_cache_stats(self) -> Dict[str, Any]:
         """Obtiene estadísticas del cache"""
-        return {
-            "status": "connected" if self.connected else "disconnected",
-            "type": "modern-in-memory",
-            "size": len(self.cache),
-            "ttl_entries": len(self.ttl_cache)
-        }
+        return await self.cache.get_cache_stats()
 
 # Instancia global del servicio de cache moderno
 modern_cache_service = ModernCacheService()
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
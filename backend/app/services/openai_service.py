@@ -1,82 +1,99 @@
-import os
 from typing import Optional, List, Dict, Any
-from dotenv import load_dotenv
+from .llm_gateway import llm_gateway, LLMUnavailableError
+from .model_router import model_router
+from .singleflight import llm_singleflight, make_key
 
-# Cargar variables de entorno
-load_dotenv()
-
-try:
-    from openai import OpenAI
-except Exception:
-    OpenAI = None
-
-client = None
-if OpenAI and os.getenv("OPENAI_API_KEY"):
-    try:
-        client = OpenAI()
-    except Exception as e:
-        print(f"Warning: No se pudo inicializar el cliente de OpenAI: {e}")
-        client = None
-
-def ask_openai(prompt: str) -> str:
+async def ask_openai(prompt: str) -> str:
     """
     Función básica que mantiene compatibilidad con el código existente
     """
-    if client is None:
-        return generate_smart_response(prompt)
+    if not llm_gateway.available:
+        return await generate_smart_response(prompt)
     try:
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
+        resp = await llm_gateway.chat_completion(
+            model=model_router.choose("basic", prompt, "gpt-4o-mini").model,
             messages=[{"role":"system","content":"Eres un asistente de soporte amable y breve."},
                       {"role":"user","content": prompt}],
             temperature=0.2,
-            max_tokens=300
+            max_tokens=300,
+            route="basic"
         )
         return resp.choices[0].message.content
+    except LLMUnavailableError:
+        return generate_fallback_response(prompt)
     except Exception as e:
         return f"(OpenAI error) {e}"
 
-def advanced_chat_completion(
+async def advanced_chat_completion(
     messages: List[Dict[str, str]], 
     model: str = "gpt-4o-mini",
     temperature: float = 0.7,
     max_tokens: int = 500,
-    stream: bool = False
+    stream: bool = False,
+    route: str = "chat"
 ) -> Dict[str, Any]:
     """
     Función avanzada para completar conversaciones con más control
+    Las llamadas idénticas concurrentes (sin streaming) comparten una sola petición a OpenAI
+    ``route`` identifica al llamador en las métricas de latencia y costo
     """
-    if client is None:
+    if not llm_gateway.available:
         return {
             "success": False,
             "error": "OpenAI client not initialized",
             "response": "🤖 (Simulado) Entiendo tu consulta. OpenAI no está configurado."
         }
     
+    if stream:
+        return {
+            "success": True,
+            "stream": llm_gateway.hedged_stream_chat_completion(
+                messages=messages, model=model, temperature=temperature, max_tokens=max_tokens, route=route
+            )
+        }
+    
+    key = make_key(messages=messages, model=model, temperature=temperature, max_tokens=max_tokens)
+    return await llm_singleflight.do(
+        key,
+        lambda: _chat_completion(messages, model, temperature, max_tokens, route),
+        shareable=lambda result: result["success"]
+    )
+
+async def _chat_completion(
+    messages: List[Dict[str, str]],
+    model: str,
+    temperature: float,
+    max_tokens: int,
+    route: str
+) -> Dict[str, Any]:
     try:
-        response = client.chat.completions.create(
+        # Con hedging: si el primer token tarda más de lo habitual responde el modelo alternativo
+        completion = await llm_gateway.hedged_chat_completion(
             model=model,
             messages=messages,
             temperature=temperature,
             max_tokens=max_tokens,
-            stream=stream
+            route=route
         )
-        
-        if stream:
-            return {
-                "success": True,
-                "stream": response
-            }
-        else:
-            return {
-                "success": True,
-                "response": response.choices[0].message.content,
-                "usage": {
-                    "prompt_tokens": response.usage.prompt_tokens,
-                    "completion_tokens": response.usage.completion_tokens,
-                    "total_tokens": response.usage.total_tokens
-                }
+        return {
+            "success": True,
+            "response": completion.content,
+            "model": completion.model,
+            "usage": {
+                "prompt_tokens": getattr(completion.usage, "prompt_tokens", 0),
+                "completion_tokens": getattr(completion.usage, "completion_tokens", 0),
+                "total_tokens": getattr(completion.usage, "total_tokens", 0)
             }
+        }
+    except LLMUnavailableError as e:
+        # Proveedor caído o saturado: respuesta de fallback sin mensaje de error técnico
+        last_user = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+        return {
+            "success": False,
+            "error": str(e),
+            "fallback": True,
+            "response": generate_fallback_response(last_user)
+        }
     except Exception as e:
         return {
             "success": False,
@@ -84,11 +101,39 @@ def advanced_chat_completion(
             "response": f"Lo siento, hubo un error procesando tu consulta: {str(e)}"
         }
 
-def generate_smart_response(prompt: str, db=None, rag_context: str = "") -> str:
+def conversation_messages(
+    summary: Optional[str] = None,
+    conversation_history: Optional[List[Any]] = None,
+    max_messages: int = 6
+) -> List[Dict[str, str]]:
+    """Resumen de la conversación y últimos mensajes (objetos o diccionarios ``sender``/``content``) como mensajes del chat"""
+    messages = []
+    # Resumen de los mensajes anteriores a los recientes
+    if summary:
+        messages.append({"role": "system", "content": f"RESUMEN DE LA CONVERSACIÓN HASTA AHORA:\n{summary}"})
+    for msg in (conversation_history or [])[-max_messages:]:
+        # Manejar tanto objetos como diccionarios
+        if isinstance(msg, dict):
+            role = "user" if msg.get("sender") == "user" else "assistant"
+            content = msg.get("content", "")
+        else:
+            role = "user" if msg.sender == "user" else "assistant"
+            content = msg.content
+        messages.append({"role": role, "content": content})
+    return messages
+
+async def generate_smart_response(
+    prompt: str,
+    db=None,
+    rag_context: str = "",
+    summary: Optional[str] = None,
+    conversation_history: Optional[List[Any]] = None
+) -> str:
     """
     Genera una respuesta inteligente usando OpenAI con contexto de productos
+    (y, si se pasan, el resumen de la conversación y los últimos mensajes)
     """
-    if client is None:
+    if not llm_gateway.available:
         return generate_fallback_response(prompt)
     
     try:
@@ -135,14 +180,16 @@ def generate_smart_response(prompt: str, db=None, rag_context: str = "") -> str:
         - Mantén las respuestas concisas pero informativas
         - Responde siempre en español"""
         
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
+        response = await llm_gateway.chat_completion(
+            model=model_router.choose("smart", prompt, "gpt-4o-mini").model,
             messages=[
                 {"role": "system", "content": system_message},
+                *conversation_messages(summary, conversation_history),
                 {"role": "user", "content": prompt}
             ],
             temperature=0.7,
-            max_tokens=400
+            max_tokens=400,
+            route="smart"
         )
         
         return response.choices[0].message.content
@@ -173,15 +220,16 @@ def generate_fallback_response(prompt: str) -> str:
     # Respuesta genérica
     return f"🤖 Entiendo tu consulta sobre '{prompt[:50]}...'. Estoy aquí para ayudarte con información sobre nuestros productos, precios, envíos o cualquier otra consulta. ¿Podrías ser más específico sobre lo que necesitas?"
 
-def generate_contextual_response(
+async def generate_contextual_response(
     query: str,
     context: Dict[str, Any],
-    conversation_history: List[Dict[str, str]] = None
+    conversation_history: List[Dict[str, str]] = None,
+    summary: Optional[str] = None
 ) -> str:
     """
     Genera una respuesta contextualizada usando el sistema RAG avanzado
     """
-    if client is None:
+    if not llm_gateway.available:
         # Usar respuesta inteligente con contexto de la base de datos
         rag_context = ""
         if context.get("document_context"):
@@ -189,7 +237,7 @@ def generate_contextual_response(
         elif context.get("product_context"):
             rag_context = context["product_context"]
         
-        return generate_smart_response(query, rag_context=rag_context)
+        return await generate_smart_response(query, rag_context=rag_context)
     
     # Construir mensajes para el chat
     messages = []
@@ -234,17 +282,8 @@ def generate_contextual_response(
     
     messages.append({"role": "system", "content": system_message})
     
-    # Agregar historial de conversación
-    if conversation_history:
-        for msg in conversation_history[-6:]:  # Últimos 6 mensajes para contexto
-            # Manejar tanto objetos como diccionarios
-            if isinstance(msg, dict):
-                role = "user" if msg.get("sender") == "user" else "assistant"
-                content = msg.get("content", "")
-            else:
-                role = "user" if msg.sender == "user" else "assistant"
-                content = msg.content
-            messages.append({"role": role, "content": content})
+    # Resumen y últimos 6 mensajes para contexto
+    messages.extend(conversation_messages(summary, conversation_history))
     
     # Construir prompt contextual mejorado
     context_parts = []
@@ -266,11 +305,12 @@ def generate_contextual_response(
     messages.append({"role": "user", "content": query})
     
     # Generar respuesta
-    result = advanced_chat_completion(
+    result = await advanced_chat_completion(
         messages=messages,
-        model="gpt-4o-mini",
+        model=model_router.choose("contextual", query, "gpt-4o-mini").model,
         temperature=0.8,  # Aumentar creatividad
-        max_tokens=500    # Permitir respuestas más largas para productos
+        max_tokens=500,   # Permitir respuestas más largas para productos
+        route="contextual"
     )
     
     if result["success"]:
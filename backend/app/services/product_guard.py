@@ -0,0 +1,154 @@
+"""
+Filtro de IDs de producto antes de llegar a la base de datos
+Un filtro de Bloom en memoria con los IDs existentes separa los IDs conocidos de los que
+no (bots que recorren /products/{id}, enlaces viejos): un ID ausente del filtro se
+rechaza sin consultar la base de datos ni crear claves en el caché. El filtro se
+reconstruye cuando cambia la versión del tag ``catalog`` (crear, editar o borrar un
+producto la incrementa) y, para los productos insertados fuera de la API o sin Redis,
+cada ``PRODUCT_GUARD_REBUILD_SECONDS``. Los falsos positivos del filtro que la base de
+datos confirma como inexistentes se recuerdan con entradas negativas de TTL corto.
+"""
+import asyncio
+import hashlib
+import math
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.database.connection import engine
+from app.models_sqlmodel.product import Product
+from app.services.tiered_cache import CATALOG_TAG, tiered_cache
+
+
+class BloomFilter:
+    """Filtro de Bloom: sin falsos negativos, falsos positivos acotados por ``error_rate``"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: Any) -> Iterable[int]:
+        digest = hashlib.blake2b(str(item).encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: Any) -> None:
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: Any) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class ProductGuard:
+    """Filtro de IDs por versión del catálogo y caché negativo de sus falsos positivos"""
+
+    def __init__(self):
+        self.cache = tiered_cache
+        self.known: Optional[BloomFilter] = None
+        self.catalog_version: Optional[int] = None
+        self.built_at = 0.0
+        self._rebuild_lock = asyncio.Lock()
+
+        # Métricas
+        self.rebuilds = 0
+        self.bloom_rejections = 0
+        self.negative_hits = 0
+        self.negative_stored = 0
+
+    # ==================== FILTRO DE BLOOM ====================
+
+    @staticmethod
+    def _load_ids():
+        with Session(engine) as session:
+            return session.exec(select(Product.id)).all()
+
+    def _build(self, ids) -> None:
+        known = BloomFilter(max(1000, 2 * len(ids)), settings.product_guard_false_positive_rate)
+        for product_id in ids:
+            known.add(product_id)
+        self.known = known
+
+    def _is_current(self, version: int) -> bool:
+        return (
+            version == self.catalog_version
+            and time.monotonic() - self.built_at < settings.product_guard_rebuild_seconds
+        )
+
+    async def ensure_current(self) -> bool:
+        """Reconstruye el filtro si cambió el catálogo o venció; False si no hay filtro utilizable"""
+        if not settings.product_guard_enabled:
+            return False
+        version = (await self.cache.get_tag_versions([CATALOG_TAG]))[CATALOG_TAG]
+        if self._is_current(version):
+            return True
+        if version == self.catalog_version and self._rebuild_lock.locked():
+            # Solo venció por antigüedad: mientras otra petición lo reconstruye se usa el actual
+            return True
+        async with self._rebuild_lock:
+            if not self._is_current(version):
+                try:
+                    ids = await asyncio.to_thread(self._load_ids)
+                except Exception as e:
+                    # Sin filtro se deja pasar todo: nunca se rechaza un ID válido
+                    print(f"⚠️ No se pudo construir el filtro de productos: {e}")
+                    return False
+                self._build(ids)
+                self.catalog_version = version
+                self.built_at = time.monotonic()
+                self.rebuilds += 1
+        return True
+
+    async def might_exist(self, product_id: int) -> bool:
+        """Según el filtro (sin base de datos): False si el ID no estaba al construirlo"""
+        if not await self.ensure_current():
+            return True
+        return product_id in self.known
+
+    # ==================== CACHÉ NEGATIVO ====================
+
+    @staticmethod
+    def _missing_key(product_id: int) -> str:
+        return f"missing:product:{product_id}"
+
+    async def is_missing(self, product_id: int) -> bool:
+        """
+        El producto no existe: el filtro no lo conoce (sin consultar la base de datos) o es
+        un falso positivo del filtro ya confirmado. Las entradas negativas dependen solo del
+        tag ``catalog``: un ID inventado no crea claves de tag propias en Redis
+        """
+        if not await self.might_exist(product_id):
+            self.bloom_rejections += 1
+            return True
+        if await self.cache.get_tagged(self._missing_key(product_id), [CATALOG_TAG]) is not None:
+            self.negative_hits += 1
+            return True
+        return False
+
+    async def remember_missing(self, product_id: int) -> None:
+        """Falso positivo del filtro: se recuerda con el TTL corto del namespace ``missing``"""
+        self.negative_stored += 1
+        await self.cache.set_tagged(self._missing_key(product_id), True, [CATALOG_TAG])
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.product_guard_enabled,
+            "catalog_version": self.catalog_version,
+            "known_ids": self.known.count if self.known else 0,
+            "bloom_bits": self.known.size if self.known else 0,
+            "rebuilds": self.rebuilds,
+            "bloom_rejections": self.bloom_rejections,
+            "negative_hits": self.negative_hits,
+            "negative_stored": self.negative_stored
+        }
+
+
+# Instancia global
+product_guard = ProductGuard()
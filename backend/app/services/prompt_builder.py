@@ -0,0 +1,216 @@
+"""
+Construcción de prompts con presupuesto de tokens
+Cuenta tokens con tiktoken y recorta por prioridad: instrucciones del sistema y mensaje
+del usuario siempre entran; después el contexto recuperado (en orden de relevancia) y
+por último el historial, del mensaje más reciente al más antiguo
+"""
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+
+# Ventana de contexto de cada modelo (tokens)
+MODEL_CONTEXT_WINDOWS: Dict[str, int] = {
+    "gpt-4o-mini": 128000,
+    "gpt-4o": 128000,
+    "gpt-4-turbo-preview": 128000,
+    "gpt-3.5-turbo": 16385,
+}
+
+# Presupuesto de entrada por modelo: acota latencia y costo aunque la ventana sea mayor
+MODEL_PROMPT_BUDGETS: Dict[str, int] = {
+    "gpt-4o-mini": 4000,
+    "gpt-4o": 4000,
+    "gpt-4-turbo-preview": 3000,
+    "gpt-3.5-turbo": 2500,
+}
+
+DEFAULT_PROMPT_BUDGET = 3000
+
+# Tokens fijos que agrega el formato chat por cada mensaje
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    if not TIKTOKEN_AVAILABLE:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # Sin acceso a los archivos de codificación se usa una estimación
+        print(f"⚠️ tiktoken no disponible para {model}, se estiman tokens: {e}")
+        return None
+
+
+def count_tokens(text: str, model: str) -> int:
+    """Cantidad de tokens de un texto (estimación de 4 caracteres por token si no hay tiktoken)"""
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))
+
+
+def count_message_tokens(messages: List[Dict[str, str]], model: str) -> int:
+    """Tokens de una lista de mensajes en formato chat"""
+    return sum(TOKENS_PER_MESSAGE + count_tokens(m["content"], model) for m in messages) + TOKENS_PER_REPLY
+
+
+def truncate_text(text: str, max_tokens: int, model: str) -> str:
+    """Recorta un texto a ``max_tokens`` tokens"""
+    if max_tokens <= 0:
+        return ""
+    encoding = _encoding(model)
+    if encoding is None:
+        return text[:max_tokens * 4]
+    tokens = encoding.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens]) + "…"
+
+
+def prompt_budget(model: str, max_completion_tokens: int = 0) -> int:
+    """Tokens disponibles para el prompt de un modelo, dejando lugar para la respuesta"""
+    budget = settings.prompt_token_budget or MODEL_PROMPT_BUDGETS.get(model, DEFAULT_PROMPT_BUDGET)
+    window = MODEL_CONTEXT_WINDOWS.get(model)
+    if window:
+        budget = min(budget, window - max_completion_tokens)
+    return budget
+
+
+def fit_lines(lines: List[str], max_tokens: int, model: str) -> List[str]:
+    """Conserva las primeras líneas (ya ordenadas por prioridad) que entran en ``max_tokens``"""
+    fitted = []
+    used = 0
+    for line in lines:
+        tokens = count_tokens(line, model) + 1
+        if used + tokens > max_tokens:
+            if not fitted:
+                # El ítem más relevante entra aunque sea recortado
+                fitted.append(truncate_text(line, max_tokens - 2, model))
+            break
+        fitted.append(line)
+        used += tokens
+    return fitted
+
+
+@dataclass
+class ContextSection:
+    """Bloque de contexto recuperado; los ítems vienen ordenados por relevancia"""
+    title: str
+    items: List[str]
+    priority: int = 0
+
+
+@dataclass
+class PromptBuilder:
+    """
+    Arma la lista de mensajes para chat completions dentro del presupuesto del modelo
+
+    Uso::
+
+        builder = PromptBuilder("gpt-3.5-turbo", max_completion_tokens=300)
+        builder.set_system("Eres un asistente...")
+        builder.add_context("Información de la tienda:", lineas, priority=2)
+        builder.add_history(historial)
+        builder.set_user(mensaje)
+        messages = builder.build()
+    """
+    model: str
+    max_completion_tokens: int = 0
+    budget: Optional[int] = None
+    system: str = ""
+    user: str = ""
+    sections: List[ContextSection] = field(default_factory=list)
+    history: List[Dict[str, str]] = field(default_factory=list)
+
+    def __post_init__(self):
+        if self.budget is None:
+            self.budget = prompt_budget(self.model, self.max_completion_tokens)
+
+    def set_system(self, text: str) -> "PromptBuilder":
+        self.system = text
+        return self
+
+    def set_user(self, text: str) -> "PromptBuilder":
+        self.user = text
+        return self
+
+    def add_context(self, title: str, items: List[str], priority: int = 0) -> "PromptBuilder":
+        """Agrega un bloque de contexto; con poco presupuesto se llena primero el de mayor prioridad"""
+        if items:
+            self.sections.append(ContextSection(title, items, priority))
+        return self
+
+    def add_history(self, messages: List[Dict[str, str]]) -> "PromptBuilder":
+        """Historial en orden cronológico (``role``/``content``)"""
+        self.history.extend(messages)
+        return self
+
+    def _count(self, text: str) -> int:
+        return count_tokens(text, self.model)
+
+    def build(self) -> List[Dict[str, str]]:
+        remaining = self.budget - TOKENS_PER_REPLY
+
+        # 1. Mensaje del usuario e instrucciones: siempre entran (recortados solo si no caben solos)
+        user = truncate_text(self.user, max(remaining // 2, 1), self.model) if self.user else ""
+        if user:
+            remaining -= TOKENS_PER_MESSAGE + self._count(user)
+        system = truncate_text(self.system, remaining - TOKENS_PER_MESSAGE, self.model)
+        remaining -= TOKENS_PER_MESSAGE + self._count(system)
+
+        # 2. Contexto recuperado por prioridad, ítem por ítem
+        fitted_sections = {}
+        for section in sorted(self.sections, key=lambda s: -s.priority):
+            header = self._count(section.title) + 2
+            if remaining <= header:
+                break
+            items = fit_lines(section.items, remaining - header, self.model)
+            if items:
+                fitted_sections[id(section)] = items
+                remaining -= header + sum(self._count(item) + 1 for item in items)
+
+        context_text = "\n\n".join(
+            section.title + "\n" + "\n".join(fitted_sections[id(section)])
+            for section in self.sections
+            if id(section) in fitted_sections
+        )
+        if context_text:
+            system = f"{system}\n\n{context_text}" if system else context_text
+
+        # 3. Historial del más reciente al más antiguo hasta agotar el presupuesto
+        history: List[Dict[str, str]] = []
+        for message in reversed(self.history):
+            available = remaining - TOKENS_PER_MESSAGE
+            if available <= 0:
+                break
+            content = message["content"] or ""
+            tokens = self._count(content)
+            if tokens > available:
+                if history:
+                    break
+                content = truncate_text(content, available, self.model)
+                tokens = self._count(content)
+            history.append({"role": message["role"], "content": content})
+            remaining -= TOKENS_PER_MESSAGE + tokens
+        history.reverse()
+
+        messages = [{"role": "system", "content": system}] if system else []
+        messages.extend(history)
+        if user:
+            messages.append({"role": "user", "content": user})
+        return messages
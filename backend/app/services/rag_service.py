@@ -1,14 +1,259 @@
-from typing import List, Dict, Optional
+import asyncio
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 from app.database.connection import engine
 from sqlalchemy import text
-import openai
 from app.core.config import settings
+from app.services.search_index import BM25Index, reciprocal_rank_fusion
+from app.services.vector_store import FaissVectorStore
+from app.services.semantic_cache import SemanticCache
+from app.services.prompt_builder import PromptBuilder
+from app.services.singleflight import llm_singleflight, make_key
+from app.services.llm_gateway import llm_gateway, LLMUnavailableError
+from app.services.model_router import model_router
+from app.services.openai_service import generate_fallback_response
+
+RAG_MODEL = 'gpt-3.5-turbo'  # modelo de la ruta con LLM_ROUTER_ENABLED=false
+RAG_MAX_TOKENS = 300
+FALLBACK_RESPONSE = 'Lo siento, no pude procesar tu consulta en este momento. ¿Podrías reformular tu pregunta?'
+
+
+@dataclass
+class RetrievalResult:
+    """Contexto recuperado para un mensaje; el embedding se calcula una sola vez"""
+    knowledge: List[Dict] = field(default_factory=list)
+    products: List[Dict] = field(default_factory=list)
+    query_embedding: Optional[List[float]] = None
+    version: int = 0
+
 
 class RAGService:
     def __init__(self):
-        self.openai_client = openai.OpenAI(api_key=settings.openai_api_key)
+        # Índices BM25 en memoria: la ruta del chat no consulta Postgres
+        self.knowledge_index = BM25Index(fields={'title': 2.0, 'content': 1.0, 'category': 1.0})
+        self.product_index = BM25Index(fields={'title': 3.0, 'category': 2.0, 'description': 1.0})
+        self.indexes_ready = False
+        self.vector_store = FaissVectorStore(settings.rag_index_path)
+        self._last_sync: Optional[datetime] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        
+        # Versión del contenido indexado: invalida el caché semántico al cambiar
+        self.content_version = 0
+        self.semantic_cache = SemanticCache(
+            threshold=settings.rag_semantic_cache_threshold,
+            ttl=settings.rag_semantic_cache_ttl_seconds,
+            max_entries=settings.rag_semantic_cache_max_entries
+        )
+    
+    # ==================== ÍNDICES ====================
+    
+    @staticmethod
+    def _knowledge_document(row) -> Dict:
+        return {'title': row[1], 'content': row[2], 'category': row[3]}
+    
+    @staticmethod
+    def _product_document(row) -> Dict:
+        return {'id': row[0], 'title': row[1], 'description': row[2] or '', 'price': float(row[3]), 'category': row[4], 'stock': row[5]}
+    
+    def _bump_version(self) -> None:
+        """Marca un cambio en productos o conocimiento y descarta las respuestas cacheadas"""
+        self.content_version += 1
+        self.semantic_cache.invalidate()
+    
+    @staticmethod
+    def _next_watermark(current: Optional[datetime], *row_sets) -> Optional[datetime]:
+        """
+        Marca de agua de la siguiente sincronización: el mayor updated_at leído de la base
+        de datos (última columna de cada fila), nunca el reloj del servidor de la app
+        """
+        watermark = current
+        for rows in row_sets:
+            for row in rows:
+                updated_at = row[-1]
+                if isinstance(updated_at, str):  # SQLite devuelve texto en consultas crudas
+                    updated_at = datetime.fromisoformat(updated_at)
+                if updated_at is not None and (watermark is None or updated_at > watermark):
+                    watermark = updated_at
+        return watermark
+    
+    def build_indexes(self) -> None:
+        """Construye los índices completos desde rag_knowledge y products"""
+        with engine.connect() as conn:
+            knowledge_rows = conn.execute(text('SELECT id, title, content, category, updated_at FROM rag_knowledge')).fetchall()
+            product_rows = conn.execute(
+                text('SELECT id, title, description, price, category, stock, updated_at FROM products WHERE active = true')
+            ).fetchall()
+        
+        self.knowledge_index.rebuild((row[0], self._knowledge_document(row)) for row in knowledge_rows)
+        self.product_index.rebuild((row[0], self._product_document(row)) for row in product_rows)
+        self._last_sync = self._next_watermark(None, knowledge_rows, product_rows)
+        self.indexes_ready = True
+        self._bump_version()
+        print(f'✅ Índices RAG construidos: {len(self.knowledge_index)} conocimientos, {len(self.product_index)} productos')
+    
+    def refresh_indexes(self) -> None:
+        """
+        Sincroniza incrementalmente las filas modificadas o eliminadas desde la última sincronización.
+        Se relee una ventana de solapamiento antes de la marca de agua para no perder transacciones
+        que confirmaron tarde; las filas releídas sin cambios no invalidan el caché semántico.
+        """
+        if not self.indexes_ready:
+            self.build_indexes()
+            return
+        
+        if self._last_sync is None:
+            since = datetime.min
+        else:
+            since = self._last_sync - timedelta(seconds=settings.rag_index_sync_overlap_seconds)
+        with engine.connect() as conn:
+            changed_knowledge = conn.execute(
+                text('SELECT id, title, content, category, updated_at FROM rag_knowledge WHERE updated_at >= :since'),
+                {'since': since}
+            ).fetchall()
+            knowledge_ids = {row[0] for row in conn.execute(text('SELECT id FROM rag_knowledge'))}
+            changed_products = conn.execute(
+                text('SELECT id, title, description, price, category, stock, active, updated_at FROM products WHERE updated_at >= :since'),
+                {'since': since}
+            ).fetchall()
+            product_ids = {row[0] for row in conn.execute(text('SELECT id FROM products WHERE active = true'))}
+        
+        changed = False
+        removed_knowledge = self.knowledge_index.ids() - knowledge_ids
+        for row in changed_knowledge:
+            document = self._knowledge_document(row)
+            if self.knowledge_index.get(row[0]) != document:
+                self.knowledge_index.upsert(row[0], document)
+                changed = True
+        for doc_id in removed_knowledge:
+            self.knowledge_index.remove(doc_id)
+        
+        removed_products = self.product_index.ids() - product_ids
+        for row in changed_products:
+            if row[6]:
+                document = self._product_document(row)
+                if self.product_index.get(row[0]) != document:
+                    self.product_index.upsert(row[0], document)
+                    changed = True
+            elif self.product_index.remove(row[0]):
+                changed = True
+        for doc_id in removed_products:
+            self.product_index.remove(doc_id)
+        
+        self._last_sync = self._next_watermark(self._last_sync, changed_knowledge, changed_products)
+        if changed or removed_knowledge or removed_products:
+            self._bump_version()
+    
+    def index_product(self, product) -> None:
+        """Actualiza un producto en el índice tras crearlo o editarlo"""
+        if not product.active:
+            self.remove_product(product.id)
+            return
+        self.product_index.upsert(product.id, {
+            'id': product.id,
+            'title': product.title,
+            'description': product.description or '',
+            'price': float(product.price),
+            'category': getattr(product, 'category', None),
+            'stock': getattr(product, 'stock', None)
+        })
+        self._bump_version()
+    
+    def remove_product(self, product_id: int) -> None:
+        """Elimina un producto del índice"""
+        if self.product_index.remove(product_id):
+            self._bump_version()
+    
+    async def start_index_refresh(self) -> None:
+        """Construye los índices y lanza la sincronización periódica en segundo plano"""
+        try:
+            await asyncio.to_thread(self.build_indexes)
+        except Exception as e:
+            print(f'⚠️ No se pudieron construir los índices RAG: {e}')
+        await self.reload_vector_store()
+        self._refresh_task = asyncio.create_task(self._refresh_loop())
+    
+    async def stop_index_refresh(self) -> None:
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+    
+    async def reload_vector_store(self) -> bool:
+        """
+        Carga en un hilo la versión del índice FAISS apuntada por CURRENT y la intercambia
+        sin interrumpir las búsquedas en curso; si falla se mantiene la versión anterior
+        """
+        if settings.rag_retrieval_mode == 'lexical':
+            return False
+        try:
+            if await asyncio.to_thread(self.vector_store.load):
+                self._bump_version()
+                return True
+        except Exception as e:
+            print(f'⚠️ No se pudo cargar el índice FAISS: {e}')
+        return False
+    
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.rag_index_refresh_seconds)
+            try:
+                await asyncio.to_thread(self.refresh_indexes)
+            except Exception as e:
+                print(f'Error sincronizando índices RAG: {e}')
+            if self.vector_store.has_update():
+                await self.reload_vector_store()
+    
+    # ==================== BÚSQUEDA ====================
     
     async def search_knowledge(self, query: str, limit: int = 3) -> List[Dict]:
+        if not self.indexes_ready:
+            return await asyncio.to_thread(self._search_knowledge_db, query, limit)
+        return [
+            {**self.knowledge_index.get(doc_id), 'score': score}
+            for doc_id, score in self.knowledge_index.search(query, limit)
+        ]
+    
+    async def search_products(self, query: str, limit: int = 5) -> List[Dict]:
+        if not self.indexes_ready:
+            return await asyncio.to_thread(self._search_products_db, query, limit)
+        return [
+            {**self.product_index.get(doc_id), 'score': score}
+            for doc_id, score in self.product_index.search(query, limit)
+        ]
+    
+    async def embed_query(self, query: str) -> Optional[List[float]]:
+        """Calcula el embedding de la consulta (una sola llamada por mensaje)"""
+        try:
+            response = await llm_gateway.embeddings(input=query, model=settings.rag_embedding_model, route='rag_embedding')
+            return response.data[0].embedding
+        except Exception as e:
+            print(f'Error calculando embedding: {e}')
+            return None
+    
+    @property
+    def uses_vectors(self) -> bool:
+        return settings.rag_retrieval_mode != 'lexical' and self.vector_store.ready
+    
+    async def retrieve_knowledge(self, query: str, limit: int = 3, query_embedding: Optional[List[float]] = None) -> List[Dict]:
+        """Recupera conocimiento según RAG_RETRIEVAL_MODE: lexical, vector o hybrid (fusión RRF)"""
+        mode = settings.rag_retrieval_mode
+        lexical = await self.search_knowledge(query, limit) if mode != 'vector' else []
+        if not self.uses_vectors:
+            return lexical
+        
+        if query_embedding is None:
+            query_embedding = await self.embed_query(query)
+        if query_embedding is None:
+            return lexical
+        
+        vector = [doc for doc, _ in self.vector_store.search(query_embedding, settings.rag_vector_top_k)]
+        if mode == 'vector':
+            return vector[:limit]
+        return reciprocal_rank_fusion([lexical, vector], limit=limit, k=settings.rag_rrf_k)
+    
+    def _search_knowledge_db(self, query: str, limit: int = 3) -> List[Dict]:
+        """Búsqueda directa en la base de datos mientras los índices no están listos"""
         try:
             with engine.connect() as conn:
                 result = conn.execute(
@@ -23,7 +268,8 @@ class RAGService:
             print(f'Error buscando conocimiento: {e}')
             return []
     
-    async def search_products(self, query: str, limit: int = 5) -> List[Dict]:
+    def _search_products_db(self, query: str, limit: int = 5) -> List[Dict]:
+        """Búsqueda directa en la base de datos mientras los índices no están listos"""
         try:
             with engine.connect() as conn:
                 result = conn.execute(
@@ -38,49 +284,181 @@ class RAGService:
             print(f'Error buscando productos: {e}')
             return []
     
+    @property
+    def needs_embedding(self) -> bool:
+        return self.uses_vectors or settings.rag_semantic_cache_enabled
+    
+    async def _embed_and_retrieve_knowledge(self, user_message: str) -> Tuple[List[Dict], Optional[List[float]]]:
+        query_embedding = await self.embed_query(user_message) if self.needs_embedding else None
+        knowledge = await self.retrieve_knowledge(user_message, query_embedding=query_embedding)
+        return knowledge, query_embedding
+    
+    async def retrieve_context(self, user_message: str) -> RetrievalResult:
+        """
+        Recupera conocimiento y productos en una sola pasada: ambas búsquedas corren
+        en paralelo y el resultado sirve tanto para el prompt como para las recomendaciones
+        """
+        version = self.content_version
+        (knowledge, query_embedding), products = await asyncio.gather(
+            self._embed_and_retrieve_knowledge(user_message),
+            self.search_products(user_message, limit=5)
+        )
+        return RetrievalResult(knowledge=knowledge, products=products, query_embedding=query_embedding, version=version)
+    
+    @staticmethod
+    def build_recommendations(products: List[Dict]) -> List[Dict]:
+        """Arma el payload de recomendaciones a partir de los productos ya recuperados"""
+        return [
+            {
+                'id': product['id'],
+                'title': product['title'],
+                'description': product.get('description') or '',
+                'price': product['price'],
+                'category': product.get('category'),
+                'stock': product.get('stock'),
+                'in_stock': (product.get('stock') or 0) > 0,
+                'score': round(product.get('score', 0.0), 4)
+            }
+            for product in products
+        ]
+    
+    def get_cached_answer(self, retrieval: RetrievalResult) -> Optional[str]:
+        """Busca una respuesta semánticamente equivalente ya generada"""
+        if not settings.rag_semantic_cache_enabled or retrieval.query_embedding is None:
+            return None
+        entry = self.semantic_cache.lookup(retrieval.query_embedding, self.content_version)
+        return entry.answer if entry else None
+    
+    def cache_answer(self, user_message: str, retrieval: RetrievalResult, answer: str, total_tokens: int, latency_ms: float) -> None:
+        if not settings.rag_semantic_cache_enabled or retrieval.query_embedding is None:
+            return
+        self.semantic_cache.store(
+            user_message, retrieval.query_embedding, answer,
+            version=retrieval.version, total_tokens=total_tokens, latency_ms=latency_ms
+        )
+    
+    def _build_messages(self, user_message: str, knowledge: List[Dict], products: List[Dict], model: str = RAG_MODEL) -> List[Dict]:
+        """Prompt dentro del presupuesto del modelo: el conocimiento tiene prioridad sobre los productos"""
+        builder = PromptBuilder(model, max_completion_tokens=RAG_MAX_TOKENS)
+        builder.set_system('Eres un asistente virtual de una tienda online. Usa la información de abajo para responder de manera útil y amigable. Instrucciones: - Responde en español - Sé amigable y profesional - Si hay productos relevantes, menciónalos - Si no tienes información específica, ofrece ayuda general - Mantén las respuestas concisas pero útiles')
+        builder.add_context(
+            'Información de la tienda:',
+            [f'- {item["title"]}: {item["content"]}' for item in knowledge],
+            priority=2
+        )
+        builder.add_context(
+            'Productos disponibles:',
+            [f'- {product["title"]}: ${product["price"]} ({product["category"]})' for product in products[:3]],
+            priority=1
+        )
+        builder.set_user(user_message)
+        return builder.build()
+    
     async def generate_response(self, user_message: str, context: List[Dict] = None) -> str:
         try:
-            knowledge = await self.search_knowledge(user_message)
-            products = await self.search_products(user_message)
-            
-            context_text = ''
-            if knowledge:
-                context_text += 'Información de la tienda:\n'
-                for item in knowledge:
-                    context_text += f'- {item["title"]}: {item["content"]}\n'
-                context_text += '\n'
-            
-            if products:
-                context_text += 'Productos disponibles:\n'
-                for product in products[:3]:
-                    context_text += f'- {product["title"]}: ${product["price"]} ({product["category"]})\n'
-                context_text += '\n'
+            retrieval = await self.retrieve_context(user_message)
+            return await self.complete_response(user_message, retrieval)
+        except Exception as e:
+            print(f'Error generando respuesta RAG: {e}')
+            return FALLBACK_RESPONSE
+    
+    async def complete_response(self, user_message: str, retrieval: RetrievalResult) -> str:
+        """Genera la respuesta completa con el contexto ya recuperado"""
+        try:
+            cached = self.get_cached_answer(retrieval)
+            if cached:
+                return cached
             
-            system_prompt = f'Eres un asistente virtual de una tienda online. Usa la siguiente información para responder de manera útil y amigable: {context_text} Instrucciones: - Responde en español - Sé amigable y profesional - Si hay productos relevantes, menciónalos - Si no tienes información específica, ofrece ayuda general - Mantén las respuestas concisas pero útiles'
+            model = model_router.choose('rag', user_message, RAG_MODEL).model
+            messages = self._build_messages(user_message, retrieval.knowledge, retrieval.products, model)
+            started = time.perf_counter()
+            answer, total_tokens = await llm_singleflight.do(
+                make_key(messages=messages, model=model, temperature=0.7, max_tokens=RAG_MAX_TOKENS),
+                lambda: self._complete(messages, model)
+            )
+            self.cache_answer(user_message, retrieval, answer, total_tokens, (time.perf_counter() - started) * 1000)
+            return answer
             
-            response = self.openai_client.chat.completions.create(
-                model='gpt-3.5-turbo',
-                messages=[
-                    {'role': 'system', 'content': system_prompt},
-                    {'role': 'user', 'content': user_message}
-                ],
-                max_tokens=300,
-                temperature=0.7
+        except LLMUnavailableError as e:
+            print(f'⚠️ LLM no disponible, respuesta de fallback: {e}')
+            return generate_fallback_response(user_message)
+        except Exception as e:
+            print(f'Error generando respuesta RAG: {e}')
+            return FALLBACK_RESPONSE
+    
+    async def _complete(self, messages: List[Dict], model: str) -> Tuple[str, int]:
+        completion = await llm_gateway.hedged_chat_completion(
+            model=model,
+            messages=messages,
+            max_tokens=RAG_MAX_TOKENS,
+            temperature=0.7,
+            route='rag'
+        )
+        total_tokens = completion.usage.total_tokens if completion.usage else 0
+        return completion.content, total_tokens
+    
+    async def stream_response(self, user_message: str, retrieval: RetrievalResult) -> AsyncIterator[str]:
+        """Genera la respuesta token a token con el contexto ya recuperado"""
+        cached = self.get_cached_answer(retrieval)
+        if cached:
+            yield cached
+            return
+        
+        emitted = False
+        try:
+            started = time.perf_counter()
+            model = model_router.choose('rag_stream', user_message, RAG_MODEL).model
+            stream = llm_gateway.hedged_stream_chat_completion(
+                model=model,
+                messages=self._build_messages(user_message, retrieval.knowledge, retrieval.products, model),
+                max_tokens=RAG_MAX_TOKENS,
+                temperature=0.7,
+                route='rag_stream',
+                stream_options={'include_usage': True}
             )
             
-            return response.choices[0].message.content
+            parts = []
+            total_tokens = 0
+            async for chunk in stream:
+                if chunk.usage:
+                    total_tokens = chunk.usage.total_tokens
+                if chunk.choices and chunk.choices[0].delta.content:
+                    emitted = True
+                    parts.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
             
+            self.cache_answer(user_message, retrieval, ''.join(parts), total_tokens, (time.perf_counter() - started) * 1000)
+                    
+        except LLMUnavailableError as e:
+            print(f'⚠️ LLM no disponible, respuesta de fallback: {e}')
+            if not emitted:
+                yield generate_fallback_response(user_message)
         except Exception as e:
-            print(f'Error generando respuesta RAG: {e}')
-            return 'Lo siento, no pude procesar tu consulta en este momento. ¿Podrías reformular tu pregunta?'
+            print(f'Error generando respuesta RAG en streaming: {e}')
+            if not emitted:
+                yield FALLBACK_RESPONSE
     
     async def get_recommendations(self, user_message: str) -> List[Dict]:
         try:
             products = await self.search_products(user_message, limit=5)
-            return products
+            return self.build_recommendations(products)
         except Exception as e:
             print(f'Error obteniendo recomendaciones: {e}')
             return []
+    
+    async def answer_with_recommendations(self, user_message: str) -> Dict:
+        """
+        Respuesta y recomendaciones con una sola recuperación: la llamada al LLM
+        arranca de inmediato y el payload de recomendaciones se arma mientras tanto
+        """
+        retrieval = await self.retrieve_context(user_message)
+        answer_task = asyncio.create_task(self.complete_response(user_message, retrieval))
+        try:
+            recommendations = self.build_recommendations(retrieval.products)
+        except Exception as e:
+            print(f'Error obteniendo recomendaciones: {e}')
+            recommendations = []
+        return {'response': await answer_task, 'recommendations': recommendations}
 
 rag_service = RAGService()
 
@@ -89,8 +467,7 @@ async def rag_answer(query: str, db=None, context: List[Dict] = None) -> str:
 
 async def advanced_rag_answer(query: str, db=None, context: List[Dict] = None) -> Dict:
     try:
-        response = await rag_service.generate_response(query, context)
-        recommendations = await rag_service.get_recommendations(query)
-        return {'response': response, 'recommendations': recommendations, 'context': context or []}
+        result = await rag_service.answer_with_recommendations(query)
+        return {**result, 'context': context or []}
     except Exception as e:
         return {'response': f'Lo siento, no pude procesar tu consulta: {str(e)}', 'recommendations': [], 'context': []}
\ No newline at end of file
@@ -1,62 +1,28 @@
 """
-Servicio de Redis Cache usando redis-py directamente
+Servicio de cache del chat (contexto, sesiones, intenciones, rate limit...)
+Fachada con claves y helpers por tipo de dato sobre el caché por niveles (L1 + Redis);
+los TTL salen del registro de namespaces de tiered_cache
 """
-import json
-import asyncio
 from typing import Dict, List, Any, Optional
-from datetime import datetime, timedelta
+from datetime import datetime
 import hashlib
-import os
-from dotenv import load_dotenv
 
-load_dotenv()
+from app.services.tiered_cache import tiered_cache
+
 
 class RedisPyCacheService:
-    """Servicio de cache usando redis-py directamente"""
+    """Servicio de cache del chat sobre el caché por niveles"""
     
     def __init__(self):
-        self.redis = None
-        self.connected = False
-        
-        # Configuración de TTL
-        self.ttl_config = {
-            "product_context": 300,      # 5 minutos
-            "user_session": 1800,        # 30 minutos
-            "intent_analysis": 600,      # 10 minutos
-            "response_cache": 900,        # 15 minutos
-            "rate_limit": 60,             # 1 minuto
-            "spam_detection": 300,        # 5 minutos
-            "conversation_history": 1800, # 30 minutos
-            "product_recommendations": 600 # 10 minutos
-        }
+        self.cache = tiered_cache
+    
+    @property
+    def connected(self) -> bool:
+        return self.cache.connected
     
     async def connect(self) -> bool:
-        """Conecta a Redis real usando redis-py"""
-        try:
-            import redis
-            redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
-            
-            # Parsear URL de Redis
-            if redis_url.startswith("redis://"):
-                redis_url = redis_url[8:]  # Remover redis://
-            
-            # Conectar usando redis-py
-            self.redis = redis.Redis(host='localhost', port=6379, decode_responses=True)
-            
-            # Hacer ping
-            pong = self.redis.ping()
-            if pong:
-                self.connected = True
-                print("✅ Redis real conectado exitosamente (redis-py)")
-                return True
-            else:
-                self.connected = False
-                return False
-                
-        except Exception as e:
-            print(f"⚠️ Error conectando a Redis real: {e}")
-            self.connected = False
-            return False
+        """Conecta el L2 (Redis) del caché compartido"""
+        return await self.cache.connect()
     
     def _generate_cache_key(self, prefix: str, identifier: str, *args) -> str:
         """Genera una clave de cache única"""
@@ -70,150 +36,179 @@ class RedisPyCacheService:
         
         return key_string
     
+    # Claves por tipo de dato (el prefijo es el namespace que define el TTL)
+    def _response_key(self, query: str) -> str:
+        return self._generate_cache_key("response", hashlib.md5(query.lower().encode()).hexdigest())
+    
+    def _intent_key(self, message: str) -> str:
+        return self._generate_cache_key("intent", hashlib.md5(message.lower().encode()).hexdigest())
+    
+    def _spam_key(self, message: str) -> str:
+        return self._generate_cache_key("spam", hashlib.md5(message.encode()).hexdigest())
+    
+    def _rate_limit_key(self, user_id: str) -> str:
+        return self._generate_cache_key("rate_limit", user_id)
+    
+    def _rate_window_key(self, user_id: str) -> str:
+        return self._generate_cache_key("rate_window", user_id)
+    
+    def _product_context_key(self) -> str:
+        return self._generate_cache_key("context", "products")
+    
+    def _session_key(self, user_id: str) -> str:
+        return self._generate_cache_key("session", user_id)
+    
+    def _conversation_key(self, chat_id: int) -> str:
+        return self._generate_cache_key("conversation", str(chat_id))
+    
     async def get(self, key: str) -> Optional[Any]:
         """Obtiene un valor del cache"""
-        if not self.connected or not self.redis:
-            return None
-        
-        try:
-            value = self.redis.get(key)
-            if value:
-                return json.loads(value)
-            return None
-        except Exception as e:
-            print(f"Error obteniendo cache {key}: {e}")
-            return None
+        return await self.cache.get(key)
     
     async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
-        """Establece un valor en el cache"""
-        if not self.connected or not self.redis:
-            return False
-        
-        try:
-            serialized_value = json.dumps(value, default=str)
-            if ttl:
-                self.redis.setex(key, ttl, serialized_value)
-            else:
-                self.redis.set(key, serialized_value)
-            return True
-        except Exception as e:
-            print(f"Error estableciendo cache {key}: {e}")
-            return False
+        """Establece un valor en el cache (TTL del namespace si no se indica)"""
+        return await self.cache.set(key, value, ttl)
     
     # Métodos específicos para el chat
     async def cache_product_context(self, products_data: List[Dict], ttl: Optional[int] = None) -> bool:
         """Cache del contexto de productos"""
-        key = self._generate_cache_key("products", "context")
-        ttl = ttl or self.ttl_config["product_context"]
+        key = self._product_context_key()
         return await self.set(key, products_data, ttl)
     
     async def get_cached_product_context(self) -> Optional[List[Dict]]:
         """Obtiene el contexto de productos desde cache"""
-        key = self._generate_cache_key("products", "context")
+        key = self._product_context_key()
         return await self.get(key)
     
     async def cache_user_session(self, user_id: str, session_data: Dict) -> bool:
         """Cache de sesión de usuario"""
-        key = self._generate_cache_key("session", user_id)
-        ttl = self.ttl_config["user_session"]
-        return await self.set(key, session_data, ttl)
+        key = self._session_key(user_id)
+        return await self.set(key, session_data)
     
     async def get_cached_user_session(self, user_id: str) -> Optional[Dict]:
         """Obtiene la sesión de usuario desde cache"""
-        key = self._generate_cache_key("session", user_id)
+        key = self._session_key(user_id)
         return await self.get(key)
     
     async def cache_intent_analysis(self, message: str, intent_data: Dict) -> bool:
         """Cache del análisis de intención"""
-        message_hash = hashlib.md5(message.lower().encode()).hexdigest()
-        key = self._generate_cache_key("intent", message_hash)
-        ttl = self.ttl_config["intent_analysis"]
-        return await self.set(key, intent_data, ttl)
+        key = self._intent_key(message)
+        return await self.set(key, intent_data)
     
     async def get_cached_intent_analysis(self, message: str) -> Optional[Dict]:
         """Obtiene el análisis de intención desde cache"""
-        message_hash = hashlib.md5(message.lower().encode()).hexdigest()
-        key = self._generate_cache_key("intent", message_hash)
+        key = self._intent_key(message)
         return await self.get(key)
     
     async def cache_response(self, query: str, response_data: Dict) -> bool:
         """Cache de respuestas frecuentes"""
-        query_hash = hashlib.md5(query.lower().encode()).hexdigest()
-        key = self._generate_cache_key("response", query_hash)
-        ttl = self.ttl_config["response_cache"]
-        return await self.set(key, response_data, ttl)
+        key = self._response_key(query)
+        return await self.set(key, response_data)
     
     async def get_cached_response(self, query: str) -> Optional[Dict]:
         """Obtiene respuesta desde cache"""
-        query_hash = hashlib.md5(query.lower().encode()).hexdigest()
-        key = self._generate_cache_key("response", query_hash)
+        key = self._response_key(query)
         return await self.get(key)
     
     async def cache_rate_limit(self, user_id: str, rate_data: Dict) -> bool:
         """Cache de rate limiting"""
-        key = self._generate_cache_key("rate_limit", user_id)
-        ttl = self.ttl_config["rate_limit"]
-        return await self.set(key, rate_data, ttl)
+        key = self._rate_limit_key(user_id)
+        return await self.set(key, rate_data)
     
     async def get_cached_rate_limit(self, user_id: str) -> Optional[Dict]:
         """Obtiene datos de rate limiting desde cache"""
-        key = self._generate_cache_key("rate_limit", user_id)
+        key = self._rate_limit_key(user_id)
         return await self.get(key)
     
+    async def hit_rate_limit(self, user_id: str, limit: int = 10, window_seconds: int = 60) -> bool:
+        """Cuenta un mensaje del usuario en la ventana compartida por todos los workers"""
+        return await self.cache.hit_window(self._rate_window_key(user_id), limit, window_seconds)
+    
     async def cache_conversation_history(self, chat_id: int, history: List[Dict]) -> bool:
         """Cache del historial de conversación"""
-        key = self._generate_cache_key("conversation", str(chat_id))
-        ttl = self.ttl_config["conversation_history"]
-        return await self.set(key, history, ttl)
+        key = self._conversation_key(chat_id)
+        return await self.set(key, history)
     
     async def get_cached_conversation_history(self, chat_id: int) -> Optional[List[Dict]]:
         """Obtiene historial de conversación desde cache"""
-        key = self._generate_cache_key("conversation", str(chat_id))
+        key = self._conversation_key(chat_id)
         return await self.get(key)
     
     async def cache_product_recommendations(self, user_id: str, recommendations: List[Dict]) -> bool:
         """Cache de recomendaciones de productos"""
-        key = self._generate_cache_key("recommendations", user_id)
-        ttl = self.ttl_config["product_recommendations"]
-        return await self.set(key, recommendations, ttl)
+        key = self._generate_cache_key("chat_recommendations", user_id)
+        return await self.set(key, recommendations)
     
     async def get_cached_product_recommendations(self, user_id: str) -> Optional[List[Dict]]:
         """Obtiene recomendaciones de productos desde cache"""
-        key = self._generate_cache_key("recommendations", user_id)
+        key = self._generate_cache_key("chat_recommendations", user_id)
         return await self.get(key)
     
     async def cache_spam_detection(self, message: str, is_spam: bool) -> bool:
         """Cache de detección de spam"""
-        message_hash = hashlib.md5(message.encode()).hexdigest()
-        key = self._generate_cache_key("spam", message_hash)
-        ttl = self.ttl_config["spam_detection"]
-        return await self.set(key, {"is_spam": is_spam, "timestamp": datetime.now().isoformat()}, ttl)
+        key = self._spam_key(message)
+        return await self.set(key, {"is_spam": is_spam, "timestamp": datetime.now().isoformat()})
     
     async def get_cached_spam_detection(self, message: str) -> Optional[Dict]:
         """Obtiene resultado de detección de spam desde cache"""
-        message_hash = hashlib.md5(message.encode()).hexdigest()
-        key = self._generate_cache_key("spam", message_hash)
+        key = self._spam_key(message)
         return await self.get(key)
     
+    # Lecturas y escrituras agrupadas: un solo viaje a Redis por mensaje
+    async def get_message_state(self, message: str) -> Dict[str, Any]:
+        """Respuesta, intención y spam cacheados de un mensaje en un solo pipeline"""
+        keys = {
+            "response": self._response_key(message),
+            "intent": self._intent_key(message),
+            "spam": self._spam_key(message),
+        }
+        found = await self.cache.get_many(list(keys.values()))
+        return {name: found.get(key) for name, key in keys.items()}
+    
+    async def save_message_state(
+        self,
+        message: str,
+        intent: Optional[Dict] = None,
+        spam: Optional[Dict] = None
+    ) -> bool:
+        """Guarda en un solo pipeline los datos de un mensaje que cambiaron"""
+        items = {}
+        if intent is not None:
+            items[self._intent_key(message)] = intent
+        if spam is not None:
+            items[self._spam_key(message)] = spam
+        return await self.cache.set_many(items)
+    
+    async def get_context_state(self, user_id: Optional[str], chat_id: Optional[int]) -> Dict[str, Any]:
+        """Contexto de productos, sesión e historial en un solo pipeline"""
+        keys = {"products": self._product_context_key()}
+        if user_id:
+            keys["session"] = self._session_key(str(user_id))
+        if chat_id:
+            keys["history"] = self._conversation_key(chat_id)
+        found = await self.cache.get_many(list(keys.values()))
+        return {name: found.get(key) for name, key in keys.items()}
+    
+    async def save_context_state(
+        self,
+        user_id: Optional[str],
+        chat_id: Optional[int],
+        products: Optional[List[Dict]] = None,
+        session: Optional[Dict] = None,
+        history: Optional[List[Dict]] = None
+    ) -> bool:
+        items = {}
+        if products:
+            items[self._product_context_key()] = products
+        if session is not None and user_id:
+            items[self._session_key(str(user_id))] = session
+        if history is not None and chat_id:
+            items[self._conversation_key(chat_id)] = history
+        return await self.cache.set_many(items)
+    
     async def get_cache_stats(self) -> Dict[str, Any]:
         """Obtiene estadísticas del cache"""
-        if not self.connected or not self.redis:
-            return {"status": "disconnected"}
-        
-        try:
-            # Obtener información básica del cache
-            keys = self.redis.keys("*")
-            info = self.redis.info()
-            return {
-                "status": "connected",
-                "cache_type": "redis_real",
-                "total_keys": len(keys),
-                "keys_sample": keys[:10] if keys else [],
-                "used_memory": info.get("used_memory_human", "N/A"),
-                "connected_clients": info.get("connected_clients", 0)
-            }
-        except Exception as e:
-            return {"status": "error", "error": str(e)}
+        return await self.cache.get_cache_stats()
     
     async def warm_up_cache(self, db_session) -> bool:
         """Pre-carga datos importantes en el cache"""
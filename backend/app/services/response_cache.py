@@ -0,0 +1,183 @@
+"""
+Caché de respuestas pre-serializadas para los endpoints de lectura más calientes
+Guarda los bytes finales del JSON (y su versión gzip cuando compensa) en memoria del
+worker, con las versiones de los tags del catálogo en la clave. Un hit no decodifica,
+no valida con pydantic ni vuelve a serializar: devuelve los bytes tal cual, así que
+cuesta lo mismo con 10 productos que con 10.000.
+
+Las mismas claves versionadas dan el ETag: si el cliente envía ``If-None-Match`` con la
+versión vigente se responde 304 sin consultar la base de datos ni serializar nada. Las
+versiones solo son compartidas entre workers a través de Redis: sin L2 no se emiten ETags
+ni se responde 304 (otro worker podría haber invalidado el recurso sin que este lo sepa).
+"""
+import gzip
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from app.core.config import settings
+from app.services.tiered_cache import LRUTTLCache, tiered_cache
+
+
+def encode_json(payload: Any) -> bytes:
+    """Serializa igual que JSONResponse de FastAPI"""
+    return json.dumps(
+        jsonable_encoder(payload),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+
+GZIP_ETAG_SUFFIX = "-gzip"
+
+
+def make_etag(tagged_key: str) -> str:
+    """ETag fuerte a partir de la clave con las versiones de sus tags"""
+    return '"' + hashlib.sha1(tagged_key.encode("utf-8")).hexdigest()[:24] + '"'
+
+
+def _opaque_tag(etag: str) -> str:
+    etag = etag.strip()
+    if etag.startswith("W/"):
+        etag = etag[2:]
+    return etag.strip('"').removesuffix(GZIP_ETAG_SUFFIX)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    ``If-None-Match`` coincide con ``etag`` (comparación débil, como pide la RFC 9110
+    para GET condicional; la variante gzip cuenta como la misma versión)
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    expected = _opaque_tag(etag)
+    return any(_opaque_tag(candidate) == expected for candidate in header.split(","))
+
+
+def cache_headers(etag: Optional[str]) -> Dict[str, str]:
+    headers = {
+        "Cache-Control": f"public, max-age={settings.http_cache_max_age_seconds}, must-revalidate",
+        "Vary": "Accept-Encoding"
+    }
+    if etag:
+        headers["ETag"] = etag
+    return headers
+
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag))
+
+
+@dataclass
+class EncodedResponse:
+    """Cuerpo JSON ya serializado y, si supera el umbral, comprimido"""
+    body: bytes
+    gzip_body: Optional[bytes] = None
+    # Cabeceras propias de la respuesta (p. ej. el cursor de la página siguiente)
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, body: bytes, headers: Optional[Dict[str, str]] = None) -> "EncodedResponse":
+        gzip_body = None
+        if len(body) >= settings.response_cache_gzip_min_bytes:
+            compressed = gzip.compress(body, compresslevel=6)
+            if len(compressed) < len(body):
+                gzip_body = compressed
+        return cls(body, gzip_body, dict(headers or {}))
+
+
+class ResponseCache:
+    """Bytes de respuesta por clave y versión de tags (L1 del worker, sin Redis)"""
+
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None):
+        self.cache = tiered_cache
+        self.entries = LRUTTLCache(max_entries or settings.response_cache_max_entries)
+        self.ttl = ttl if ttl is not None else settings.response_cache_ttl_seconds
+
+        # Métricas
+        self.hits = 0
+        self.misses = 0
+        self.gzip_served = 0
+        self.not_modified = 0
+
+    async def etag_for(self, key: str, tags: List[str]) -> Optional[str]:
+        """ETag de la versión vigente de ``key`` (no consulta la base de datos); None sin Redis"""
+        if not self.cache.l2_available:
+            return None
+        return make_etag(await self.cache.tagged_key(f"response:{key}", tags))
+
+    async def check_not_modified(self, request: Request, key: str, tags: List[str]) -> Tuple[Optional[str], Optional[Response]]:
+        """(ETag o None, respuesta 304 si el cliente ya tiene esta versión o None)"""
+        etag = await self.etag_for(key, tags)
+        if etag and etag_matches(request, etag):
+            self.not_modified += 1
+            return etag, not_modified_response(etag)
+        return etag, None
+
+    async def get_or_render(
+        self,
+        request: Request,
+        key: str,
+        tags: List[str],
+        render: Callable[[], Awaitable[Union[bytes, Tuple[bytes, Dict[str, str]]]]]
+    ) -> Response:
+        """
+        Devuelve la respuesta cacheada para ``key`` o la genera con ``render`` (que
+        devuelve el JSON ya serializado, opcionalmente junto a cabeceras propias). Las
+        invalidaciones de ``tags`` cambian la clave y el ETag; con ``If-None-Match``
+        vigente responde 304 sin llamar a ``render``
+        """
+        tagged_key = await self.cache.tagged_key(f"response:{key}", tags)
+        etag = make_etag(tagged_key) if self.cache.l2_available else None
+        if etag and etag_matches(request, etag):
+            self.not_modified += 1
+            return not_modified_response(etag)
+
+        found, encoded = self.entries.get(tagged_key)
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+            rendered = await render()
+            encoded = EncodedResponse.build(*rendered) if isinstance(rendered, tuple) else EncodedResponse.build(rendered)
+            self.entries.set(tagged_key, encoded, self.ttl)
+        return self._to_response(request, encoded, etag)
+
+    def _to_response(self, request: Request, encoded: EncodedResponse, etag: Optional[str]) -> Response:
+        headers = {**encoded.headers, **cache_headers(etag)}
+        body = encoded.body
+        if encoded.gzip_body is not None and "gzip" in request.headers.get("accept-encoding", ""):
+            body = encoded.gzip_body
+            # Cada codificación es una representación distinta y lleva su propio ETag fuerte
+            if etag:
+                headers["ETag"] = etag[:-1] + GZIP_ETAG_SUFFIX + '"'
+            headers["Content-Encoding"] = "gzip"
+            self.gzip_served += 1
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.entries.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "gzip_served": self.gzip_served,
+            "not_modified": self.not_modified,
+            "evictions": self.entries.evictions
+        }
+
+
+# Instancia global
+response_cache = ResponseCache()
@@ -0,0 +1,285 @@
+"""
+Router de respuestas por niveles
+Saludos, agradecimientos y preguntas frecuentes (envíos, horarios, pagos...) se responden
+con plantillas precompiladas a partir de docs/informacion_tienda.md y rag_knowledge; las
+preguntas informativas con buena cobertura en la base de conocimiento se responden solo con
+recuperación; únicamente las preguntas abiertas llegan al LLM
+"""
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.services.chat_optimizer import chat_optimizer
+from app.services.rag_service import rag_service
+from app.services.search_index import BM25Index, fold_accents, tokenize
+
+STORE_INFO_PATH = Path(__file__).resolve().parents[2] / "docs" / "informacion_tienda.md"
+
+TIER_TEMPLATE = "template"
+TIER_RETRIEVAL = "retrieval"
+TIER_LLM = "llm"
+
+# Tema -> (palabras clave sin acentos, secciones del documento, categoría en rag_knowledge, encabezado)
+FAQ_TOPICS: Dict[str, Tuple[List[str], List[str], Optional[str], str]] = {
+    "shipping": (["envio", "entrega", "delivery", "shipping", "cuando llega"],
+                 ["Costos de Envío", "Zonas de Entrega"], "shipping", "🚚 Opciones de envío"),
+    "hours": (["horario", "hora abren", "abren", "cierran", "atienden", "hora de atencion"],
+              ["Horarios de Atención"], "support", "🕘 Horarios de atención"),
+    "payment": (["metodo de pago", "metodos de pago", "pagar", "tarjeta", "paypal", "transferencia"],
+                ["Métodos de Pago"], "payment", "💳 Métodos de pago"),
+    "returns": (["devolucion", "devolver"],
+                ["Política de Devoluciones", "Proceso de Devolución"], "returns", "🔄 Devoluciones"),
+    "warranty": (["garantia"], ["Garantía del Fabricante"], "warranty", "🎁 Garantía"),
+    "contact": (["telefono", "contacto", "contactar", "whatsapp", "correo", "email"],
+                ["Canales de Contacto"], None, "📞 Canales de contacto"),
+    "locations": (["sucursal", "ubicacion", "direccion", "donde estan", "tienda fisica"],
+                  ["Ubicaciones"], None, "📍 Nuestras sucursales"),
+    "loyalty": (["puntos", "fidelidad", "recompensa"], ["Programas de Fidelidad"], "loyalty", "⭐ Programa de fidelidad"),
+}
+
+# Intenciones de ChatOptimizer que necesitan catálogo o empatía: siempre van al LLM
+LLM_INTENTS = ("product_inquiry", "price_inquiry", "support_request", "complaint")
+
+GREETING_TOKENS = frozenset({
+    "buen", "bueno", "buenos", "buena", "buenas", "dia", "dias", "tarde", "tardes", "noche", "noches",
+    "saludo", "saludos", "hello", "hi", "hey", "que", "tal",
+})
+COMPLIMENT_TOKENS = frozenset({
+    "excelente", "genial", "perfecto", "bueno", "buena", "gusta", "encanta", "amable",
+    "increible", "mucha", "mucho", "ok", "vale", "listo", "super",
+})
+# Mismo stemming que tokenize() para compararlas con los términos del mensaje ("tardes" -> "tard")
+GREETING_TOKENS = frozenset(tokenize(" ".join(GREETING_TOKENS)))
+COMPLIMENT_TOKENS = frozenset(tokenize(" ".join(COMPLIMENT_TOKENS)))
+# "No me gusta" no es un agradecimiento: con una negación el mensaje va al LLM
+NEGATION_TOKENS = frozenset({"no", "nunca", "nada", "ni", "tampoco", "jamas", "mal", "malo", "mala", "pesimo"})
+_WORD_RE = re.compile(r"\w+")
+
+# Palabras de una pregunta frecuente que no nombran un producto ni un caso concreto: si tras
+# quitarlas queda algún término ("la camisa azul", "me cobraron dos veces") no hay plantilla
+FAQ_TERMS = frozenset(
+    token for keywords, _, _, _ in FAQ_TOPICS.values() for token in tokenize(" ".join(keywords))
+) | frozenset(tokenize(
+    "precio precios costo costos cuanto cuesta cuestan valor barato caro puedo puede pueden "
+    "quiero quisiera saber tienen tienes aceptan aceptas usar hacer pago pagos forma formas "
+    "opciones informacion info tienda ustedes hacen ofrecen hay cual necesito consulta "
+    "tarda tardan demora llegar llega dias gratis domicilio pedido compra hago hace funciona "
+    "programa ubicado ubicados ubican credito debito"
+))
+# Reclamos y estado de un pedido concreto: nunca se responden con plantilla ni solo con
+# recuperación, aunque mencionen un tema frecuente ("me cobraron dos veces con la tarjeta")
+ISSUE_TERMS = frozenset(tokenize(
+    "cobraron cobrado cobrada descontaron duplicado problema reembolso reclamo queja error "
+    "falla danado roto defectuoso equivocado incorrecto rastreo seguimiento"
+))
+ISSUE_PHRASES = ("no ha llegado", "no han llegado", "no llega", "no me llego", "no llego", "todavia no", "aun no", "dos veces", "no funciona")
+
+GREETING_TEMPLATE = (
+    "¡Hola! 👋 Bienvenido a **Asistente Tienda**. Soy tu asistente virtual y puedo ayudarte con "
+    "productos, envíos, pagos o devoluciones. ¿En qué puedo asistirte hoy?"
+)
+COMPLIMENT_TEMPLATE = (
+    "😊 ¡Muchas gracias por tus palabras! Me alegra poder ayudarte. ¿Hay algo más en lo que pueda ayudarte hoy?"
+)
+TEMPLATE_CLOSING = "¿Hay algo más en lo que pueda ayudarte?"
+
+_HEADING_RE = re.compile(r"^(#{2,3})\s+(.*)$")
+
+
+@dataclass
+class RoutedResponse:
+    """Decisión del router; ``answer`` es None cuando la consulta debe ir al LLM"""
+    tier: str
+    intent: str
+    answer: Optional[str] = None
+    source: Optional[str] = None
+    suggested_actions: List[str] = field(default_factory=list)
+
+
+def _clean_heading(heading: str) -> str:
+    """Quita emojis y símbolos iniciales de un encabezado markdown"""
+    return re.sub(r"^[^\wÁÉÍÓÚáéíóúÑñ]+", "", heading).strip()
+
+
+def parse_store_info(path: Path) -> Dict[str, List[str]]:
+    """Secciones ``###`` (y ``##`` sin subsecciones) del documento con sus líneas de contenido"""
+    sections: Dict[str, List[str]] = {}
+    current: Optional[str] = None
+    if not path.exists():
+        print(f"⚠️ No se encontró {path}, el router solo usará rag_knowledge")
+        return sections
+    for raw in path.read_text(encoding="utf-8").splitlines():
+        line = raw.strip()
+        match = _HEADING_RE.match(line)
+        if match:
+            current = _clean_heading(match.group(2))
+            sections.setdefault(current, [])
+        elif line and current:
+            sections[current].append(line)
+    return {title: lines for title, lines in sections.items() if lines}
+
+
+class ResponseRouter:
+    """Elige el nivel más barato capaz de responder cada mensaje"""
+
+    def __init__(self, store_info_path: Path = STORE_INFO_PATH):
+        self.sections = parse_store_info(store_info_path)
+        self.section_index = BM25Index(fields={"title": 2.0, "content": 1.0})
+        self.section_index.rebuild(
+            (title, {"title": title, "content": "\n".join(lines)})
+            for title, lines in self.sections.items()
+        )
+        self.templates: Dict[str, str] = {}
+        self._compiled_version: Optional[int] = None
+        self.counters: Counter = Counter()
+        self.topic_counters: Counter = Counter()
+
+    # ==================== PLANTILLAS ====================
+
+    def _knowledge_by_category(self) -> Dict[str, Dict]:
+        documents = {}
+        for doc_id in rag_service.knowledge_index.ids():
+            document = rag_service.knowledge_index.get(doc_id)
+            if document and document.get("category"):
+                documents.setdefault(document["category"], document)
+        return documents
+
+    def compile_templates(self) -> None:
+        """
+        Precompila una respuesta por tema; rag_knowledge (editable desde el panel) tiene
+        prioridad sobre el documento estático para que el router diga lo mismo que el RAG
+        """
+        knowledge = self._knowledge_by_category()
+        templates = {}
+        for topic, (_, section_titles, category, header) in FAQ_TOPICS.items():
+            if category and category in knowledge:
+                body = knowledge[category]["content"]
+            else:
+                lines = [line for title in section_titles for line in self.sections.get(title, [])]
+                if not lines:
+                    continue
+                body = "\n".join(lines)
+            templates[topic] = f"{header}:\n\n{body}\n\n{TEMPLATE_CLOSING}"
+        self.templates = templates
+        self._compiled_version = rag_service.content_version
+
+    def _ensure_templates(self) -> None:
+        if self._compiled_version != rag_service.content_version:
+            self.compile_templates()
+
+    # ==================== CLASIFICACIÓN ====================
+
+    @staticmethod
+    def _match_topics(message: str) -> Set[str]:
+        folded = fold_accents(message)
+        return {
+            topic for topic, (keywords, _, _, _) in FAQ_TOPICS.items()
+            if any(keyword in folded for keyword in keywords)
+        }
+
+    def _retrieve(self, message: str) -> Optional[Tuple[str, str, float]]:
+        """Mejor documento por cobertura de los términos de la consulta: (título, contenido, cobertura)"""
+        query_tokens = set(tokenize(message))
+        if not query_tokens:
+            return None
+
+        candidates = [self.section_index.get(doc_id) for doc_id, _ in self.section_index.search(message, 3)]
+        if rag_service.indexes_ready:
+            candidates += [rag_service.knowledge_index.get(doc_id) for doc_id, _ in rag_service.knowledge_index.search(message, 3)]
+
+        best = None
+        for document in filter(None, candidates):
+            document_tokens = set(tokenize(f"{document['title']} {document['content']}"))
+            coverage = len(query_tokens & document_tokens) / len(query_tokens)
+            if best is None or coverage > best[2]:
+                best = (document["title"], document["content"], coverage)
+        return best
+
+    def _count(self, tier: str, intent: str) -> None:
+        self.counters[tier] += 1
+        self.topic_counters[f"{tier}:{intent}"] += 1
+
+    def route(self, message: str) -> RoutedResponse:
+        """Devuelve la respuesta de plantilla o recuperación, o tier ``llm`` si hace falta el modelo"""
+        intent = chat_optimizer._analyze_user_intent(message)
+        primary = intent["primary"]
+        if not settings.response_router_enabled:
+            self._count(TIER_LLM, primary)
+            return RoutedResponse(tier=TIER_LLM, intent=primary)
+
+        flags = intent["all_intents"]
+        topics = self._match_topics(message)
+        if flags.get("shipping_inquiry"):
+            topics.add("shipping")
+        message_tokens = set(tokenize(message))
+        # "¿Cuánto cuesta el envío?" es una pregunta frecuente; "¿y la camisa azul?" es de catálogo
+        other_terms = message_tokens - FAQ_TERMS - GREETING_TOKENS - COMPLIMENT_TOKENS
+        blocking = [
+            name for name in LLM_INTENTS
+            if flags.get(name) and not (name == "price_inquiry" and topics and not other_terms)
+        ]
+        folded = fold_accents(message)
+        issue = bool(ISSUE_TERMS & message_tokens) or any(phrase in folded for phrase in ISSUE_PHRASES)
+        needs_llm = bool(blocking) or issue
+        short = len(message.split()) <= settings.response_router_max_words
+
+        if not needs_llm and short:
+            self._ensure_templates()
+            # Nivel 1: un solo tema frecuente y nada más que la pregunta
+            if len(topics) == 1 and not other_terms:
+                topic = next(iter(topics))
+                if topic in self.templates:
+                    self._count(TIER_TEMPLATE, topic)
+                    return RoutedResponse(tier=TIER_TEMPLATE, intent=topic, answer=self.templates[topic], source=topic)
+
+            # Nivel 1: saludo o agradecimiento sin otra pregunta ni negación
+            residual = message_tokens - GREETING_TOKENS - COMPLIMENT_TOKENS
+            negated = bool(NEGATION_TOKENS & set(_WORD_RE.findall(folded)))
+            if not topics and not residual and not negated and (flags.get("greeting") or flags.get("compliment")):
+                kind = "compliment" if flags.get("compliment") and not flags.get("greeting") else "greeting"
+                self._count(TIER_TEMPLATE, kind)
+                return RoutedResponse(
+                    tier=TIER_TEMPLATE,
+                    intent=kind,
+                    answer=COMPLIMENT_TEMPLATE if kind == "compliment" else GREETING_TEMPLATE,
+                    suggested_actions=["Ver productos", "Información de envío", "Métodos de pago"]
+                )
+
+        # Nivel 2: respuesta solo con recuperación si la base de conocimiento cubre la pregunta
+        if not needs_llm:
+            best = self._retrieve(message)
+            if best and best[2] >= settings.response_router_min_coverage:
+                title, content, _ = best
+                self._count(TIER_RETRIEVAL, primary)
+                return RoutedResponse(
+                    tier=TIER_RETRIEVAL,
+                    intent=primary,
+                    answer=f"**{title}**\n\n{content}\n\n{TEMPLATE_CLOSING}",
+                    source=title
+                )
+
+        # Nivel 3: pregunta abierta
+        self._count(TIER_LLM, primary)
+        return RoutedResponse(tier=TIER_LLM, intent=primary)
+
+    def get_stats(self) -> Dict:
+        total = sum(self.counters.values())
+        return {
+            "enabled": settings.response_router_enabled,
+            "total": total,
+            "tiers": {
+                tier: {
+                    "count": self.counters[tier],
+                    "share": round(self.counters[tier] / total, 4) if total else 0.0
+                }
+                for tier in (TIER_TEMPLATE, TIER_RETRIEVAL, TIER_LLM)
+            },
+            "by_intent": dict(self.topic_counters.most_common()),
+            "templates": sorted(self.templates)
+        }
+
+
+response_router = ResponseRouter()
@@ -0,0 +1,193 @@
+"""
+Índice invertido en memoria con ranking BM25
+Permite a RAGService recuperar conocimiento y productos sin consultar la base de datos
+"""
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+
+# Palabras vacías en español (ya sin acentos) que no aportan al ranking
+SPANISH_STOPWORDS = frozenset({
+    "a", "al", "algo", "algun", "alguna", "algunas", "alguno", "algunos", "ante", "antes",
+    "como", "con", "contra", "cual", "cuales", "cuando", "de", "del", "desde", "donde",
+    "durante", "e", "el", "ella", "ellas", "ellos", "en", "entre", "era", "es", "esa",
+    "esas", "ese", "eso", "esos", "esta", "estan", "estas", "este", "esto", "estos",
+    "fue", "ha", "hay", "la", "las", "le", "les", "lo", "los", "mas", "me", "mi", "mis",
+    "muy", "ni", "no", "nos", "o", "para", "pero", "por", "porque", "que", "quien",
+    "se", "sea", "si", "sin", "sobre", "son", "su", "sus", "tambien", "te", "tengo",
+    "tiene", "tienen", "tienes", "toda", "todas", "todo", "todos", "tu", "tus", "u",
+    "un", "una", "unas", "uno", "unos", "usted", "y", "ya", "yo", "quiero", "puedo",
+    "puede", "pueden", "hola", "favor", "gracias",
+})
+
+_TOKEN_RE = re.compile(r"[a-z0-9ñ]+")
+
+
+def fold_accents(text: str) -> str:
+    """Convierte a minúsculas y elimina acentos conservando la ñ"""
+    text = text.lower().replace("ñ", "\0")
+    decomposed = unicodedata.normalize("NFKD", text)
+    folded = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return folded.replace("\0", "ñ")
+
+
+def _stem(token: str) -> str:
+    """Stemming ligero para plurales en español (camisetas -> camiseta, pantalones -> pantalon)"""
+    if len(token) > 4 and token.endswith("es") and token[-3] in "lrndzj":
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Tokeniza texto en español: minúsculas, sin acentos, sin palabras vacías y con stemming ligero"""
+    if not text:
+        return []
+    return [
+        _stem(token)
+        for token in _TOKEN_RE.findall(fold_accents(text))
+        if len(token) > 1 and token not in SPANISH_STOPWORDS
+    ]
+
+
+class BM25Index:
+    """
+    Índice invertido BM25 con actualización incremental
+
+    Cada documento es un diccionario; ``fields`` indica qué campos se indexan
+    y con qué peso (un peso 2.0 cuenta dos veces cada término del campo).
+    Las escrituras pueden llegar desde hilos del threadpool, por eso todas
+    las operaciones se serializan con un lock.
+    """
+
+    def __init__(self, fields: Dict[str, float], k1: float = 1.5, b: float = 0.75):
+        self.fields = fields
+        self.k1 = k1
+        self.b = b
+        self.documents: Dict[Hashable, Dict[str, Any]] = {}
+        self.postings: Dict[str, Dict[Hashable, float]] = {}
+        self.doc_lengths: Dict[Hashable, float] = {}
+        self.total_length = 0.0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def __contains__(self, doc_id: Hashable) -> bool:
+        return doc_id in self.documents
+
+    def get(self, doc_id: Hashable) -> Optional[Dict[str, Any]]:
+        return self.documents.get(doc_id)
+
+    def ids(self) -> set:
+        with self._lock:
+            return set(self.documents)
+
+    def _term_frequencies(self, document: Dict[str, Any]) -> Counter:
+        frequencies: Counter = Counter()
+        for field, weight in self.fields.items():
+            for token in tokenize(str(document.get(field) or "")):
+                frequencies[token] += weight
+        return frequencies
+
+    def upsert(self, doc_id: Hashable, document: Dict[str, Any]) -> None:
+        """Agrega o reemplaza un documento"""
+        frequencies = self._term_frequencies(document)
+        length = float(sum(frequencies.values()))
+
+        with self._lock:
+            if doc_id in self.documents:
+                self.remove(doc_id)
+            self.documents[doc_id] = document
+            self.doc_lengths[doc_id] = length
+            self.total_length += length
+            for term, tf in frequencies.items():
+                self.postings.setdefault(term, {})[doc_id] = tf
+
+    def remove(self, doc_id: Hashable) -> bool:
+        """Elimina un documento del índice"""
+        with self._lock:
+            document = self.documents.pop(doc_id, None)
+            if document is None:
+                return False
+
+            self.total_length -= self.doc_lengths.pop(doc_id, 0.0)
+            for term in self._term_frequencies(document):
+                posting = self.postings.get(term)
+                if posting is None:
+                    continue
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self.postings[term]
+            return True
+
+    def rebuild(self, documents: Iterable[Tuple[Hashable, Dict[str, Any]]]) -> None:
+        """Reconstruye el índice completo a partir de pares (id, documento)"""
+        fresh = BM25Index(self.fields, k1=self.k1, b=self.b)
+        for doc_id, document in documents:
+            fresh.upsert(doc_id, document)
+
+        with self._lock:
+            self.documents = fresh.documents
+            self.postings = fresh.postings
+            self.doc_lengths = fresh.doc_lengths
+            self.total_length = fresh.total_length
+
+    def search(
+        self,
+        query: str,
+        limit: int = 5,
+        predicate: Optional[Callable[[Dict[str, Any]], bool]] = None
+    ) -> List[Tuple[Hashable, float]]:
+        """Devuelve los ``limit`` documentos mejor puntuados como pares (id, score)"""
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+
+        with self._lock:
+            total_docs = len(self.documents)
+            if not total_docs:
+                return []
+
+            avg_length = self.total_length / total_docs or 1.0
+            scores: Dict[Hashable, float] = {}
+
+            for term in terms:
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                df = len(posting)
+                idf = math.log(1 + (total_docs - df + 0.5) / (df + 0.5))
+                for doc_id, tf in posting.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+            if predicate is not None:
+                scores = {doc_id: score for doc_id, score in scores.items() if predicate(self.documents[doc_id])}
+
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+
+def reciprocal_rank_fusion(
+    rankings: List[List[Dict[str, Any]]],
+    limit: int = 5,
+    k: int = 60,
+    key: Callable[[Dict[str, Any]], Hashable] = lambda item: (item.get("title"), item.get("content"))
+) -> List[Dict[str, Any]]:
+    """Combina varias listas ordenadas con Reciprocal Rank Fusion (score = sum 1 / (k + rango))"""
+    fused: Dict[Hashable, float] = {}
+    items: Dict[Hashable, Dict[str, Any]] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            item_key = key(item)
+            fused[item_key] = fused.get(item_key, 0.0) + 1.0 / (k + rank)
+            items.setdefault(item_key, item)
+
+    best = heapq.nlargest(limit, fused.items(), key=lambda entry: entry[1])
+    return [{**items[item_key], "score": score} for item_key, score in best]
@@ -0,0 +1,132 @@
+"""
+Caché semántico de respuestas RAG
+Reutiliza respuestas cuando una consulta nueva es casi idéntica (similitud coseno) a una ya respondida
+"""
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+@dataclass
+class SemanticCacheEntry:
+    """Respuesta cacheada junto con el embedding normalizado de la consulta"""
+    query: str
+    embedding: np.ndarray
+    answer: str
+    version: int
+    created_at: float
+    total_tokens: int = 0
+    latency_ms: float = 0.0
+
+
+class SemanticCache:
+    """Caché en memoria indexado por similitud de embeddings"""
+
+    def __init__(self, threshold: float = 0.95, ttl: int = 3600, max_entries: int = 1000):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: List[SemanticCacheEntry] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+        # Métricas para ajustar el umbral
+        self.hits = 0
+        self.misses = 0
+        self.saved_tokens = 0
+        self.saved_latency_ms = 0.0
+        self.lookup_time_ms = 0.0
+        self.similarity_sum = 0.0
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype="float32")
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _purge(self, version: int) -> None:
+        now = time.time()
+        alive = [
+            entry for entry in self.entries
+            if entry.version == version and now - entry.created_at < self.ttl
+        ]
+        if len(alive) != len(self.entries):
+            self.entries = alive
+            self._matrix = None
+
+    def lookup(self, embedding: List[float], version: int) -> Optional[SemanticCacheEntry]:
+        """Devuelve la entrada más similar si supera el umbral y pertenece a la versión vigente"""
+        started = time.perf_counter()
+        query = self._normalize(embedding)
+
+        with self._lock:
+            self._purge(version)
+            best: Optional[SemanticCacheEntry] = None
+            similarity = 0.0
+            if self.entries:
+                if self._matrix is None:
+                    self._matrix = np.vstack([entry.embedding for entry in self.entries])
+                similarities = self._matrix @ query
+                position = int(np.argmax(similarities))
+                similarity = float(similarities[position])
+                if similarity >= self.threshold:
+                    best = self.entries[position]
+
+            self.lookup_time_ms += (time.perf_counter() - started) * 1000
+            if best is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.saved_tokens += best.total_tokens
+            self.saved_latency_ms += best.latency_ms
+            self.similarity_sum += similarity
+            return best
+
+    def store(
+        self,
+        query: str,
+        embedding: List[float],
+        answer: str,
+        version: int,
+        total_tokens: int = 0,
+        latency_ms: float = 0.0
+    ) -> None:
+        """Guarda una respuesta; las más antiguas se descartan al superar ``max_entries``"""
+        entry = SemanticCacheEntry(
+            query=query,
+            embedding=self._normalize(embedding),
+            answer=answer,
+            version=version,
+            created_at=time.time(),
+            total_tokens=total_tokens,
+            latency_ms=latency_ms
+        )
+        with self._lock:
+            self.entries.append(entry)
+            if len(self.entries) > self.max_entries:
+                self.entries = self.entries[-self.max_entries:]
+            self._matrix = None
+
+    def invalidate(self) -> None:
+        """Elimina todas las respuestas (productos o conocimiento cambiaron)"""
+        with self._lock:
+            self.entries = []
+            self._matrix = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "saved_tokens": self.saved_tokens,
+            "saved_latency_ms": round(self.saved_latency_ms, 1),
+            "avg_hit_similarity": round(self.similarity_sum / self.hits, 4) if self.hits else None,
+            "avg_lookup_ms": round(self.lookup_time_ms / lookups, 3) if lookups else 0.0
+        }
@@ -0,0 +1,194 @@
+"""
+Coalescencia ("singleflight") de llamadas idénticas al LLM
+Si llegan varias peticiones con el mismo prompt y parámetros mientras una ya está en
+curso, solo la primera llama al proveedor y las demás reciben su resultado.
+Entre workers de uvicorn se coordina con Redis: el líder toma un lock con SET NX y
+publica el resultado; los demás esperan ese resultado en lugar de repetir la llamada.
+"""
+import asyncio
+import hashlib
+import json
+import re
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict
+
+from app.core.config import settings
+
+try:
+    import redis
+    import redis.asyncio as redis_asyncio
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _normalize(value: Any) -> Any:
+    """Normaliza textos (espacios y mayúsculas) para que variantes triviales compartan clave"""
+    if isinstance(value, str):
+        return _WHITESPACE_RE.sub(" ", value).strip().lower()
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def make_key(**params: Any) -> str:
+    """Clave estable a partir del prompt normalizado y los parámetros de la llamada"""
+    payload = json.dumps(_normalize(params), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """Agrupa llamadas concurrentes con la misma clave en una sola llamada upstream"""
+
+    def __init__(
+        self,
+        namespace: str = "llm",
+        lock_ttl: float = 60.0,
+        result_ttl: float = 10.0,
+        poll_interval: float = 0.05,
+        redis_retry_seconds: float = 30.0
+    ):
+        self.namespace = namespace
+        self.lock_ttl = lock_ttl
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self.redis_retry_seconds = redis_retry_seconds
+
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._worker_id = uuid.uuid4().hex
+
+        self._redis_async = None
+        self._redis_down_until = 0.0
+
+        # Métricas
+        self.calls = 0
+        self.upstream_calls = 0
+        self.collapsed_local = 0
+        self.collapsed_remote = 0
+        self.redis_errors = 0
+
+    # ==================== REDIS ====================
+
+    @property
+    def _redis_enabled(self) -> bool:
+        return REDIS_AVAILABLE and settings.llm_singleflight_redis and time.monotonic() >= self._redis_down_until
+
+    def _redis_failed(self, error: Exception) -> None:
+        """Sin Redis se sigue coalesciendo dentro del worker; se reintenta más tarde"""
+        self.redis_errors += 1
+        self._redis_down_until = time.monotonic() + self.redis_retry_seconds
+        print(f"⚠️ Singleflight sin Redis por {self.redis_retry_seconds:.0f}s: {error}")
+
+    def _lock_key(self, key: str) -> str:
+        return f"singleflight:{self.namespace}:lock:{key}"
+
+    def _result_key(self, key: str) -> str:
+        return f"singleflight:{self.namespace}:result:{key}"
+
+    def _async_client(self):
+        if self._redis_async is None:
+            self._redis_async = redis_asyncio.Redis.from_url(settings.redis_url, decode_responses=True, socket_timeout=1)
+        return self._redis_async
+
+    async def _remote_call(self, key: str, fn, encode, decode, shareable):
+        """Coordina la llamada entre workers; devuelve el resultado del líder o el propio"""
+        owns_lock = False
+        try:
+            client = self._async_client()
+            deadline = time.monotonic() + self.lock_ttl
+            while time.monotonic() < deadline:
+                cached = await client.get(self._result_key(key))
+                if cached is not None:
+                    self.collapsed_remote += 1
+                    return decode(json.loads(cached))
+                if await client.set(self._lock_key(key), self._worker_id, nx=True, px=int(self.lock_ttl * 1000)):
+                    owns_lock = True
+                    break
+                await asyncio.sleep(self.poll_interval)
+        except (redis.RedisError, OSError) as e:
+            self._redis_failed(e)
+
+        self.upstream_calls += 1
+        try:
+            result = await fn()
+            # El resultado se publica antes de liberar el lock para que nadie repita la llamada
+            if owns_lock and shareable(result):
+                try:
+                    await client.set(self._result_key(key), json.dumps(encode(result), default=str), px=int(self.result_ttl * 1000))
+                except (redis.RedisError, OSError) as e:
+                    self._redis_failed(e)
+            return result
+        finally:
+            if owns_lock:
+                try:
+                    await client.delete(self._lock_key(key))
+                except (redis.RedisError, OSError) as e:
+                    self._redis_failed(e)
+
+    # ==================== API ====================
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        encode: Callable[[Any], Any] = lambda value: value,
+        decode: Callable[[Any], Any] = lambda value: value,
+        shareable: Callable[[Any], bool] = lambda value: True
+    ) -> Any:
+        """
+        Ejecuta ``fn`` una sola vez por clave entre las llamadas concurrentes.
+        ``encode``/``decode`` convierten el resultado a JSON para compartirlo por Redis
+        y ``shareable`` decide si se publica (por ejemplo, no publicar errores).
+        """
+        self.calls += 1
+        if not settings.llm_singleflight_enabled:
+            self.upstream_calls += 1
+            return await fn()
+
+        # La llamada corre en su propia tarea: si se cancela la petición que la inició
+        # (cliente desconectado, hedge perdedor) los seguidores siguen esperando el resultado
+        task = self._inflight.get(key)
+        if task is not None:
+            self.collapsed_local += 1
+        else:
+            task = asyncio.create_task(self._run(key, fn, encode, decode, shareable))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._flight_done(key, done))
+        return await asyncio.shield(task)
+
+    async def _run(self, key: str, fn, encode, decode, shareable) -> Any:
+        if self._redis_enabled:
+            return await self._remote_call(key, fn, encode, decode, shareable)
+        self.upstream_calls += 1
+        return await fn()
+
+    def _flight_done(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Evita "Task exception was never retrieved" cuando no hay seguidores
+            task.exception()
+
+    def get_stats(self) -> Dict[str, Any]:
+        collapsed = self.collapsed_local + self.collapsed_remote
+        return {
+            "enabled": settings.llm_singleflight_enabled,
+            "redis": self._redis_enabled,
+            "calls": self.calls,
+            "upstream_calls": self.upstream_calls,
+            "collapsed": collapsed,
+            "collapsed_local": self.collapsed_local,
+            "collapsed_remote": self.collapsed_remote,
+            "collapse_rate": round(collapsed / self.calls, 4) if self.calls else 0.0,
+            "in_flight": len(self._inflight),
+            "redis_errors": self.redis_errors
+        }
+
+
+llm_singleflight = SingleFlight()
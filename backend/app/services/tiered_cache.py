@@ -0,0 +1,736 @@
+"""
+Caché por niveles: L1 en memoria del proceso + L2 en Redis
+L1 es un LRU acotado con TTL corto que evita el viaje a Redis en las claves calientes;
+L2 es Redis asíncrono compartido entre workers. Los TTL se definen por namespace (el
+prefijo de la clave antes de ``:``) en un único registro en lugar de repartirse por servicio.
+Si Redis no está disponible el caché sigue funcionando solo con L1.
+
+Invalidación por tags versionados: cada tag (``catalog``, ``product:42``...) tiene un
+contador en Redis y las claves etiquetadas llevan las versiones de sus tags como sufijo.
+Invalidar un tag es un INCR (O(1)): las claves dependientes pasan a ser misses sin SCAN
+y las versiones viejas expiran solas por TTL.
+
+``get_or_load`` protege las claves calientes de estampidas: una sola carga por clave
+(entre peticiones del worker y, con Redis, entre workers), el valor vencido se sirve
+mientras una tarea en segundo plano lo recarga y la recarga se adelanta de forma
+probabilística antes del vencimiento (XFetch).
+"""
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+
+try:
+    import redis.asyncio as redis_asyncio
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+
+class CacheInterface(ABC):
+    """Interface para el servicio de cache - Dependency Inversion Principle"""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+        pass
+
+    @abstractmethod
+    async def delete(self, key: str) -> bool:
+        pass
+
+    @abstractmethod
+    async def exists(self, key: str) -> bool:
+        pass
+
+
+# ==================== REGISTRO DE NAMESPACES ====================
+
+# TTL en segundos por namespace (prefijo de la clave)
+DEFAULT_NAMESPACE_TTLS: Dict[str, int] = {
+    # Catálogo
+    # Etiquetados con tags versionados: se invalidan al escribir, no por TTL
+    "products": 86400,
+    "product": 86400,
+    "search": 43200,
+    "recommendations": 3600,
+    "ai": 1800,
+    "tracking": 86400,
+    # Entradas negativas (IDs inexistentes, búsquedas sin resultados): TTL corto
+    "missing": 60,
+    # Chat
+    "context": 300,
+    "session": 1800,
+    "intent": 600,
+    "response": 900,
+    "rate_limit": 60,
+    "spam": 300,
+    "conversation": 1800,
+    "chat_recommendations": 600,
+    "user_recommendations": 1800,
+    "user_session": 3600,
+}
+
+
+# Tags de invalidación del catálogo
+CATALOG_TAG = "catalog"
+SEARCH_TAG = "search"
+SEARCH_TAGS = [CATALOG_TAG, SEARCH_TAG]
+
+
+def product_tag(product_id: int) -> str:
+    return f"product:{product_id}"
+
+
+def user_orders_tag(user_id: int) -> str:
+    return f"orders:user:{user_id}"
+
+
+class NamespaceRegistry:
+    """TTL por namespace; las claves sin namespace registrado usan ``default_ttl``"""
+
+    def __init__(self, ttls: Optional[Dict[str, int]] = None, default_ttl: int = 3600):
+        self.ttls: Dict[str, int] = dict(ttls or {})
+        self.default_ttl = default_ttl
+
+    def register(self, namespace: str, ttl: int) -> None:
+        self.ttls[namespace] = ttl
+
+    @staticmethod
+    def namespace_of(key: str) -> str:
+        return key.split(":", 1)[0]
+
+    def ttl_for(self, key: str) -> int:
+        return self.ttls.get(self.namespace_of(key), self.default_ttl)
+
+
+def create_redis_pool(redis_url: Optional[str] = None):
+    """
+    Pool de conexiones asíncronas a Redis configurado desde settings
+    Bloqueante: con el pool lleno una ráfaga de peticiones espera una conexión libre
+    en lugar de fallar con "Too many connections" y dejar el L2 fuera de servicio
+    """
+    return redis_asyncio.BlockingConnectionPool.from_url(
+        redis_url or settings.redis_url,
+        max_connections=settings.redis_max_connections,
+        timeout=settings.redis_socket_timeout,
+        socket_timeout=settings.redis_socket_timeout,
+        socket_connect_timeout=settings.redis_connect_timeout,
+        health_check_interval=30,
+        decode_responses=True
+    )
+
+
+# ==================== L1 ====================
+
+class LRUTTLCache:
+    """LRU en memoria con TTL por entrada y número máximo de entradas"""
+
+    def __init__(self, max_entries: int = 2000):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.evictions = 0
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return False, None
+        self._data.move_to_end(key)
+        return True, value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: str) -> bool:
+        return self._data.pop(key, None) is not None
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# ==================== SERVICIO ====================
+
+class TieredCacheService(CacheInterface):
+    """Implementación única de CacheInterface (L1 en proceso + L2 Redis)"""
+
+    def __init__(
+        self,
+        redis_url: Optional[str] = None,
+        l1_max_entries: Optional[int] = None,
+        l1_ttl: Optional[float] = None,
+        registry: Optional[NamespaceRegistry] = None,
+        redis_retry_seconds: float = 30.0
+    ):
+        self.redis_url = redis_url or settings.redis_url
+        self.l1 = LRUTTLCache(l1_max_entries or settings.cache_l1_max_entries)
+        # L1 es local a cada worker: su TTL corto acota cuánto puede ver datos ya invalidados en otro
+        self.l1_ttl = l1_ttl if l1_ttl is not None else settings.cache_l1_ttl_seconds
+        self.registry = registry or NamespaceRegistry(DEFAULT_NAMESPACE_TTLS)
+        self.redis_retry_seconds = redis_retry_seconds
+
+        self.redis = None
+        self._redis_down_until = 0.0
+
+        # Versiones de tags conocidas por este worker (LRU acotado): {tag: (versión, leída_en)}
+        self._tag_versions: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        # Invalidaciones que no llegaron a Redis: se reenvían al recuperarlo
+        self._pending_invalidations: Set[str] = set()
+
+        # Cargas en curso (coalescencia) y recargas en segundo plano
+        self._loading: Dict[str, asyncio.Task] = {}
+        self._refreshing: Set[str] = set()
+        self._refresh_tasks: Set[asyncio.Task] = set()
+        self._worker_id = uuid.uuid4().hex
+
+        # Métricas
+        self.l1_hits = 0
+        self.l2_hits = 0
+        self.misses = 0
+        self.redis_errors = 0
+        self.tag_invalidations = 0
+        self.loads = 0
+        self.coalesced_loads = 0
+        self.stale_served = 0
+        self.early_refreshes = 0
+        self.background_refreshes = 0
+
+    @property
+    def connected(self) -> bool:
+        """El caché siempre responde; sin Redis funciona solo con L1"""
+        return True
+
+    @property
+    def l2_available(self) -> bool:
+        return self.redis is not None and time.monotonic() >= self._redis_down_until
+
+    async def connect(self) -> bool:
+        """Conecta el L2; si Redis no responde el caché queda solo en memoria"""
+        if not (REDIS_AVAILABLE and settings.cache_l2_enabled):
+            print("💡 Caché L2 desactivado, se usará solo el L1 en memoria")
+            return False
+        try:
+            client = redis_asyncio.Redis(connection_pool=create_redis_pool(self.redis_url))
+            await client.ping()
+            self.redis = client
+            print("✅ Caché L2 (Redis) conectado")
+            return True
+        except Exception as e:
+            print(f"⚠️ Redis no disponible para el caché L2, se usará solo L1: {e}")
+            self.redis = None
+            return False
+
+    async def disconnect(self):
+        if self.redis is not None:
+            await self.redis.aclose(close_connection_pool=True)
+            self.redis = None
+        self.l1.clear()
+
+    def _redis_failed(self, error: Exception) -> None:
+        self.redis_errors += 1
+        self._redis_down_until = time.monotonic() + self.redis_retry_seconds
+        print(f"⚠️ Error en caché L2, solo L1 durante {self.redis_retry_seconds:.0f}s: {error}")
+
+    def _l1_ttl(self, ttl: float) -> float:
+        return min(ttl, self.l1_ttl)
+
+    async def get(self, key: str) -> Optional[Any]:
+        found, value = self.l1.get(key)
+        if found:
+            self.l1_hits += 1
+            return value
+
+        if self.l2_available:
+            try:
+                raw, remaining = await self.redis.pipeline(transaction=False).get(key).ttl(key).execute()
+            except Exception as e:
+                self._redis_failed(e)
+            else:
+                if raw is not None:
+                    value = json.loads(raw)
+                    self.l2_hits += 1
+                    if remaining and remaining > 0:
+                        self.l1.set(key, value, self._l1_ttl(remaining))
+                    return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+        ttl = ttl or self.registry.ttl_for(key)
+        self.l1.set(key, value, self._l1_ttl(ttl))
+        if self.l2_available:
+            try:
+                await self.redis.set(key, json.dumps(value, default=str), ex=int(ttl))
+            except Exception as e:
+                self._redis_failed(e)
+        return True
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """
+        Lee varias claves: primero L1 y las que falten en un solo pipeline a Redis
+        Devuelve solo las claves encontradas
+        """
+        found: Dict[str, Any] = {}
+        missing = []
+        for key in keys:
+            hit, value = self.l1.get(key)
+            if hit:
+                self.l1_hits += 1
+                found[key] = value
+            else:
+                missing.append(key)
+
+        if missing and self.l2_available:
+            pipe = self.redis.pipeline(transaction=False)
+            for key in missing:
+                pipe.get(key).ttl(key)
+            try:
+                replies = await pipe.execute()
+            except Exception as e:
+                self._redis_failed(e)
+            else:
+                for index, key in enumerate(missing):
+                    raw, remaining = replies[2 * index], replies[2 * index + 1]
+                    if raw is None:
+                        continue
+                    value = json.loads(raw)
+                    found[key] = value
+                    self.l2_hits += 1
+                    if remaining and remaining > 0:
+                        self.l1.set(key, value, self._l1_ttl(remaining))
+
+        self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    async def set_many(self, items: Dict[str, Any], ttls: Optional[Dict[str, int]] = None) -> bool:
+        """Escribe varias claves en L1 y en un solo pipeline a Redis (TTL por clave o del namespace)"""
+        if not items:
+            return True
+        ttls = ttls or {}
+        pipe = self.redis.pipeline(transaction=False) if self.l2_available else None
+        for key, value in items.items():
+            ttl = ttls.get(key) or self.registry.ttl_for(key)
+            self.l1.set(key, value, self._l1_ttl(ttl))
+            if pipe is not None:
+                pipe.set(key, json.dumps(value, default=str), ex=int(ttl))
+        if pipe is not None:
+            try:
+                await pipe.execute()
+            except Exception as e:
+                self._redis_failed(e)
+        return True
+
+    async def delete(self, key: str) -> bool:
+        deleted = self.l1.delete(key)
+        if self.l2_available:
+            try:
+                deleted = bool(await self.redis.delete(key)) or deleted
+            except Exception as e:
+                self._redis_failed(e)
+        return deleted
+
+    async def exists(self, key: str) -> bool:
+        return await self.get(key) is not None
+
+    # ==================== VENTANAS DESLIZANTES ====================
+
+    async def hit_window(self, key: str, limit: int, window_seconds: float) -> bool:
+        """
+        Registra un evento en la ventana deslizante ``key``; False si ya había ``limit``
+        eventos en los últimos ``window_seconds`` (el rechazado no cuenta). Con Redis es un
+        sorted set actualizado en una transacción, así todos los workers comparten la
+        cuenta; nunca pasa por L1. Sin Redis la ventana es local al worker
+        """
+        now = time.time()
+        if self.l2_available:
+            member = f"{now}:{uuid.uuid4().hex[:8]}"
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.zremrangebyscore(key, 0, now - window_seconds)
+            pipe.zadd(key, {member: now})
+            pipe.zcard(key)
+            pipe.expire(key, int(math.ceil(window_seconds)))
+            try:
+                _, _, count, _ = await pipe.execute()
+                if count <= limit:
+                    return True
+                await self.redis.zrem(key, member)
+                return False
+            except Exception as e:
+                self._redis_failed(e)
+
+        _, events = self.l1.get(key)
+        events = [at for at in (events or []) if now - at < window_seconds]
+        allowed = len(events) < limit
+        if allowed:
+            events.append(now)
+        self.l1.set(key, events, window_seconds)
+        return allowed
+
+    # ==================== TAGS VERSIONADOS ====================
+
+    @staticmethod
+    def _tag_key(tag: str) -> str:
+        return f"tag:{tag}"
+
+    @staticmethod
+    def _initial_tag_version() -> int:
+        """
+        Los tags nuevos empiezan en la hora actual (ms) y no en 0: una versión nunca se
+        repite aunque se vacíe Redis o reinicie el worker, así que sirve también para ETags
+        """
+        return int(time.time() * 1000)
+
+    def _local_tag_version(self, tag: str) -> int:
+        entry = self._tag_versions.get(tag)
+        return entry[0] if entry is not None else self._initial_tag_version()
+
+    def _remember_tag_version(self, tag: str, version: int, now: float) -> None:
+        """
+        Guarda la versión leída; las menos usadas se olvidan (se vuelven a leer de Redis o,
+        sin Redis, renacen con una versión nueva: sus claves solo pasan a ser misses)
+        """
+        self._tag_versions[tag] = (version, now)
+        self._tag_versions.move_to_end(tag)
+        while len(self._tag_versions) > settings.cache_tag_versions_max:
+            self._tag_versions.popitem(last=False)
+
+    async def get_tag_versions(self, tags: List[str]) -> Dict[str, int]:
+        """
+        Versión actual de cada tag. Se relee de Redis como mucho cada ``l1_ttl`` segundos
+        (el mismo margen que ya tiene L1 para ver invalidaciones de otro worker); sin Redis
+        la versión local es la autoritativa
+        """
+        if self._pending_invalidations and self.l2_available:
+            await self._flush_pending_invalidations()
+
+        now = time.monotonic()
+        versions: Dict[str, int] = {}
+        stale = []
+        for tag in tags:
+            entry = self._tag_versions.get(tag)
+            if entry is not None and (not self.l2_available or now - entry[1] < self.l1_ttl):
+                self._tag_versions.move_to_end(tag)
+                versions[tag] = entry[0]
+            else:
+                stale.append(tag)
+
+        if stale:
+            replies = [None] * len(stale)
+            if self.l2_available:
+                try:
+                    replies = await self.redis.mget([self._tag_key(tag) for tag in stale])
+                    missing = [tag for tag, raw in zip(stale, replies) if raw is None]
+                    if missing:
+                        # Primer uso del tag: se siembra una sola vez entre todos los workers.
+                        # Con TTL: si expira renace con una versión nueva (solo provoca misses)
+                        pipe = self.redis.pipeline(transaction=False)
+                        for tag in missing:
+                            pipe.set(self._tag_key(tag), self._initial_tag_version(), nx=True, ex=settings.cache_tag_ttl_seconds)
+                            pipe.get(self._tag_key(tag))
+                        seeded = (await pipe.execute())[1::2]
+                        replies = [seeded.pop(0) if raw is None else raw for raw in replies]
+                except Exception as e:
+                    self._redis_failed(e)
+            for tag, raw in zip(stale, replies):
+                version = int(raw) if raw is not None else self._local_tag_version(tag)
+                self._remember_tag_version(tag, version, now)
+                versions[tag] = version
+        return versions
+
+    async def tagged_key(self, key: str, tags: List[str]) -> str:
+        """Clave con las versiones actuales de sus tags como sufijo"""
+        versions = await self.get_tag_versions(tags)
+        suffix = ",".join(f"{tag}={versions[tag]}" for tag in sorted(versions))
+        return f"{key}|{suffix}"
+
+    async def get_tagged(self, key: str, tags: List[str]) -> Optional[Any]:
+        """Lee una clave que depende de ``tags``; tras invalidar cualquiera es un miss"""
+        return await self.get(await self.tagged_key(key, tags))
+
+    async def set_tagged(self, key: str, value: Any, tags: List[str], ttl: Optional[int] = None) -> bool:
+        """Guarda ``value`` bajo las versiones actuales de ``tags`` (TTL del namespace de ``key``)"""
+        return await self.set(await self.tagged_key(key, tags), value, ttl or self.registry.ttl_for(key))
+
+    async def invalidate_tags(self, *tags: str) -> Dict[str, int]:
+        """Incrementa la versión de los tags (un INCR por tag en un solo pipeline)"""
+        now = time.monotonic()
+        versions: Dict[str, int] = {}
+        for tag in tags:
+            versions[tag] = self._local_tag_version(tag) + 1
+
+        if tags and self.l2_available:
+            try:
+                versions = dict(zip(tags, await self._incr_tags(tags)))
+            except Exception as e:
+                self._redis_failed(e)
+                self._pending_invalidations.update(tags)
+        elif tags and self.redis is not None:
+            # Redis caído temporalmente: sin reenviarlo los demás workers nunca lo verían
+            self._pending_invalidations.update(tags)
+
+        for tag, version in versions.items():
+            self._remember_tag_version(tag, version, now)
+        self.tag_invalidations += len(tags)
+        print(f"🏷️ Caché invalidado por tags: {', '.join(tags)}")
+        return versions
+
+    async def _incr_tags(self, tags: List[str]) -> List[int]:
+        """INCR de cada tag (renovando su TTL); un tag sin sembrar parte de la hora actual y no de 0"""
+        pipe = self.redis.pipeline(transaction=False)
+        for tag in tags:
+            pipe.set(self._tag_key(tag), self._initial_tag_version(), nx=True, ex=settings.cache_tag_ttl_seconds)
+            pipe.incr(self._tag_key(tag))
+            pipe.expire(self._tag_key(tag), settings.cache_tag_ttl_seconds)
+        return (await pipe.execute())[1::3]
+
+    async def _flush_pending_invalidations(self) -> None:
+        tags = list(self._pending_invalidations)
+        try:
+            replies = await self._incr_tags(tags)
+        except Exception as e:
+            self._redis_failed(e)
+            return
+        self._pending_invalidations.difference_update(tags)
+        now = time.monotonic()
+        for tag, version in zip(tags, replies):
+            self._remember_tag_version(tag, version, now)
+        print(f"🏷️ Invalidaciones pendientes reenviadas a Redis: {', '.join(tags)}")
+
+    # ==================== CARGA PROTEGIDA ====================
+
+    @staticmethod
+    def _lock_key(key: str) -> str:
+        return f"lock:{key}"
+
+    @staticmethod
+    def _is_envelope(entry: Any) -> bool:
+        return isinstance(entry, dict) and "soft_expires_at" in entry and "value" in entry
+
+    @staticmethod
+    def _needs_refresh(entry: Dict[str, Any]) -> Tuple[bool, bool]:
+        """
+        (recargar, anticipada): vencido el TTL blando siempre se recarga; antes, con
+        probabilidad creciente según lo que tardó la última carga (XFetch)
+        """
+        remaining = entry["soft_expires_at"] - time.time()
+        if remaining <= 0:
+            return True, False
+        beta = settings.cache_early_expiration_beta
+        if beta <= 0:
+            return False, False
+        early = entry.get("load_seconds", 0.0) * beta * -math.log(random.random() or 1e-12) >= remaining
+        return early, early
+
+    async def _store_loaded(self, key: str, value: Any, ttl: int, load_seconds: float) -> None:
+        """Guarda el valor con su TTL blando; la clave vive además la ventana de stale"""
+        entry = {
+            "value": value,
+            "soft_expires_at": time.time() + ttl,
+            "load_seconds": round(load_seconds, 4)
+        }
+        await self.set(key, entry, ttl + settings.cache_stale_ttl_seconds)
+
+    async def _acquire_load_lock(self, key: str) -> Optional[bool]:
+        """True si este worker carga, False si otro ya lo hace, None sin Redis"""
+        if not self.l2_available:
+            return None
+        try:
+            return bool(await self.redis.set(
+                self._lock_key(key), self._worker_id, nx=True,
+                px=int(settings.cache_load_lock_seconds * 1000)
+            ))
+        except Exception as e:
+            self._redis_failed(e)
+            return None
+
+    async def _release_load_lock(self, key: str) -> None:
+        if self.l2_available:
+            try:
+                await self.redis.delete(self._lock_key(key))
+            except Exception as e:
+                self._redis_failed(e)
+
+    async def _run_loader(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: int) -> Any:
+        self.loads += 1
+        started = time.monotonic()
+        value = await loader()
+        await self._store_loaded(key, value, ttl, time.monotonic() - started)
+        return value
+
+    async def _wait_remote_load(self, key: str) -> Optional[Dict[str, Any]]:
+        """Espera a que otro worker publique la carga; None si vence el lock sin resultado"""
+        deadline = time.monotonic() + settings.cache_load_lock_seconds
+        while time.monotonic() < deadline and self.l2_available:
+            await asyncio.sleep(0.05)
+            try:
+                raw, locked = await self.redis.pipeline(transaction=False).get(key).exists(self._lock_key(key)).execute()
+            except Exception as e:
+                self._redis_failed(e)
+                return None
+            if raw is not None:
+                entry = json.loads(raw)
+                if self._is_envelope(entry):
+                    return entry
+            if not locked:
+                return None
+        return None
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: int) -> Any:
+        owns_lock = await self._acquire_load_lock(key)
+        if owns_lock is False:
+            entry = await self._wait_remote_load(key)
+            if entry is not None:
+                self.coalesced_loads += 1
+                return entry["value"]
+            owns_lock = await self._acquire_load_lock(key)
+        try:
+            return await self._run_loader(key, loader, ttl)
+        finally:
+            if owns_lock:
+                await self._release_load_lock(key)
+
+    def _load_done(self, key: str, task: asyncio.Task) -> None:
+        if self._loading.get(key) is task:
+            del self._loading[key]
+        if not task.cancelled():
+            # Evita "Task exception was never retrieved" cuando nadie quedó esperando
+            task.exception()
+
+    async def _load_coalesced(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: int) -> Any:
+        """
+        Miss: una sola carga por clave; el resto de peticiones espera su resultado. La carga
+        corre en su propia tarea: si se cancela la petición que la inició (cliente
+        desconectado, hedge perdedor) los demás siguen esperando el mismo resultado
+        """
+        task = self._loading.get(key)
+        if task is not None:
+            self.coalesced_loads += 1
+        else:
+            task = asyncio.create_task(self._load(key, loader, ttl))
+            self._loading[key] = task
+            task.add_done_callback(lambda done: self._load_done(key, done))
+        return await asyncio.shield(task)
+
+    async def _refresh(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: int) -> None:
+        try:
+            owns_lock = await self._acquire_load_lock(key)
+            if owns_lock is False:
+                return  # otro worker ya está recargando
+            try:
+                await self._run_loader(key, loader, ttl)
+                self.background_refreshes += 1
+            finally:
+                if owns_lock:
+                    await self._release_load_lock(key)
+        except Exception as e:
+            print(f"⚠️ Error recargando {key} en segundo plano: {e}")
+        finally:
+            self._refreshing.discard(key)
+
+    def _schedule_refresh(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: int) -> None:
+        if key in self._refreshing or key in self._loading:
+            return
+        self._refreshing.add(key)
+        task = asyncio.create_task(self._refresh(key, loader, ttl))
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        tags: Optional[List[str]] = None,
+        ttl: Optional[int] = None
+    ) -> Any:
+        """
+        Devuelve la clave o la carga con ``loader`` protegiendo a la base de datos:
+        coalescencia en el miss, stale-while-revalidate pasado el TTL blando (el del
+        namespace o ``ttl``) y recarga anticipada probabilística. ``loader`` no debe
+        depender de la petición: puede ejecutarse en segundo plano cuando esta ya terminó
+        """
+        ttl = int(ttl or self.registry.ttl_for(key))
+        if tags:
+            key = await self.tagged_key(key, tags)
+
+        entry = await self.get(key)
+        if self._is_envelope(entry):
+            refresh, early = self._needs_refresh(entry)
+            if refresh:
+                if early:
+                    self.early_refreshes += 1
+                else:
+                    self.stale_served += 1
+                self._schedule_refresh(key, loader, ttl)
+            return entry["value"]
+
+        return await self._load_coalesced(key, loader, ttl)
+
+    def _pool_stats(self) -> Optional[Dict[str, int]]:
+        if self.redis is None:
+            return None
+        pool = self.redis.connection_pool
+        return {
+            "max_connections": pool.max_connections,
+            "in_use": len(pool._in_use_connections),
+            "idle": len(pool._available_connections)
+        }
+
+    async def get_cache_stats(self) -> Dict[str, Any]:
+        lookups = self.l1_hits + self.l2_hits + self.misses
+        return {
+            "status": "connected" if self.l2_available else "l1_only",
+            "type": "tiered",
+            "l1": {
+                "entries": len(self.l1),
+                "max_entries": self.l1.max_entries,
+                "ttl_seconds": self.l1_ttl,
+                "hits": self.l1_hits,
+                "evictions": self.l1.evictions
+            },
+            "l2": {
+                "available": self.l2_available,
+                "pool": self._pool_stats(),
+                "hits": self.l2_hits,
+                "errors": self.redis_errors
+            },
+            "misses": self.misses,
+            "hit_rate": round((self.l1_hits + self.l2_hits) / lookups, 4) if lookups else 0.0,
+            "tags": {
+                "known": len(self._tag_versions),
+                "invalidations": self.tag_invalidations
+            },
+            "loads": {
+                "loads": self.loads,
+                "coalesced": self.coalesced_loads,
+                "stale_served": self.stale_served,
+                "early_refreshes": self.early_refreshes,
+                "background_refreshes": self.background_refreshes,
+                "in_flight": len(self._loading) + len(self._refreshing)
+            },
+            "namespaces": self.registry.ttls
+        }
+
+
+# Instancia global del servicio de cache
+tiered_cache = TieredCacheService()
@@ -0,0 +1,113 @@
+"""
+Índice vectorial FAISS generado por scripts/ingest_docs.py
+Se carga una sola vez y en modo memory-mapped para que los workers de uvicorn compartan páginas
+
+Cada ingesta escribe una versión nueva en ``<RAG_INDEX_PATH>/versions/<versión>`` y luego
+actualiza el archivo puntero ``<RAG_INDEX_PATH>/CURRENT``. El servicio detecta el cambio,
+carga la versión nueva en segundo plano y la intercambia de forma atómica; las versiones
+anteriores se conservan para poder volver atrás con solo reescribir el puntero.
+"""
+import pickle
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import faiss
+    import numpy as np
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+
+from app.index_versions import read_current_version, resolve_index_path, version_path
+
+
+@dataclass(frozen=True)
+class IndexSnapshot:
+    """Índice cargado e inmutable; se reemplaza completo al cambiar de versión"""
+    version: Optional[str]
+    index: Any
+    docstore: Any
+    index_to_docstore_id: Dict[int, str]
+
+
+class FaissVectorStore:
+    """Lectura del índice FAISS guardado con ``FAISS.save_local`` de LangChain"""
+
+    def __init__(self, index_path: str):
+        self.index_path = resolve_index_path(index_path)
+        self.snapshot: Optional[IndexSnapshot] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.snapshot is not None
+
+    @property
+    def version(self) -> Optional[str]:
+        return self.snapshot.version if self.snapshot else None
+
+    def has_update(self) -> bool:
+        """Indica si el puntero CURRENT apunta a una versión distinta de la cargada"""
+        if not FAISS_AVAILABLE:
+            return False
+        version = read_current_version(self.index_path)
+        return version is not None and version != self.version
+
+    def _read_snapshot(self, version: Optional[str]) -> Optional[IndexSnapshot]:
+        directory = version_path(self.index_path, version)
+        faiss_file = directory / "index.faiss"
+        docstore_file = directory / "index.pkl"
+        if not faiss_file.exists() or not docstore_file.exists():
+            print(f"⚠️ No se encontró índice FAISS en {directory}")
+            return None
+
+        mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+        index = faiss.read_index(str(faiss_file), mmap_flag | faiss.IO_FLAG_READ_ONLY)
+        with open(docstore_file, "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        return IndexSnapshot(version, index, docstore, index_to_docstore_id)
+
+    def load(self) -> bool:
+        """
+        Carga la versión apuntada por CURRENT (o los archivos de la raíz si no hay versiones)
+        y la intercambia con la actual; devuelve False si no hay nada que cargar.
+        Las búsquedas en curso siguen usando el snapshot anterior hasta terminar.
+        """
+        if not FAISS_AVAILABLE:
+            print("⚠️ faiss no está instalado, recuperación vectorial deshabilitada")
+            return False
+
+        version = read_current_version(self.index_path)
+        snapshot = self._read_snapshot(version)
+        if snapshot is None:
+            return False
+
+        self.snapshot = snapshot
+        label = f"versión {version}" if version else str(self.index_path)
+        print(f"✅ Índice FAISS cargado ({label}, {snapshot.index.ntotal} fragmentos)")
+        return True
+
+    def search(self, embedding: List[float], k: int = 4) -> List[Tuple[Dict[str, Any], float]]:
+        """Devuelve los ``k`` fragmentos más cercanos como pares (documento, distancia)"""
+        snapshot = self.snapshot
+        if snapshot is None:
+            return []
+
+        query = np.asarray([embedding], dtype="float32")
+        distances, positions = snapshot.index.search(query, k)
+
+        results = []
+        for distance, position in zip(distances[0], positions[0]):
+            if position < 0:
+                continue
+            doc_id = snapshot.index_to_docstore_id.get(int(position))
+            document = snapshot.docstore.search(doc_id) if doc_id is not None else None
+            if document is None or isinstance(document, str):
+                continue
+            source = document.metadata.get("source", "")
+            results.append(({
+                "title": Path(source).stem if source else "Documento",
+                "content": document.page_content,
+                "category": "documento"
+            }, float(distance)))
+        return results
@@ -8,6 +8,7 @@ from app.models_sqlmodel.chat import Chat, ChatMessage, ChatCreate, ChatMessageC
 from app.repositories.chat_repository import ChatRepository
 from app.services.ai_service import ai_service
 from app.services.openai_service import generate_contextual_response
+from app.services.rag_service import advanced_rag_answer
 from app.database.connection import get_db
 from app.services.simple_cache_service import cache_service
 
@@ -51,10 +52,10 @@ class ChatUseCases:
                     })
         
         # Usar RAG avanzado para obtener contexto real de productos
-        rag_result = advanced_rag_answer(content, db, conversation_history)
+        rag_result = await advanced_rag_answer(content, db, conversation_history)
         
         # Generar respuesta contextual usando OpenAI con el contexto RAG
-        ai_response_text = generate_contextual_response(content, rag_result, conversation_history)
+        ai_response_text = await generate_contextual_response(content, rag_result, conversation_history)
         
         # Analizar intención
         intent_analysis = await ai_service.analyze_intent(content)
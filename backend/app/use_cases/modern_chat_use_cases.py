@@ -8,6 +8,7 @@ from datetime import datetime
 from app.models import Chat, ChatMessage
 from app.services.modern_ai_service import modern_ai_service
 from app.services.modern_cache_service import modern_cache_service
+from app.services.conversation_summary import conversation_summary
 from app.db import get_db
 from sqlalchemy.orm import Session
 
@@ -48,7 +49,7 @@ class ModernChatUseCases(IModernChatUseCases):
             self.db.refresh(user_message)
             
             # 2. Obtener contexto del chat
-            context = await self._get_chat_context(chat_id, user_id)
+            context = await self._get_chat_context(chat_id, user_id, exclude_message_id=user_message.id)
             
             # 3. Usar tu API de OpenAI para generar respuesta
             ai_response = await modern_ai_service.generate_smart_response(message, context)
@@ -62,6 +63,7 @@ class ModernChatUseCases(IModernChatUseCases):
             self.db.add(bot_message)
             self.db.commit()
             self.db.refresh(bot_message)
+            conversation_summary.schedule_update(chat_id)
             
             # 5. Cachear recomendaciones si las hay
             if ai_response.get("recommendations"):
@@ -148,13 +150,27 @@ class ModernChatUseCases(IModernChatUseCases):
         except Exception as e:
             return {"error": str(e)}
     
-    async def _get_chat_context(self, chat_id: int, user_id: Optional[int] = None) -> Dict[str, Any]:
+    async def _get_chat_context(
+        self,
+        chat_id: int,
+        user_id: Optional[int] = None,
+        exclude_message_id: Optional[int] = None
+    ) -> Dict[str, Any]:
         """
-        Obtiene el contexto del chat para la IA
+        Obtiene el contexto del chat para la IA (el mensaje actual se excluye del historial)
         """
         try:
-            # Obtener historial reciente
-            history = await self.get_chat_history(chat_id, limit=5)
+            # Resumen de la conversación + últimos mensajes aún no resumidos
+            summary, recent = conversation_summary.get_context(self.db, chat_id, exclude_message_id)
+            history = [
+                {
+                    "id": msg.id,
+                    "sender": msg.sender,
+                    "content": msg.content,
+                    "created_at": msg.created_at.isoformat()
+                }
+                for msg in recent
+            ]
             
             # Obtener sesión del usuario del cache
             user_session = None
@@ -169,6 +185,7 @@ class ModernChatUseCases(IModernChatUseCases):
             return {
                 "chat_id": chat_id,
                 "user_id": user_id,
+                "summary": summary,
                 "history": history,
                 "user_session": user_session,
                 "recommendations": recommendations,
@@ -179,6 +196,7 @@ class ModernChatUseCases(IModernChatUseCases):
             return {
                 "chat_id": chat_id,
                 "user_id": user_id,
+                "summary": None,
                 "history": [],
                 "user_session": None,
                 "recommendations": [],
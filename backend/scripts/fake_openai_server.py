@@ -0,0 +1,274 @@
+"""
+Servidor local compatible con la API de OpenAI para pruebas de carga sin red ni API key
+Implementa /v1/chat/completions (con y sin streaming), /v1/embeddings y
+/v1/audio/transcriptions con latencias aleatorias configurables, y errores 429/500 con
+la probabilidad indicada. El backend lo usa con OPENAI_BASE_URL=http://localhost:8900/v1
+
+Distribuciones de latencia (milisegundos):
+    fixed:800            siempre 800 ms
+    uniform:200,1200     uniforme entre 200 y 1200 ms
+    normal:800,200       normal (media, desviación), nunca negativa
+    lognormal:800,0.5    lognormal (mediana, sigma): cola larga como la de un LLM real
+
+Ejemplo:
+    python scripts/fake_openai_server.py --first-token lognormal:700,0.6 \\
+        --model-latency gpt-4o=lognormal:2500,0.5 --error-rate 0.02
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import time
+import uuid
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+CANNED_REPLY = (
+    "¡Hola! Con gusto te ayudo. En Asistente Tienda tenemos varias opciones que pueden "
+    "interesarte según tu presupuesto y estilo. Te recomiendo revisar nuestra sección de "
+    "productos destacados, donde encontrarás precios actualizados y disponibilidad. Si me "
+    "cuentas un poco más sobre lo que buscas, puedo darte una recomendación más precisa. "
+    "¿Hay algo más en lo que pueda ayudarte?"
+)
+CANNED_TRANSCRIPTION = "Hola, quisiera saber qué productos tienen disponibles y cuánto cuesta el envío."
+
+
+def parse_distribution(spec: str) -> Callable[[], float]:
+    """Convierte ``tipo:parámetros`` en una función que devuelve una muestra en segundos"""
+    kind, _, raw = spec.partition(":")
+    params = [float(value) for value in raw.split(",") if value]
+    if kind == "fixed":
+        return lambda: params[0] / 1000
+    if kind == "uniform":
+        return lambda: random.uniform(params[0], params[1]) / 1000
+    if kind == "normal":
+        return lambda: max(0.0, random.gauss(params[0], params[1])) / 1000
+    if kind == "lognormal":
+        mu = math.log(params[0])
+        return lambda: random.lognormvariate(mu, params[1]) / 1000
+    raise ValueError(f"Distribución desconocida: {spec}")
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def messages_text(messages: List[Dict[str, Any]]) -> str:
+    parts = []
+    for message in messages:
+        content = message.get("content") or ""
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        parts.append(content)
+    return "\n".join(parts)
+
+
+def fake_embedding(text: str, dimensions: int) -> List[float]:
+    """Vector determinista y normalizado: el mismo texto produce siempre el mismo embedding"""
+    rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    vector = [rng.gauss(0.0, 1.0) for _ in range(dimensions)]
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+class FakeOpenAI:
+    """Estado y comportamiento configurable del servidor"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.first_token = parse_distribution(args.first_token)
+        self.token_delay = parse_distribution(args.token_delay)
+        self.embedding_latency = parse_distribution(args.embedding_latency)
+        self.transcription_latency = parse_distribution(args.transcription_latency)
+        self.model_latency: Dict[str, Callable[[], float]] = {}
+        for override in args.model_latency or []:
+            model, _, spec = override.partition("=")
+            self.model_latency[model] = parse_distribution(spec)
+        self.error_rate = args.error_rate
+        self.embedding_dimensions = args.embedding_dimensions
+        self.counters: Counter = Counter()
+
+    def maybe_error(self, endpoint: str) -> Optional[JSONResponse]:
+        """Simula saturación del proveedor con la probabilidad configurada"""
+        if random.random() >= self.error_rate:
+            return None
+        status = random.choice((429, 500))
+        self.counters[f"{endpoint}:{status}"] += 1
+        headers = {"retry-after": "1"} if status == 429 else {}
+        return JSONResponse(
+            {"error": {"message": "Error simulado", "type": "server_error", "code": status}},
+            status_code=status,
+            headers=headers
+        )
+
+    def first_token_delay(self, model: str) -> float:
+        return self.model_latency.get(model, self.first_token)()
+
+    def reply_tokens(self, max_tokens: int) -> List[str]:
+        words = CANNED_REPLY.split(" ")
+        return [word + " " for word in words[:max(1, min(len(words), max_tokens))]]
+
+
+def create_app(args: argparse.Namespace) -> FastAPI:
+    app = FastAPI(title="Fake OpenAI")
+    fake = FakeOpenAI(args)
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": model, "object": "model"} for model in ("gpt-4o-mini", "gpt-4o", "whisper-1")]}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "gpt-4o-mini")
+        stream = bool(body.get("stream"))
+        fake.counters["chat.stream" if stream else "chat"] += 1
+
+        error = fake.maybe_error("chat")
+        if error:
+            return error
+
+        tokens = fake.reply_tokens(body.get("max_tokens") or 200)
+        prompt_tokens = estimate_tokens(messages_text(body.get("messages", [])))
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(tokens),
+            "total_tokens": prompt_tokens + len(tokens)
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+
+        if not stream:
+            await asyncio.sleep(fake.first_token_delay(model) + sum(fake.token_delay() for _ in tokens))
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens).strip()},
+                    "finish_reason": "stop"
+                }],
+                "usage": usage
+            }
+
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        async def events():
+            await asyncio.sleep(fake.first_token_delay(model))
+            yield chunk({"role": "assistant", "content": ""})
+            for token in tokens:
+                yield chunk({"content": token})
+                await asyncio.sleep(fake.token_delay())
+            yield chunk({}, "stop")
+            if include_usage:
+                payload = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [],
+                    "usage": usage
+                }
+                yield f"data: {json.dumps(payload)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        fake.counters["embeddings"] += 1
+        error = fake.maybe_error("embeddings")
+        if error:
+            return error
+
+        inputs = body.get("input", [])
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        texts = [item if isinstance(item, str) else " ".join(map(str, item)) for item in inputs]
+        dimensions = body.get("dimensions") or fake.embedding_dimensions
+        await asyncio.sleep(fake.embedding_latency())
+        prompt_tokens = sum(estimate_tokens(text) for text in texts)
+        return {
+            "object": "list",
+            "data": [
+                {"object": "embedding", "index": index, "embedding": fake_embedding(text, dimensions)}
+                for index, text in enumerate(texts)
+            ],
+            "model": body.get("model", "text-embedding-ada-002"),
+            "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens}
+        }
+
+    @app.post("/v1/audio/transcriptions")
+    async def transcriptions(request: Request):
+        form = await request.form()
+        fake.counters["transcriptions"] += 1
+        error = fake.maybe_error("transcriptions")
+        if error:
+            return error
+
+        await asyncio.sleep(fake.transcription_latency())
+        response_format = form.get("response_format") or "json"
+        if response_format == "text":
+            return PlainTextResponse(CANNED_TRANSCRIPTION)
+        if response_format == "verbose_json":
+            return {
+                "task": "transcribe",
+                "language": form.get("language") or "spanish",
+                "duration": 3.2,
+                "text": CANNED_TRANSCRIPTION,
+                "segments": []
+            }
+        return {"text": CANNED_TRANSCRIPTION}
+
+    @app.get("/stats")
+    async def stats():
+        return dict(fake.counters)
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Servidor local compatible con OpenAI para pruebas de carga")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--first-token", default="lognormal:600,0.5",
+                        help="Latencia hasta el primer token (o respuesta completa sin streaming)")
+    parser.add_argument("--token-delay", default="fixed:15", help="Pausa entre tokens del stream")
+    parser.add_argument("--model-latency", action="append",
+                        help="Latencia del primer token por modelo, p. ej. gpt-4o=lognormal:2500,0.5 (repetible)")
+    parser.add_argument("--embedding-latency", default="lognormal:80,0.3")
+    parser.add_argument("--transcription-latency", default="lognormal:1200,0.3")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probabilidad de responder 429/500")
+    parser.add_argument("--embedding-dimensions", type=int, default=1536)
+    parser.add_argument("--seed", type=int, default=None, help="Semilla para latencias reproducibles")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    print(f"🤖 Fake OpenAI escuchando en http://{args.host}:{args.port}/v1")
+    print(f"   Primer token: {args.first_token} | entre tokens: {args.token_delay} | errores: {args.error_rate:.0%}")
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,17 @@
 """
-Crea un índice FAISS desde PDFs/TXT/MD en backend/docs
+Crea o actualiza incrementalmente el índice FAISS desde PDFs/TXT/MD en backend/docs
+Solo se calculan embeddings de los fragmentos nuevos o modificados (manifest de hashes)
+Cada ejecución publica una versión nueva (versions/<versión> + puntero CURRENT) que el
+backend carga en caliente; con --rollback se vuelve a la versión anterior
 Requiere: OPENAI_API_KEY
 """
-import os, glob
+import os, glob, sys
+import argparse
+import asyncio
+import hashlib
+import json
+import shutil
+import time
 from pathlib import Path
 from langchain_community.vectorstores import FAISS
 from langchain_openai import OpenAIEmbeddings
@@ -13,8 +22,22 @@ from dotenv import load_dotenv
 # Cargar variables de entorno
 load_dotenv()
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Solo el módulo de versiones: importar app.services arrastraría la configuración y los cachés del backend
+from app.index_versions import (
+    VERSIONS_DIR, list_versions, read_current_version, version_path, write_current_version
+)
+
 DOCS_DIR = Path(__file__).resolve().parent.parent / "docs"
 INDEX_DIR = Path(__file__).resolve().parent.parent / os.getenv("RAG_INDEX_PATH", "rag_index")
+MANIFEST_FILE = "manifest.json"
+
+EMBEDDING_MODEL = os.getenv("RAG_EMBEDDING_MODEL", "text-embedding-ada-002")
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 120
+BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))
+CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "4"))
+KEEP_VERSIONS = int(os.getenv("RAG_INDEX_KEEP_VERSIONS", "5"))
 
 def load_docs():
     docs = []
@@ -31,18 +54,156 @@ def load_docs():
         merged.extend(d)
     return merged
 
+def chunk_id(chunk):
+    """Hash estable del fragmento: cambia solo si cambia su contenido o su documento de origen"""
+    source = chunk.metadata.get("source", "")
+    return hashlib.sha256(f"{source}\0{chunk.page_content}".encode("utf-8")).hexdigest()
+
+def load_manifest(directory):
+    path = directory / MANIFEST_FILE
+    if not path.exists():
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(directory, documents):
+    manifest = {
+        "embedding_model": EMBEDDING_MODEL,
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "documents": documents,
+        "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
+    with open(directory / MANIFEST_FILE, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+def manifest_matches(directory, manifest):
+    """El índice existente solo se reutiliza si se generó con el mismo modelo y particionado"""
+    return (
+        manifest is not None
+        and manifest.get("embedding_model") == EMBEDDING_MODEL
+        and manifest.get("chunk_size") == CHUNK_SIZE
+        and manifest.get("chunk_overlap") == CHUNK_OVERLAP
+        and (directory / "index.faiss").exists()
+    )
+
+def new_version():
+    """Nombre de versión ordenable cronológicamente"""
+    return time.strftime("%Y%m%d-%H%M%S")
+
+def publish_version(version):
+    """Apunta CURRENT a la versión nueva y elimina las más antiguas que sobran"""
+    write_current_version(INDEX_DIR, version)
+    versions = list_versions(INDEX_DIR)
+    for old in versions[:-KEEP_VERSIONS] if KEEP_VERSIONS > 0 else []:
+        if old != version:
+            shutil.rmtree(INDEX_DIR / VERSIONS_DIR / old, ignore_errors=True)
+
+def rollback():
+    """Vuelve a la versión anterior a la actual (las versiones se conservan en disco)"""
+    versions = list_versions(INDEX_DIR)
+    current = read_current_version(INDEX_DIR)
+    if current not in versions or versions.index(current) == 0:
+        print("No hay una versión anterior a la que volver")
+        return
+    previous = versions[versions.index(current) - 1]
+    write_current_version(INDEX_DIR, previous)
+    print(f"Índice FAISS revertido de {current} a {previous}")
+
+async def embed_in_batches(embeddings, texts):
+    """Envía los textos en lotes grandes con varias peticiones concurrentes"""
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def embed_batch(batch):
+        async with semaphore:
+            return await embeddings.aembed_documents(batch)
+
+    batches = [texts[i:i + BATCH_SIZE] for i in range(0, len(texts), BATCH_SIZE)]
+    results = await asyncio.gather(*(embed_batch(batch) for batch in batches))
+    return [vector for batch in results for vector in batch]
+
 def main():
+    started = time.perf_counter()
     INDEX_DIR.mkdir(parents=True, exist_ok=True)
     raw_docs = load_docs()
     if not raw_docs:
         print(f"No se encontraron documentos en {DOCS_DIR}")
         return
-    splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=120)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
     splits = splitter.split_documents(raw_docs)
-    embeddings = OpenAIEmbeddings()
-    vs = FAISS.from_documents(splits, embeddings)
-    vs.save_local(str(INDEX_DIR))
-    print(f"Índice FAISS guardado en {INDEX_DIR}")
+
+    # Fragmentos actuales indexados por hash (los duplicados exactos se indexan una sola vez)
+    chunks = {}
+    documents = {}
+    for chunk in splits:
+        cid = chunk_id(chunk)
+        chunks.setdefault(cid, chunk)
+        documents.setdefault(chunk.metadata.get("source", ""), []).append(cid)
+
+    # La versión actual (o el formato antiguo sin versiones) es la base de la ingesta incremental
+    current_dir = version_path(INDEX_DIR, read_current_version(INDEX_DIR))
+    embeddings = OpenAIEmbeddings(model=EMBEDDING_MODEL)
+    manifest = load_manifest(current_dir)
+    vs = None
+    indexed_ids = set()
+    if manifest_matches(current_dir, manifest):
+        vs = FAISS.load_local(str(current_dir), embeddings, allow_dangerous_deserialization=True)
+        indexed_ids = set(vs.index_to_docstore_id.values())
+    elif manifest is not None:
+        print("⚠️ Cambió el modelo de embeddings o el particionado, se reconstruye el índice completo")
+
+    new_ids = [cid for cid in chunks if cid not in indexed_ids]
+    removed_ids = [cid for cid in indexed_ids if cid not in chunks]
+    skipped = len(chunks) - len(new_ids)
+
+    # Fragmentos de documentos eliminados o modificados
+    if vs is not None and removed_ids:
+        vs.delete(removed_ids)
+
+    embed_seconds = 0.0
+    if new_ids:
+        texts = [chunks[cid].page_content for cid in new_ids]
+        metadatas = [chunks[cid].metadata for cid in new_ids]
+        embed_started = time.perf_counter()
+        vectors = asyncio.run(embed_in_batches(embeddings, texts))
+        embed_seconds = time.perf_counter() - embed_started
+
+        text_embeddings = list(zip(texts, vectors))
+        if vs is None:
+            vs = FAISS.from_embeddings(text_embeddings, embeddings, metadatas=metadatas, ids=new_ids)
+        else:
+            vs.add_embeddings(text_embeddings, metadatas=metadatas, ids=new_ids)
+
+    if vs is None:
+        print("No hay fragmentos para indexar")
+        return
+    if not (new_ids or removed_ids) and manifest is not None and current_dir != INDEX_DIR:
+        print(f"Sin cambios, se mantiene la versión {read_current_version(INDEX_DIR)}")
+        return
+
+    # Se escribe una versión nueva completa antes de mover el puntero: el backend nunca lee a medias
+    version = new_version()
+    target_dir = version_path(INDEX_DIR, version)
+    target_dir.mkdir(parents=True, exist_ok=True)
+    vs.save_local(str(target_dir))
+    save_manifest(target_dir, documents)
+    publish_version(version)
+
+    elapsed = time.perf_counter() - started
+    print(f"Índice FAISS guardado en {target_dir} (versión {version})")
+    print(f"   Fragmentos agregados: {len(new_ids)}")
+    print(f"   Fragmentos sin cambios (omitidos): {skipped}")
+    print(f"   Fragmentos eliminados: {len(removed_ids)}")
+    print(f"   Tiempo total: {elapsed:.2f}s ({len(chunks) / elapsed:.1f} fragmentos/s)")
+    if embed_seconds:
+        print(f"   Embeddings: {len(new_ids) / embed_seconds:.1f} fragmentos/s "
+              f"(lotes de {BATCH_SIZE}, {CONCURRENCY} concurrentes)")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Ingesta de documentos para el índice RAG")
+    parser.add_argument("--rollback", action="store_true", help="volver a la versión anterior del índice")
+    args = parser.parse_args()
+    if args.rollback:
+        rollback()
+    else:
+        main()
@@ -0,0 +1,306 @@
+"""
+Prueba de carga de extremo a extremo del chat
+Lanza N clientes concurrentes contra /chat-enhanced/message (y su variante SSE),
+el WebSocket /ws/support y /modern-chat/advanced-message, y reporta throughput,
+latencia p50/p95/p99, tiempo al primer token en los canales con streaming y tasa de errores.
+
+Pensado para usarse con el servidor falso de OpenAI y así medir cambios de rendimiento sin red:
+    python scripts/fake_openai_server.py &
+    OPENAI_API_KEY=sk-local OPENAI_BASE_URL=http://localhost:8900/v1 uvicorn app.main:app --port 8000 &
+    python scripts/load_test.py --concurrency 20 --requests 200
+
+Requiere: httpx y, para el escenario ws_support, websockets (incluido en uvicorn[standard])
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+DEFAULT_MESSAGES = [
+    "Hola",
+    "¿Qué productos tienen disponibles?",
+    "¿Cuánto cuesta el envío a Quetzaltenango?",
+    "Busco unos zapatos deportivos para correr, ¿qué me recomiendas?",
+    "¿Cuáles son sus horarios de atención?",
+    "Necesito ayuda con mi pedido, no ha llegado",
+    "¿Cómo puedo combinar una camisa azul para una boda?",
+    "¿Aceptan pagos con tarjeta?",
+]
+
+SCENARIOS = ("chat_enhanced", "chat_enhanced_stream", "ws_support", "modern_chat")
+DEFAULT_SCENARIOS = ["chat_enhanced", "ws_support", "modern_chat"]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def latency_summary(values: List[float]) -> Dict[str, float]:
+    return {
+        "p50": round(percentile(values, 50), 1),
+        "p95": round(percentile(values, 95), 1),
+        "p99": round(percentile(values, 99), 1),
+        "max": round(max(values), 1) if values else 0.0,
+    }
+
+
+class RequestFailed(Exception):
+    """La petición respondió, pero con un resultado inválido"""
+
+
+@dataclass
+class ScenarioResult:
+    """Muestras de un escenario"""
+    name: str
+    latencies_ms: List[float] = field(default_factory=list)
+    first_token_ms: List[float] = field(default_factory=list)
+    errors: Counter = field(default_factory=Counter)
+    elapsed_seconds: float = 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        errors = sum(self.errors.values())
+        total = len(self.latencies_ms) + errors
+        report = {
+            "requests": total,
+            "ok": len(self.latencies_ms),
+            "errors": errors,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "throughput_rps": round(len(self.latencies_ms) / self.elapsed_seconds, 2) if self.elapsed_seconds else 0.0,
+            "latency_ms": latency_summary(self.latencies_ms),
+            "error_types": dict(self.errors),
+        }
+        if self.first_token_ms:
+            report["first_token_ms"] = latency_summary(self.first_token_ms)
+        return report
+
+
+# ==================== CLIENTES ====================
+# Cada cliente mantiene su estado (chat, socket) y devuelve el tiempo al primer token
+# cuando el canal hace streaming
+
+class HttpChatClient:
+    """Cliente de los endpoints JSON y SSE"""
+
+    def __init__(self, http: httpx.AsyncClient, scenario: str, chat_id: int):
+        self.http = http
+        self.scenario = scenario
+        self.chat_id = chat_id
+
+    async def connect(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def send(self, message: str) -> Optional[float]:
+        if self.scenario == "chat_enhanced":
+            response = await self.http.post("/chat-enhanced/message", json={"message": message, "chat_id": self.chat_id})
+            if response.status_code != 200:
+                raise RequestFailed(f"http_{response.status_code}")
+            if not response.json().get("success"):
+                raise RequestFailed("success_false")
+            return None
+
+        if self.scenario == "modern_chat":
+            response = await self.http.post("/modern-chat/advanced-message", json={"message": message, "chat_id": self.chat_id})
+            if response.status_code != 200:
+                raise RequestFailed(f"http_{response.status_code}")
+            # El endpoint captura sus excepciones y responde 200 con intención "error"
+            if response.json().get("intent", {}).get("type") == "error":
+                raise RequestFailed("intent_error")
+            return None
+
+        # chat_enhanced_stream
+        started = time.perf_counter()
+        first_token = None
+        event = None
+        async with self.http.stream(
+            "POST", "/chat-enhanced/message/stream", json={"message": message, "chat_id": self.chat_id}
+        ) as response:
+            if response.status_code != 200:
+                raise RequestFailed(f"http_{response.status_code}")
+            async for line in response.aiter_lines():
+                if line.startswith("event:"):
+                    event = line.split(":", 1)[1].strip()
+                elif line.startswith("data:"):
+                    if event == "token" and first_token is None:
+                        first_token = (time.perf_counter() - started) * 1000
+                    elif event == "error":
+                        raise RequestFailed("sse_error")
+                    elif event == "done":
+                        return first_token
+        raise RequestFailed("stream_incomplete")
+
+
+class WebSocketChatClient:
+    """Cliente del WebSocket /ws/support: una conexión por usuario virtual"""
+
+    def __init__(self, ws_url: str, timeout: float):
+        self.ws_url = ws_url
+        self.timeout = timeout
+        self.socket = None
+
+    async def connect(self) -> None:
+        import websockets
+
+        self.socket = await websockets.connect(self.ws_url, open_timeout=self.timeout)
+        welcome = json.loads(await asyncio.wait_for(self.socket.recv(), self.timeout))
+        if welcome.get("type") != "chat_opened":
+            raise RequestFailed("no_welcome")
+
+    async def close(self) -> None:
+        if self.socket is not None:
+            await self.socket.close()
+
+    async def send(self, message: str) -> Optional[float]:
+        started = time.perf_counter()
+        first_token = None
+        await self.socket.send(message)
+        while True:
+            frame = json.loads(await asyncio.wait_for(self.socket.recv(), self.timeout))
+            kind = frame.get("type")
+            if first_token is None and kind in ("delta", "bot"):
+                first_token = (time.perf_counter() - started) * 1000
+            if kind == "bot":
+                return first_token
+            if kind == "error":
+                raise RequestFailed("ws_error")
+
+
+# ==================== EJECUCIÓN ====================
+
+async def create_chat(http: httpx.AsyncClient) -> int:
+    """Un chat por usuario virtual para que el historial no se mezcle; 1 si no se puede crear"""
+    try:
+        response = await http.post("/chat/create")
+        if response.status_code == 200:
+            return response.json()["chat_id"]
+    except (httpx.HTTPError, KeyError, ValueError):
+        pass
+    return 1
+
+
+async def run_scenario(scenario: str, args: argparse.Namespace, messages: List[str]) -> ScenarioResult:
+    result = ScenarioResult(scenario)
+    remaining = args.requests
+    deadline = time.perf_counter() + args.duration if args.duration else None
+    ws_url = args.base_url.replace("http", "ws", 1).rstrip("/") + "/ws/support"
+
+    def take() -> bool:
+        nonlocal remaining
+        if deadline is not None:
+            return time.perf_counter() < deadline
+        if remaining <= 0:
+            return False
+        remaining -= 1
+        return True
+
+    async def virtual_user(http: httpx.AsyncClient, user: int) -> None:
+        if scenario == "ws_support":
+            client = WebSocketChatClient(ws_url, args.timeout)
+        else:
+            client = HttpChatClient(http, scenario, await create_chat(http))
+        try:
+            await client.connect()
+        except Exception as e:
+            result.errors[f"connect:{type(e).__name__}"] += 1
+            return
+
+        rng = random.Random(user)
+        try:
+            while take():
+                message = rng.choice(messages)
+                started = time.perf_counter()
+                try:
+                    first_token = await asyncio.wait_for(client.send(message), args.timeout)
+                except RequestFailed as e:
+                    result.errors[str(e)] += 1
+                    continue
+                except asyncio.TimeoutError:
+                    result.errors["timeout"] += 1
+                    continue
+                except Exception as e:
+                    result.errors[type(e).__name__] += 1
+                    if scenario == "ws_support":
+                        return
+                    continue
+                result.latencies_ms.append((time.perf_counter() - started) * 1000)
+                if first_token is not None:
+                    result.first_token_ms.append(first_token)
+                if args.think_time:
+                    await asyncio.sleep(rng.uniform(0, args.think_time))
+        finally:
+            await client.close()
+
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as http:
+        started = time.perf_counter()
+        await asyncio.gather(*(virtual_user(http, user) for user in range(args.concurrency)))
+        result.elapsed_seconds = time.perf_counter() - started
+    return result
+
+
+def print_report(result: ScenarioResult) -> None:
+    summary = result.summary()
+    latency = summary["latency_ms"]
+    print(f"\n📊 {result.name}")
+    print(f"   Peticiones: {summary['requests']} ({summary['ok']} ok, {summary['errors']} errores, "
+          f"{summary['error_rate']:.1%})")
+    print(f"   Throughput: {summary['throughput_rps']} req/s")
+    print(f"   Latencia:   p50 {latency['p50']} ms | p95 {latency['p95']} ms | p99 {latency['p99']} ms | max {latency['max']} ms")
+    if "first_token_ms" in summary:
+        first = summary["first_token_ms"]
+        print(f"   1er token:  p50 {first['p50']} ms | p95 {first['p95']} ms | p99 {first['p99']} ms")
+    if summary["error_types"]:
+        print(f"   Errores:    {summary['error_types']}")
+
+
+async def main_async(args: argparse.Namespace) -> Dict[str, Any]:
+    messages = DEFAULT_MESSAGES
+    if args.messages:
+        with open(args.messages, encoding="utf-8") as f:
+            messages = [line.strip() for line in f if line.strip()]
+
+    budget = f"{args.duration}s" if args.duration else f"{args.requests} peticiones"
+    print(f"🚀 Prueba de carga contra {args.base_url}: {args.concurrency} usuarios, {budget} por escenario")
+    report = {}
+    for scenario in args.scenario or DEFAULT_SCENARIOS:
+        result = await run_scenario(scenario, args, messages)
+        print_report(result)
+        report[scenario] = result.summary()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga del chat (HTTP, SSE y WebSocket)")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS,
+                        help=f"Escenario a ejecutar (repetible); por defecto: {', '.join(DEFAULT_SCENARIOS)}")
+    parser.add_argument("--concurrency", type=int, default=10, help="Usuarios virtuales simultáneos")
+    parser.add_argument("--requests", type=int, default=100, help="Peticiones totales por escenario")
+    parser.add_argument("--duration", type=float, default=None, help="Duración por escenario en segundos (ignora --requests)")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Pausa aleatoria máxima entre mensajes de un usuario")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--messages", help="Archivo con un mensaje por línea")
+    parser.add_argument("--json", dest="json_path", help="Guardar el reporte en JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Reporte guardado en {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Pruebas de cancelación del hedging del LLM Gateway (sin red: cliente OpenAI simulado)
+Un hedge perdedor se cancela a mitad de la apertura o con el stream ya abierto; en
+ambos casos el circuit breaker debe seguir aceptando llamadas, el cupo del semáforo
+debe volver y el stream abierto debe cerrarse.
+
+Uso:  cd backend && python test_llm_gateway_hedging.py   (o con pytest)
+"""
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test_llm_gateway.db")
+os.environ.setdefault("JWT_SECRET", "test")
+os.environ.setdefault("LLM_SINGLEFLIGHT_REDIS", "false")
+
+from app.core.config import settings
+from app.services.llm_gateway import LLMGateway
+from app.services.model_router import model_router
+
+SLOW_MODEL = "slow-model"
+FAST_MODEL = "fast-model"
+
+
+class FakeStream:
+    """Stream simulado: espera ``first_delay`` antes del primer chunk"""
+
+    def __init__(self, model: str, first_delay: float):
+        self.model = model
+        self.first_delay = first_delay
+        self.sent = False
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.sent:
+            raise StopAsyncIteration
+        await asyncio.sleep(self.first_delay)
+        self.sent = True
+        delta = SimpleNamespace(content=f"hola desde {self.model}")
+        return SimpleNamespace(model=self.model, usage=None, choices=[SimpleNamespace(delta=delta)])
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeClient:
+    """Imita ``client.chat.completions.create(stream=True)`` con demoras por modelo"""
+
+    def __init__(self, open_delays, first_delays):
+        self.open_delays = open_delays
+        self.first_delays = first_delays
+        self.streams = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, model, **kwargs):
+        await asyncio.sleep(self.open_delays.get(model, 0))
+        stream = FakeStream(model, self.first_delays.get(model, 0))
+        self.streams.append(stream)
+        return stream
+
+
+def _gateway(client: FakeClient) -> LLMGateway:
+    gateway = LLMGateway()
+    gateway.client = client
+    gateway.hedge_model = lambda model: FAST_MODEL
+    gateway.hedge_budget.tokens["test"] = gateway.hedge_budget.burst
+    return gateway
+
+
+def _free_slots(gateway: LLMGateway, model: str) -> int:
+    return gateway._semaphore(model)._value
+
+
+async def _collect(gateway: LLMGateway):
+    parts = []
+    async for chunk in gateway.hedged_stream_chat_completion(
+        [{"role": "user", "content": "hola"}], SLOW_MODEL, route="test"
+    ):
+        parts.append(chunk.choices[0].delta.content)
+    return parts
+
+
+def _run(coro):
+    original_enabled = settings.llm_hedge_enabled
+    original_deadline = model_router.first_token_deadline
+    settings.llm_hedge_enabled = True
+    model_router.first_token_deadline = lambda model: 50.0
+    try:
+        return asyncio.run(coro)
+    finally:
+        settings.llm_hedge_enabled = original_enabled
+        model_router.first_token_deadline = original_deadline
+
+
+def test_primary_cancelled_mid_open():
+    """El primario sigue abriendo el stream cuando gana el hedge"""
+    async def scenario():
+        client = FakeClient(open_delays={SLOW_MODEL: 5.0}, first_delays={})
+        gateway = _gateway(client)
+        parts = await _collect(gateway)
+        await gateway.close()
+        return gateway, client, parts
+
+    gateway, client, parts = _run(scenario())
+    assert parts == [f"hola desde {FAST_MODEL}"]
+    assert gateway.breaker.allow()
+    assert _free_slots(gateway, SLOW_MODEL) == settings.llm_model_concurrency
+    assert _free_slots(gateway, FAST_MODEL) == settings.llm_model_concurrency
+    assert all(stream.closed for stream in client.streams)
+    print("✅ primario cancelado a mitad de la apertura")
+
+
+def test_primary_cancelled_after_open():
+    """El primario ya abrió el stream pero su primer chunk llega tarde"""
+    async def scenario():
+        client = FakeClient(open_delays={}, first_delays={SLOW_MODEL: 5.0})
+        gateway = _gateway(client)
+        parts = await _collect(gateway)
+        await gateway.close()
+        return gateway, client, parts
+
+    gateway, client, parts = _run(scenario())
+    assert parts == [f"hola desde {FAST_MODEL}"]
+    primary = next(stream for stream in client.streams if stream.model == SLOW_MODEL)
+    assert primary.closed
+    assert gateway.breaker.allow()
+    assert _free_slots(gateway, SLOW_MODEL) == settings.llm_model_concurrency
+    print("✅ stream del primario cerrado tras perder el hedge")
+
+
+def test_cancelled_half_open_probe():
+    """Cancelar la llamada de prueba del half-open no deja el circuito bloqueado"""
+    async def scenario():
+        client = FakeClient(open_delays={SLOW_MODEL: 5.0, FAST_MODEL: 5.0}, first_delays={})
+        gateway = _gateway(client)
+        gateway.breaker.failures = gateway.breaker.failure_threshold
+        gateway.breaker.opened_at = time.monotonic() - gateway.breaker.recovery_seconds
+        task = asyncio.ensure_future(_collect(gateway))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await gateway.close()
+        return gateway
+
+    gateway = _run(scenario())
+    assert gateway.breaker.state == "half_open"
+    assert gateway.breaker.allow()
+    assert _free_slots(gateway, SLOW_MODEL) == settings.llm_model_concurrency
+    print("✅ prueba del half-open cancelada sin bloquear el circuito")
+
+
+if __name__ == "__main__":
+    test_primary_cancelled_mid_open()
+    test_primary_cancelled_after_open()
+    test_cancelled_half_open_probe()
@@ -0,0 +1,56 @@
+"""
+Pruebas del router de respuestas por niveles (sin red ni LLM)
+Las preguntas frecuentes puras se responden con plantilla; los reclamos, el estado de un
+pedido concreto y las preguntas con algo más que el tema frecuente no.
+
+Uso:  cd backend && python test_response_router.py   (o con pytest)
+"""
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test_response_router.db")
+os.environ.setdefault("JWT_SECRET", "test")
+
+from app.services.response_router import TIER_LLM, TIER_TEMPLATE, response_router
+
+TEMPLATE_CASES = {
+    "¿Cuánto cuesta el envío?": "shipping",
+    "¿Qué métodos de pago aceptan?": "payment",
+    "¿Puedo pagar con tarjeta de crédito?": "payment",
+    "¿Cómo hago una devolución?": "returns",
+    "¿A qué hora abren?": "hours",
+    "hola": "greeting",
+    "buenas tardes": "greeting",
+}
+
+LLM_CASES = [
+    "me cobraron dos veces con la tarjeta",
+    "mi pedido no ha llegado, ¿cuándo llega?",
+    "tengo un problema con el envío",
+    "quiero un reembolso",
+    "¿cuánto cuesta la camisa azul?",
+    "no me gusta",
+]
+
+
+def test_faq_templates():
+    """Una pregunta frecuente sin nada más recibe la plantilla de su tema"""
+    for message, intent in TEMPLATE_CASES.items():
+        routed = response_router.route(message)
+        assert routed.tier == TIER_TEMPLATE, message
+        assert routed.intent == intent, message
+    print("✅ preguntas frecuentes respondidas con plantilla")
+
+
+def test_issues_skip_templates():
+    """Reclamos, estado de pedidos y preguntas de catálogo van al LLM aunque nombren un tema"""
+    for message in LLM_CASES:
+        routed = response_router.route(message)
+        assert routed.tier == TIER_LLM, message
+        assert routed.answer is None, message
+    print("✅ reclamos y preguntas de catálogo llegan al LLM")
+
+
+if __name__ == "__main__":
+    test_faq_templates()
+    test_issues_skip_templates()
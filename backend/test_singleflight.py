@@ -0,0 +1,70 @@
+"""
+Pruebas de coalescencia del singleflight (sin Redis)
+Si se cancela la petición líder, los seguidores deben recibir igualmente el resultado
+de la única llamada upstream en lugar de heredar su CancelledError.
+
+Uso:  cd backend && python test_singleflight.py   (o con pytest)
+"""
+import asyncio
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test_singleflight.db")
+os.environ.setdefault("JWT_SECRET", "test")
+os.environ.setdefault("LLM_SINGLEFLIGHT_REDIS", "false")
+
+from app.services.singleflight import SingleFlight
+
+
+def test_leader_cancelled_follower_gets_result():
+    """Cancelar al líder no cancela la llamada compartida"""
+    async def scenario():
+        flight = SingleFlight(namespace="test")
+        calls = []
+
+        async def upstream():
+            calls.append(1)
+            await asyncio.sleep(0.1)
+            return "respuesta"
+
+        leader = asyncio.ensure_future(flight.do("clave", upstream))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(flight.do("clave", upstream))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        result = await follower
+        return flight, calls, leader, result
+
+    flight, calls, leader, result = asyncio.run(scenario())
+    assert leader.cancelled()
+    assert result == "respuesta"
+    assert len(calls) == 1
+    assert flight.collapsed_local == 1
+    assert flight.get_stats()["in_flight"] == 0
+    print("✅ seguidor recibe el resultado aunque se cancele el líder")
+
+
+def test_error_reaches_every_caller():
+    """Un error del upstream llega a todos los que esperaban la misma clave"""
+    async def scenario():
+        flight = SingleFlight(namespace="test")
+
+        async def upstream():
+            await asyncio.sleep(0.05)
+            raise RuntimeError("proveedor caído")
+
+        results = await asyncio.gather(
+            flight.do("clave", upstream), flight.do("clave", upstream), return_exceptions=True
+        )
+        return flight, results
+
+    flight, results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flight.upstream_calls == 1
+    assert flight.get_stats()["in_flight"] == 0
+    print("✅ el error del upstream llega a todas las peticiones coalescidas")
+
+
+if __name__ == "__main__":
+    test_leader_cancelled_follower_gets_result()
+    test_error_reaches_every_caller()
@@ -3,6 +3,7 @@
 Script para probar las funciones de chat desde el directorio backend
 """
 
+import asyncio
 import sys
 import os
 
@@ -31,7 +32,7 @@ def test_smart_response():
             print(f"\n📝 Prueba {i}: '{message}'")
             
             try:
-                response = generate_smart_response(message, db)
+                response = asyncio.run(generate_smart_response(message, db))
                 print(f"✅ Respuesta: {response[:150]}...")
                 
                 # Verificar que contenga "Asistente Tienda"
@@ -3,6 +3,7 @@
 Script simple para probar las funciones de chat directamente
 """
 
+import asyncio
 import sys
 import os
 
@@ -34,7 +35,7 @@ def test_smart_response():
             print(f"\n📝 Prueba {i}: '{message}'")
             
             try:
-                response = generate_smart_response(message, db)
+                response = asyncio.run(generate_smart_response(message, db))
                 print(f"✅ Respuesta: {response[:150]}...")
                 
                 # Verificar que contenga "Asistente Tienda"